@@ -1,21 +1,28 @@
 import json
-from flask import Flask, request, jsonify
-from datetime import datetime
-from PyJHora import * # Import all functions from PyJHora
+from flask import Flask, request
+from werkzeug.exceptions import HTTPException
+import instrumentation
+import responses
+from responses import respond
+from idempotency import birth_data_inputs, idempotent
+from vedic_engine import AYANAMSA_LABELS, normalize_ayanamsa
+import vedic_core
 
 # --- เพิ่ม Library สำหรับการคำนวณสถานที่และเขตเวลา ---
-from geopy.geocoders import Nominatim
-from timezonefinder import TimezoneFinder
-import pytz
+from serving import engine_pool, resolve_place, serve
+from timezones import BirthTimeError, resolve_birth_moment
 # --------------------------------------------------
 
 app = Flask(__name__)
+instrumentation.init_app(app)
+responses.init_app(app)
 
 # --- ลบ CITY_DATA ที่จำกัดแค่ 3 เมืองทิ้งไป ---
 # CITY_DATA = { ... } (ลบส่วนนี้ทั้งหมด)
 # -----------------------------------------
 
 @app.route("/calculate_vedic", methods=["POST"])
+@idempotent(birth_data_inputs)
 def calculate_vedic():
     try:
         birth_data = request.get_json()
@@ -28,57 +35,52 @@ def calculate_vedic():
         birth_place_raw = birth_data.get("Birth Place")
 
         if not all([birth_date_str, birth_time_str, birth_place_raw]):
-            return jsonify({"status": "error", "message": "Missing required fields: Birth Date, Birth Time, or Birth Place."}), 400
+            return respond({"status": "error", "message": "Missing required fields: Birth Date, Birth Time, or Birth Place."}), 400
+
+        # Ayanamsa ที่ต้องการ (Lahiri, Raman, KP) ค่าเริ่มต้น Lahiri
+        try:
+            ayanamsa = normalize_ayanamsa(birth_data.get("Ayanamsa"))
+            # "Mode": "core" คำนวณแบบเร็วด้วยสูตรวิเคราะห์ (vedic_core.py), ค่าเริ่มต้น "full"
+            mode = vedic_core.normalize_mode(birth_data.get("Mode"))
+        except ValueError as e:
+            return respond({"status": "error", "message": str(e)}), 400
 
         # --- 2. การคำนวณ Geocoding และ Timezone (ส่วนที่แก้ไข) ---
-        geolocator = Nominatim(user_agent="the_soul_weaver_app")
-        tf = TimezoneFinder()
 
         # ค้นหาสถานที่เกิด
-        location = geolocator.geocode(birth_place_raw)
+        location = resolve_place(birth_place_raw, user_agent="the_soul_weaver_app")
         if not location:
-            return jsonify({"status": "error", "message": f"Birth place '{birth_place_raw}' not found."}), 400
+            return respond({"status": "error", "message": f"Birth place '{birth_place_raw}' not found."}), 400
 
         latitude = location.latitude
         longitude = location.longitude
 
-        # ค้นหาชื่อไทม์โซน (เช่น 'Asia/Bangkok')
-        timezone_name = tf.timezone_at(lng=longitude, lat=latitude)
-        if not timezone_name:
-            return jsonify({"status": "error", "message": f"Could not determine timezone for {birth_place_raw}."}), 400
-
         # --- 3. การจัดการเวลาและเขตเวลา (ส่วนที่แก้ไข) ---
-        
-        # แปลงสตริงวันที่และเวลาเป็น datetime object แบบ "naive"
-        birth_datetime_naive_str = f"{birth_date_str} {birth_time_str}"
-        birth_datetime_naive = datetime.strptime(birth_datetime_naive_str, '%Y-%m-%d %H:%M')
 
-        # กำหนดเขตเวลาที่ถูกต้อง
-        local_timezone = pytz.timezone(timezone_name)
-        
-        # ทำให้ datetime object "aware" (รู้เขตเวลา)
-        birth_datetime_local = local_timezone.localize(birth_datetime_naive, is_dst=None) 
-
-        # คำนวณค่า UTC offset (เช่น +7.0 สำหรับกรุงเทพฯ)
-        utc_offset_timedelta = birth_datetime_local.utcoffset()
-        timezone_offset = utc_offset_timedelta.total_seconds() / 3600.0 # แปลงเป็นชั่วโมง
+        # หาไทม์โซน (เช่น 'Asia/Bangkok'), เวลาท้องถิ่นแบบ aware และ UTC offset (เช่น +7.0)
+        # เวลาที่กำกวมหรือไม่มีอยู่จริงช่วงเปลี่ยน DST จะได้ error 400 แทน 500
+        try:
+            moment = resolve_birth_moment(birth_date_str, birth_time_str, latitude, longitude, birth_place_raw)
+        except BirthTimeError as e:
+            return respond(e.to_dict()), 400
+        timezone_name = moment.timezone_name
+        birth_datetime_local = moment.local
+        timezone_offset = moment.offset_hours
 
         # --- 4. การคำนวณทางโหราศาสตร์ (ใช้ข้อมูลที่ถูกต้องแล้ว) ---
-        set_ayanamsa(LAHIRI)
 
-        # สร้าง Chart โดยใช้ *เวลาท้องถิ่น* และ *offset ที่ถูกต้อง*
-        chart = Chart(birth_datetime_local.year, birth_datetime_local.month, birth_datetime_local.day,
-                      birth_datetime_local.hour, birth_datetime_local.minute, 0, # Seconds
-                      timezone_offset, latitude, longitude)
+        # คำนวณ Chart ใน worker ของ ayanamsa นั้น ๆ โดยใช้ *เวลาท้องถิ่น* และ *offset ที่ถูกต้อง*
+        # (ไม่เรียก set_ayanamsa แบบ global ใน process นี้ จึงรันแบบ multi-thread ได้)
+        # โหมด core ถ้าเวลาเกิดใกล้รอยต่อราศี/นักษัตร/ดิถี จะกลับไปใช้ Chart เต็มเอง
+        positions, mode_used = engine_pool.run(vedic_core.compute, birth_datetime_local, timezone_offset,
+                                               latitude, longitude, ayanamsa, mode)
 
         # --- 5. ดึงผลลัพธ์ ---
-        planets = chart.get_planets()
-
-        moon_sign = planets[MOON].get_sign_name()
-        tithi = chart.get_tithi_name()
-        saturn_sign = planets[SATURN].get_sign_name()
-        rahu_sign = planets[RAHU].get_sign_name()
-        ketu_sign = planets[KETU].get_sign_name()
+        moon_sign = positions["moon_sign"]
+        tithi = positions["tithi"]
+        saturn_sign = positions["saturn_sign"]
+        rahu_sign = positions["rahu_sign"]
+        ketu_sign = positions["ketu_sign"]
 
         kala_sarpa_yoga = "Not Checked" # Placeholder
 
@@ -96,8 +98,10 @@ def calculate_vedic():
                 "Rahu Sign": rahu_sign,
                 "Ketu Sign": ketu_sign,
                 "Kala Sarpa Yoga": kala_sarpa_yoga,
-                "Ayanamsha": "Lahiri",
-                "Ephemeris": "PyJHora (Swiss Ephemeris equivalent)"
+                "Ayanamsha": AYANAMSA_LABELS[ayanamsa],
+                "Ephemeris": "PyJHora (Swiss Ephemeris equivalent)" if mode_used == "full"
+                             else "Analytic series (vedic_core)",
+                "Calculation Mode": mode_used
             },
             # เพิ่มส่วนนี้เพื่อการตรวจสอบความถูกต้อง
             "Calculation Inputs": {
@@ -110,10 +114,14 @@ def calculate_vedic():
             # ลบ Accuracy Note เก่าทิ้ง และแทนที่ด้วยอันใหม่
             "Accuracy Note": "Location and timezone are dynamically calculated for accuracy."
         }
-        return jsonify(result)
+        with instrumentation.stage("serialize"):
+            return respond(result)
 
+    except HTTPException:
+        # 503 / 504 from serving.py
+        raise
     except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+        return respond({"status": "error", "message": str(e)}), 500
 
 if __name__ == "__main__":
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    serve(app, port=5000)
\ No newline at end of file
@@ -0,0 +1,288 @@
+import argparse
+import asyncio
+
+from quart import Quart, Response, request
+from werkzeug.exceptions import HTTPException
+
+import engines
+import responses
+from async_geocoding import SingleFlight, geocoder
+from serving import CHART_TIMEOUT, LAZY_ENGINES, ComputeTimeout, Overloaded, engine_pool, submit_chart, warm_up
+from timezones import BirthTimeError, resolve_birth_moment
+from vedic_calculator_api import compute_vedic
+from vedic_core import normalize_mode
+from vedic_engine import normalize_ayanamsa
+from natal_chart_calculator_immanuel import compute_natal
+from birth_chart_api import compute_birth_chart
+from human_design_api import compute_human_design
+from numerology_api import numerology_analysis
+
+# ASGI (Quart) variant of the chart endpoints, with the same request and
+# response shapes as the Flask services. Run with e.g.
+#   hypercorn async_api:app --bind 0.0.0.0:5006
+#
+# Identical work that is already in flight is coalesced: concurrent requests
+# for one uncached place share a single geocoder call (async_geocoding.py),
+# and concurrent requests for the same chart (same cache key) share a single
+# computation on serving.py's pools. Nothing here blocks the event loop for
+# longer than an in-memory cache lookup: the SQLite place store, the gazetteer
+# and numerology run on threads, charts on serving.py's pools.
+
+app = Quart(__name__)
+
+_charts = SingleFlight()
+
+
+@app.before_serving
+async def _start_geocoder():
+    await geocoder.start()
+
+
+@app.before_serving
+async def _warm_up():
+    # Chart engines and tables before the first request (see serving.warm_up),
+    # on a thread so the event loop is free meanwhile.
+    if not LAZY_ENGINES:
+        await asyncio.get_running_loop().run_in_executor(None, warm_up)
+
+
+@app.after_serving
+async def _close_geocoder():
+    await geocoder.close()
+
+
+def respond(payload, status=200):
+    """responses.respond() for Quart: the same format and encoding negotiation."""
+    body, headers = responses.encode(payload, request.headers.get("Accept", ""),
+                                     request.headers.get("Accept-Encoding", ""), request.args.get("schema"))
+    return Response(body, status=status, headers=headers)
+
+
+@app.route("/response_schema", methods=["GET"])
+async def response_schema():
+    return respond(responses.schema_description())
+
+
+@app.route("/healthz", methods=["GET"])
+async def healthz():
+    return respond({"status": "ok", "engines": engines.loaded()})
+
+
+@app.errorhandler(HTTPException)
+async def _http_error(e):
+    # 503 (full pool) / 504 (timeout) from serving.py, as JSON with their headers.
+    headers = {k: v for k, v in e.get_headers() if k != "Content-Type"}
+    return respond({"status": "error", "message": e.description}), e.code, headers
+
+
+async def run_chart(compute, *args, pool=None, **options):
+    """Compute (or join the identical in-flight computation of) a @cached_chart function."""
+    key = compute.cache_key(*args, **options)
+
+    async def compute_once():
+        return await asyncio.wrap_future(submit_chart(compute, *args, pool=pool, **options))
+
+    try:
+        return await _charts.do(key, compute_once, timeout=CHART_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise ComputeTimeout("The chart calculation did not finish in time.")
+
+
+class _InputError(Exception):
+    def __init__(self, body):
+        super().__init__(body.get("message"))
+        self.body = body
+
+
+async def _resolve_inputs(birth_data):
+    # Shared front half of every endpoint: required fields, place, birth moment.
+    birth_date_str = birth_data.get("Birth Date")
+    birth_time_str = birth_data.get("Birth Time")
+    birth_place_raw = birth_data.get("Birth Place")
+    if not all([birth_date_str, birth_time_str, birth_place_raw]):
+        raise _InputError({"status": "error", "message": "Missing required fields: Birth Date, Birth Time, or Birth Place."})
+
+    location = await geocoder.resolve_place(birth_place_raw)
+    if not location:
+        raise _InputError({"status": "error", "message": f"Birth place '{birth_place_raw}' not found."})
+    try:
+        moment = resolve_birth_moment(birth_date_str, birth_time_str,
+                                      location.latitude, location.longitude, birth_place_raw)
+    except BirthTimeError as e:
+        raise _InputError(e.to_dict())
+    return location, moment
+
+
+def _endpoint(handler=None, options=None):
+    # Turns _InputError into 400 and anything unexpected into the services' 500 body.
+    # options(birth_data) -> keyword arguments for the handler; its ValueError is a
+    # 400 before the place is looked up (no geocoder call for a bad option).
+    if handler is None:
+        return lambda handler: _endpoint(handler, options)
+
+    async def wrapper():
+        try:
+            birth_data = await request.get_json()
+            try:
+                parsed = options(birth_data) if options is not None else {}
+            except ValueError as e:
+                raise _InputError({"status": "error", "message": str(e)})
+            return await handler(birth_data, *await _resolve_inputs(birth_data), **parsed)
+        except _InputError as e:
+            return respond(e.body), 400
+        except HTTPException:
+            raise
+        except Exception as e:
+            return respond({"status": "error", "message": str(e)}), 500
+    wrapper.__name__ = handler.__name__
+    return wrapper
+
+
+def _vedic_options(birth_data):
+    return {"ayanamsa": normalize_ayanamsa(birth_data.get("Ayanamsa")),
+            "mode": normalize_mode(birth_data.get("Mode"))}
+
+
+def _profile_options(birth_data):
+    return {"ayanamsa": normalize_ayanamsa(birth_data.get("Ayanamsa"))}
+
+
+@app.route("/calculate_vedic", methods=["POST"])
+@_endpoint(options=_vedic_options)
+async def calculate_vedic(birth_data, location, moment, ayanamsa, mode):
+    vedic = await run_chart(compute_vedic, moment.local, moment.offset_hours,
+                            location.latitude, location.longitude, pool=engine_pool, ayanamsa=ayanamsa, mode=mode)
+    return respond({
+        "status": "success",
+        "Birth Info": {
+            "Birth Date": birth_data.get("Birth Date"),
+            "Birth Time": birth_data.get("Birth Time"),
+            "Birth Place": birth_data.get("Birth Place")
+        },
+        "VedicData": vedic["VedicData"],
+        "Report": vedic["Report"],
+        "CalculationInputs": {
+            "Resolved Place": location.address,
+            "Latitude": location.latitude,
+            "Longitude": location.longitude,
+            "Timezone Name": moment.timezone_name,
+            "UTC Offset (Hours)": moment.offset_hours
+        }
+    })
+
+
+@app.route("/calculate_natal", methods=["POST"])
+@_endpoint
+async def calculate_natal(birth_data, location, moment):
+    western = await run_chart(compute_natal, moment.utc, location.latitude, location.longitude)
+    result = {
+        "status": "success",
+        "Birth Info": {
+            "Birth Date": birth_data.get("Birth Date"),
+            "Birth Time": birth_data.get("Birth Time"),
+            "Birth Place": birth_data.get("Birth Place")
+        },
+        "Western Astrology": western,
+        "Calculation Inputs": {
+            "Resolved Place": location.address,
+            "Latitude": location.latitude,
+            "Longitude": location.longitude,
+            "Timezone Name": moment.timezone_name,
+            "Calculated UTC Time": moment.utc.strftime('%Y-%m-%d %H:%M:%S %Z')
+        },
+        "Accuracy Note": "Location and timezone are dynamically calculated for accuracy."
+    }
+    return respond(result)
+
+
+def _chart_inputs(birth_data, location, moment):
+    return {
+        "Birth Date": birth_data.get("Birth Date"),
+        "Birth Time": birth_data.get("Birth Time"),
+        "Birth Place": birth_data.get("Birth Place"),
+        "Resolved Address": location.address,
+        "Latitude": location.latitude,
+        "Longitude": location.longitude,
+        "Timezone Name": moment.timezone_name,
+    }
+
+
+@app.route("/calculate_birth_chart", methods=["POST"])
+@_endpoint
+async def calculate_birth_chart(birth_data, location, moment):
+    chart_data = await run_chart(compute_birth_chart, moment.utc, location.latitude, location.longitude)
+    return respond({
+        "status": "success",
+        "inputs": _chart_inputs(birth_data, location, moment),
+        "birth_chart": chart_data
+    })
+
+
+@app.route("/calculate_hd", methods=["POST"])
+@_endpoint
+async def calculate_hd(birth_data, location, moment):
+    human_design = await run_chart(compute_human_design, moment.utc, location.latitude, location.longitude)
+    return respond({
+        "status": "success",
+        "inputs": _chart_inputs(birth_data, location, moment),
+        "human_design": human_design
+    }), 200
+
+
+async def _section(coroutine):
+    # One failing chart should not take the whole profile down with it.
+    try:
+        return await coroutine
+    except Overloaded:
+        # A full pool fails the whole request with 503, as in profile_api.py.
+        raise
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+
+@app.route("/calculate_profile", methods=["POST"])
+@_endpoint(options=_profile_options)
+async def calculate_profile(birth_data, location, moment, ayanamsa):
+    name = birth_data.get("Full Name")
+    latitude, longitude = location.latitude, location.longitude
+    loop = asyncio.get_running_loop()
+    charts = {
+        "Vedic Astrology": run_chart(compute_vedic, moment.local, moment.offset_hours, latitude, longitude,
+                                     pool=engine_pool, ayanamsa=ayanamsa),
+        "Western Astrology": run_chart(compute_natal, moment.utc, latitude, longitude),
+        "Birth Chart": run_chart(compute_birth_chart, moment.utc, latitude, longitude),
+        "Human Design": run_chart(compute_human_design, moment.utc, latitude, longitude),
+    }
+    if name and any(c.isalpha() for c in name):
+        charts["Numerology"] = loop.run_in_executor(None, numerology_analysis, name)
+    sections = dict(zip(charts, await asyncio.gather(*map(_section, charts.values()))))
+
+    result = {
+        "status": "success",
+        "Birth Info": {
+            "Full Name": name,
+            "Birth Date": birth_data.get("Birth Date"),
+            "Birth Time": birth_data.get("Birth Time"),
+            "Birth Place": birth_data.get("Birth Place")
+        },
+        **sections,
+        "Calculation Inputs": {
+            "Resolved Place": location.address,
+            "Latitude": latitude,
+            "Longitude": longitude,
+            "Timezone Name": moment.timezone_name,
+            "UTC Offset (Hours)": moment.offset_hours,
+            "Calculated UTC Time": moment.utc.strftime('%Y-%m-%d %H:%M:%S %Z')
+        }
+    }
+    return respond(result)
+
+
+if __name__ == "__main__":
+    # Quart's development server; --dev turns on the debugger and reloader, as in serving.serve().
+    parser = argparse.ArgumentParser(description="Serve async_api (use hypercorn in production).")
+    parser.add_argument("--dev", action="store_true", help="debugger and reloader")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5006)
+    args = parser.parse_args()
+    app.run(debug=args.dev, host=args.host, port=args.port)
@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+import engines
+from geocoding import (GEOCODER_OFFLINE, MISSING, NOMINATIM_DOMAIN, NOMINATIM_MIN_INTERVAL, NOMINATIM_SCHEME,
+                       NOMINATIM_TIMEOUT, normalize_place, offline_place, place_cache, remember_place)
+
+# asyncio counterpart of geocoding.resolve_place for async_api.py.
+# Same caches and gazetteer; on a miss the lookup is coalesced with any identical
+# one already in flight and goes out through one shared aiohttp-backed Nominatim
+# client (keep-alive connections) behind a token bucket, so a slow geocode only
+# parks a coroutine instead of a worker thread. Only the in-memory cache is read
+# on the event loop; the SQLite store and the gazetteer scan run on a thread.
+
+adapters = engines.lazy("geopy.adapters")
+geocoders = engines.lazy("geopy.geocoders")
+
+ASYNC_USER_AGENT = "the_soul_weaver_async_app"
+
+
+class SingleFlight:
+    """Run at most one coroutine per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self._inflight = {}  # key -> asyncio.Task
+        self.coalesced = 0
+
+    async def do(self, key, make_coroutine, timeout=None):
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(make_coroutine())
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shield: a caller that gives up (timeout, disconnect) must not cancel
+        # the work the other callers are waiting for.
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncGeocoder:
+    def __init__(self, user_agent=ASYNC_USER_AGENT):
+        self.user_agent = user_agent
+        self.bucket = TokenBucket(1.0 / NOMINATIM_MIN_INTERVAL) if NOMINATIM_MIN_INTERVAL > 0 else None
+        self.lookups = SingleFlight()
+        self._geolocator = None
+        self._start_lock = asyncio.Lock()
+
+    async def start(self):
+        async with self._start_lock:
+            if self._geolocator is None:
+                geolocator = geocoders.Nominatim(user_agent=self.user_agent, domain=NOMINATIM_DOMAIN,
+                                                   scheme=NOMINATIM_SCHEME, timeout=NOMINATIM_TIMEOUT,
+                                                   adapter_factory=adapters.AioHTTPAdapter)
+                self._geolocator = await geolocator.__aenter__()
+
+    async def close(self):
+        if self._geolocator is not None:
+            geolocator, self._geolocator = self._geolocator, None
+            await geolocator.__aexit__(None, None, None)
+
+    async def resolve_place(self, raw):
+        """Resolve a free-text birth place to a ResolvedPlace, or None if it does not exist."""
+        key = normalize_place(raw)
+        cached = place_cache.peek(key)
+        if cached is not MISSING:
+            return cached
+        return await self.lookups.do(key, lambda: self._lookup(key, raw))
+
+    async def _lookup(self, key, raw):
+        loop = asyncio.get_running_loop()
+        place = await loop.run_in_executor(None, _local_place, key, raw)
+        if place is not MISSING:
+            return place
+        if GEOCODER_OFFLINE:
+            return None
+        await self.start()
+        if self.bucket is not None:
+            await self.bucket.acquire()
+        location = await self._geolocator.geocode(raw)
+        return await loop.run_in_executor(None, remember_place, key, location)
+
+
+def _local_place(key, raw):
+    # SQLite store, then the offline gazetteer; MISSING when neither knows the place.
+    cached = place_cache.get(key)
+    if cached is not MISSING:
+        return cached
+    place = offline_place(key, raw)
+    return MISSING if place is None else place
+
+
+geocoder = AsyncGeocoder()
@@ -0,0 +1,76 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ephemeris_table import PLANETS, get_ephemeris_table  # noqa: E402
+from solar_arc import jd_to_datetime  # noqa: E402
+
+# Births/second for the per-row birth chart paths versus the batch path.
+#   python ephemeris_table.py build
+#   python benchmarks/bench_birth_chart.py --births 100000
+
+
+def random_julian_days(count, seed=0):
+    # Uniform over 1901-2099 (inside the ephemeris table).
+    return np.random.default_rng(seed).uniform(2415385.5, 2488069.5, count)
+
+
+def _rate(label, count, elapsed, baseline=None):
+    rate = count / elapsed
+    speedup = f"  ({rate / baseline:,.0f}x)" if baseline else ""
+    print(f"{label:<28} {rate:>12,.0f} births/s{speedup}")
+    return rate
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Birth chart throughput benchmark")
+    parser.add_argument("--births", type=int, default=100000)
+    parser.add_argument("--row-sample", type=int, default=500,
+                        help="births timed on the per-row ImmanuelChart path")
+    args = parser.parse_args(argv)
+
+    table = get_ephemeris_table()
+    if table is None:
+        sys.exit("Build the ephemeris table first: python ephemeris_table.py build")
+    jds = random_julian_days(args.births)
+    datetimes = [jd_to_datetime(jd).astimezone(pytz.utc) for jd in jds[:args.row_sample]]
+
+    baseline = None
+    try:
+        from immanuel import Chart as ImmanuelChart, const as ImmanuelConst
+    except ImportError:
+        print("immanuel is not installed; skipping the ImmanuelChart baseline")
+    else:
+        start = time.perf_counter()
+        for dt in datetimes:
+            chart = ImmanuelChart(dt, 0.0, 0.0)
+            [chart.ephemeris[getattr(ImmanuelConst, planet)].longitude for planet in PLANETS]
+        baseline = _rate("per row, ImmanuelChart", len(datetimes), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for dt in datetimes:
+        table.birth_chart(dt)
+    _rate("per row, ephemeris table", len(datetimes), time.perf_counter() - start, baseline)
+
+    start = time.perf_counter()
+    columns, covered = table.birth_chart_columns(jds)
+    batch_rate = _rate("batch, ephemeris table", len(jds), time.perf_counter() - start, baseline)
+    assert covered.all()
+
+    # Batch and per-row agree exactly (same interpolation).
+    row = table.birth_chart(datetimes[0])
+    for planet in PLANETS:
+        assert abs(columns[planet]["longitude"][0] - row[planet]["longitude"]) < 1e-6
+        assert columns[planet]["sign"][0] == row[planet]["sign"]
+    if baseline and batch_rate < 100 * baseline:
+        print("batch path is below the 100x target")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
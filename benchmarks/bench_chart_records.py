@@ -0,0 +1,135 @@
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chart_records  # noqa: E402
+from chart_records import SIGN_SYMBOLS, SIGNS  # noqa: E402
+import vedic_calculator_api  # noqa: E402,F401  (registers the vedic report)
+
+# Bytes per cached chart, as the nested dict the services return versus a
+# chart_records record (in memory and packed), and the cost of going between them.
+#   python benchmarks/bench_chart_records.py --charts 100000
+# The natal row needs immanuel (its planet list names the planets).
+
+
+def natal_chart(rng, planets):
+    def point(**fields):
+        sign = rng.randrange(12)
+        return {**fields, "sign": SIGNS[sign], "degree": rng.uniform(0.0, 30.0)}
+
+    planets_data = []
+    for name in planets:
+        sign = rng.randrange(12)
+        planets_data.append({"name": name, "sign": SIGNS[sign], "sign_symbol": SIGN_SYMBOLS[sign],
+                             "degree": rng.uniform(0.0, 30.0), "house": rng.randint(1, 12)})
+    return {
+        "Planets": planets_data,
+        "Houses": [point(house=house) for house in range(1, 13)],
+        "Ascendant": point(),
+        "Midheaven (MC)": point(),
+    }
+
+
+def birth_chart(rng):
+    chart = {}
+    for planet in chart_records.BIRTH_CHART_PLANETS:
+        longitude = rng.uniform(0.0, 360.0)
+        chart[planet] = {"longitude": longitude, "sign": SIGNS[int(longitude // 30)], "degree": longitude % 30.0}
+    return chart
+
+
+def vedic_chart(rng):
+    tithi = rng.choice(chart_records.TITHI_KEYS)
+    nakshatra = rng.choice(chart_records.NAKSHATRA_NAMES)
+    rahu = rng.randrange(12)
+    return {
+        "VedicData": {
+            "Tithi": tithi,
+            "Nakshatra": nakshatra,
+            "Nakshatra Pada": rng.randint(1, 4),
+            "Moon Sign": rng.choice(SIGNS),
+            "Saturn Sign": rng.choice(SIGNS),
+            "Rahu Sign": SIGNS[rahu],
+            "Ketu Sign": SIGNS[(rahu + 6) % 12],
+            "Ayanamsa": "Lahiri",
+            "Calculation Mode": "core",
+        },
+        "Report": vedic_calculator_api.vedic_report(tithi, nakshatra),
+    }
+
+
+def _allocated(build):
+    # (objects, bytes still allocated once build() returns them)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return objects, after - before
+
+
+def _per_call(fn, items):
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+
+def measure(label, record_type, make_chart, count):
+    rng = random.Random(0)
+    charts, dict_bytes = _allocated(lambda: [make_chart(rng) for _ in range(count)])
+    records, record_bytes = _allocated(lambda: [record_type.compact(chart) for chart in charts])
+    if not all(isinstance(record, record_type) for record in records):
+        print(f"{label:<12} not representable as {record_type.__name__}")
+        return None
+    packed = chart_records.pack_many(records)
+    sample = records[:min(count, 10000)]
+    blobs = [record.pack() for record in sample]
+    row = {
+        "chart": label,
+        "dict_bytes": dict_bytes / count,
+        "record_bytes": record_bytes / count,
+        "packed_bytes": len(packed) / count,
+        "compact_us": _per_call(record_type.compact, charts[:len(sample)]),
+        "to_dict_us": _per_call(record_type.to_dict, sample),
+        "pack_us": _per_call(record_type.pack, sample),
+        "unpack_us": _per_call(chart_records.unpack, blobs),
+    }
+    assert chart_records.unpack_many(packed[:sum(len(blob) + 4 for blob in blobs)]) == sample
+    print(f"{label:<12} {row['dict_bytes']:>10,.0f} {row['record_bytes']:>10,.0f} {row['packed_bytes']:>10,.0f}"
+          f" {row['dict_bytes'] / row['record_bytes']:>6.1f}x {row['compact_us']:>9.1f} {row['to_dict_us']:>9.1f}"
+          f" {row['pack_us']:>7.2f} {row['unpack_us']:>7.2f}")
+    return row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compact chart record benchmark")
+    parser.add_argument("--charts", type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    print(f"{'chart':<12} {'dict B':>10} {'record B':>10} {'packed B':>10} {'saved':>7}"
+          f" {'compact us':>9} {'to_dict us':>9} {'pack us':>7} {'unpack us':>7}")
+    rows = [
+        measure("birth chart", chart_records.BirthChartRecord, birth_chart, args.charts),
+        measure("vedic", chart_records.VedicRecord, vedic_chart, args.charts),
+    ]
+    try:
+        planets = chart_records.natal_planets()
+    except (ImportError, AttributeError):
+        print("natal        skipped: needs immanuel (immanuel.const.PLANETS)")
+    else:
+        rows.append(measure("natal", chart_records.NatalRecord,
+                            lambda rng: natal_chart(rng, planets), args.charts))
+    for row in rows:
+        if row:
+            print(f"{row['chart']}: {1_000_000 * row['record_bytes'] / 2 ** 20:,.0f} MB per million cached charts"
+                  f" (dicts: {1_000_000 * row['dict_bytes'] / 2 ** 20:,.0f} MB)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
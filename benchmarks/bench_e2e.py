@@ -0,0 +1,415 @@
+import argparse
+import http.client
+import importlib
+import json
+import os
+import platform
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fake_geocoder  # noqa: E402
+
+# End-to-end benchmark and load test for the chart endpoints, against the
+# local fake Nominatim (fake_geocoder.py) instead of the real one.
+#
+# 1. Micro-benchmarks, in this process, per stage: request parse, geocode
+#    (cache miss = one fake Nominatim round trip, and cache hit), timezone,
+#    chart build (the uncached compute_* function) and serialization.
+# 2. Load scenarios: each service runs in its own process (gunicorn through
+#    serving.serve() when installed, else a threaded werkzeug server) and is
+#    sent --requests requests at every --concurrency level.
+#
+# Every stage and scenario reports p50/p95/p99 latency and requests/second.
+# The load scenarios also report the mean Server-Timing stages and status
+# counts. Results are written as JSON to benchmarks/results/, and --compare
+# prints the change against an earlier run.
+#   python benchmarks/bench_e2e.py --endpoints calculate_vedic,calculate_numerology
+#   python benchmarks/bench_e2e.py --latency-ms 150 --error-rate 0.02 --concurrency 1,16
+#   python benchmarks/bench_e2e.py --compare benchmarks/results/e2e-20260101-120000.json
+
+# endpoint -> (service module, path, compute function name, kind of request body)
+ENDPOINTS = {
+    "calculate_vedic": ("vedic_calculator_api", "/calculate_vedic", "compute_vedic", "birth"),
+    "calculate_natal": ("natal_chart_calculator_immanuel", "/calculate_natal", "compute_natal", "birth"),
+    "calculate_birth_chart": ("birth_chart_api", "/calculate_birth_chart", "compute_birth_chart", "birth"),
+    "calculate_hd": ("human_design_api", "/calculate_hd", "compute_human_design", "birth"),
+    "calculate_numerology": ("numerology_api", "/calculate_numerology", "numerology_analysis", "name"),
+}
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+FIRST_NAMES = ("Somchai", "Ananya", "Kenji", "Priya", "Olivia", "Lucas", "Amara", "Mateo", "Ingrid", "Noah")
+LAST_NAMES = ("Suksawat", "Sharma", "Tanaka", "Okafor", "Muller", "Silva", "Dubois", "Novak", "Reyes", "Chen")
+
+
+def request_body(kind, index, places, seed=0):
+    """The JSON body of request `index`: a random birth (or name) from a fixed seed."""
+    rng = random.Random(seed * 1_000_003 + index)
+    if kind == "name":
+        return {"name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"}
+    city = fake_geocoder.CITIES[rng.randrange(len(fake_geocoder.CITIES))][0]
+    return {
+        "Birth Date": f"{rng.randint(1940, 2010)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "Birth Time": f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+        # `places` distinct texts: the first request for each one is a place-cache miss.
+        "Birth Place": f"{city}, district {rng.randrange(places)}",
+    }
+
+
+def summarize(latencies, wall=None):
+    if not latencies:
+        return {"count": 0}
+    ms = np.asarray(latencies) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    summary = {"count": len(latencies), "mean_ms": round(float(ms.mean()), 3), "p50_ms": round(float(p50), 3),
+               "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3)}
+    summary["rps"] = round(len(latencies) / (wall if wall else ms.sum() / 1000.0), 2)
+    return summary
+
+
+def _timed(function, iterations):
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        function(i)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+# --- Micro-benchmarks ---
+
+def micro_benchmarks(endpoints, iterations, seed):
+    import responses
+    import serving
+    from timezones import resolve_birth_moment
+
+    results = {"parse": {}, "chart": {}, "serialize": {}}
+    birth = request_body("birth", 0, 1, seed)
+    run_id = f"{seed}-{time.time_ns()}"
+
+    # Place names not seen before in this run: every call is a cache miss.
+    results["geocode_miss"] = _timed(
+        lambda i: serving.resolve_place(f"{fake_geocoder.CITIES[i % len(fake_geocoder.CITIES)][0]}, micro {run_id} {i}"),
+        iterations)
+    results["geocode_hit"] = _timed(lambda i: serving.resolve_place(birth["Birth Place"]), iterations)
+    place = serving.resolve_place(birth["Birth Place"])
+    if place is None:
+        sys.exit("The fake geocoder did not resolve a place; check --error-rate / --not-found-rate.")
+    bodies = [request_body("birth", i, 1, seed) for i in range(iterations)]
+    results["timezone"] = _timed(
+        lambda i: resolve_birth_moment(bodies[i]["Birth Date"], bodies[i]["Birth Time"],
+                                       place.latitude, place.longitude), iterations)
+    moments = [resolve_birth_moment(b["Birth Date"], b["Birth Time"], place.latitude, place.longitude) for b in bodies]
+
+    for endpoint in endpoints:
+        module_name, path, compute_name, kind = ENDPOINTS[endpoint]
+        module = importlib.import_module(module_name)
+        payload = json.dumps(request_body(kind, 0, 1, seed)).encode("utf-8")
+
+        def parse(i):
+            with module.app.test_request_context(path, method="POST", data=payload, content_type="application/json"):
+                module.request.get_json()
+        results["parse"][endpoint] = _timed(parse, iterations)
+
+        compute = getattr(module, compute_name)
+        compute = getattr(compute, "uncached", compute)
+        if kind == "name":
+            names = [request_body("name", i, 1, seed)["name"] for i in range(iterations)]
+            chart = lambda i: compute(names[i])  # noqa: E731
+        elif compute_name == "compute_vedic":
+            chart = lambda i: compute(moments[i].local, moments[i].offset_hours,  # noqa: E731
+                                      place.latitude, place.longitude)
+        else:
+            chart = lambda i: compute(moments[i].utc, place.latitude, place.longitude)  # noqa: E731
+        try:
+            sample = chart(0)
+        except Exception as e:
+            results["chart"][endpoint] = results["serialize"][endpoint] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        results["chart"][endpoint] = _timed(chart, iterations)
+        response = {"status": "success", "inputs": bodies[0], "result": sample}
+        results["serialize"][endpoint] = _timed(lambda i: responses.encode(response), iterations)
+    return results
+
+
+# --- Load scenarios ---
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve(module_name, port, server, workers):
+    # Runs in the service process (see start_service).
+    import serving
+    app = importlib.import_module(module_name).app
+    if server == "gunicorn":
+        serving.serve(app, port, host="127.0.0.1", argv=["--workers", str(workers)])
+        return
+    import logging
+    from werkzeug.serving import make_server
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    serving.warm_up()
+    make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+
+
+def start_service(module_name, server, workers, log_path, timeout=60.0):
+    port = _free_port()
+    with open(log_path, "wb") as log:
+        # Own session, so stop_service() also ends the service's chart worker processes.
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "_serve", module_name, str(port),
+                                    server, str(workers)], cwd=ROOT, stdout=log, stderr=subprocess.STDOUT,
+                                   start_new_session=True)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            with open(log_path, errors="replace") as log:
+                raise RuntimeError(f"{module_name} exited: {log.read()[-500:]}")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            connection.request("GET", "/healthz")
+            if connection.getresponse().status == 200:
+                return process, port
+        except OSError:
+            time.sleep(0.1)
+    stop_service(process)
+    raise RuntimeError(f"{module_name} did not start within {timeout:.0f} s")
+
+
+def stop_service(process):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(10)
+    except ProcessLookupError:
+        pass
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def _server_timing(header):
+    stages = {}
+    for part in (header or "").split(","):
+        name, _, duration = part.strip().partition(";dur=")
+        if duration:
+            stages[name] = float(duration)
+    return stages
+
+
+def load_scenario(port, path, kind, concurrency, requests, places, seed, timeout):
+    next_index = iter(range(requests))
+    lock = threading.Lock()
+    latencies, statuses, stage_totals = [], {}, {}
+
+    def worker():
+        connection = None
+        while True:
+            with lock:
+                index = next(next_index, None)
+            if index is None:
+                break
+            body = json.dumps(request_body(kind, index, places, seed))
+            start = time.perf_counter()
+            try:
+                connection = connection or http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+                connection.request("POST", path, body, {"Content-Type": "application/json"})
+                response = connection.getresponse()
+                response.read()
+                status = str(response.status)
+                stages = _server_timing(response.getheader("Server-Timing"))
+                if response.getheader("Connection", "").lower() == "close":
+                    connection.close()
+                    connection = None
+            except (OSError, http.client.HTTPException) as e:
+                status, stages = type(e).__name__, {}
+                connection = None
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+                for name, ms in stages.items():
+                    total, count = stage_totals.get(name, (0.0, 0))
+                    stage_totals[name] = (total + ms, count + 1)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - started
+    summary = summarize(latencies, wall)
+    summary.update(concurrency=concurrency, status=statuses,
+                   stages_ms={name: round(total / count, 3) for name, (total, count) in sorted(stage_totals.items())})
+    return summary
+
+
+def load_tests(endpoints, args, scratch):
+    results = {}
+    for endpoint in endpoints:
+        module_name, path, _, kind = ENDPOINTS[endpoint]
+        try:
+            process, port = start_service(module_name, args.server, args.workers,
+                                          os.path.join(scratch, f"{module_name}.log"))
+        except RuntimeError as e:
+            results[endpoint] = {"error": str(e)}
+            print(f"{endpoint}: {e}")
+            continue
+        try:
+            # Load the lazy engines and tables before measuring (not recorded).
+            load_scenario(port, path, kind, 1, args.warmup_requests, args.places, args.seed + 1, args.timeout)
+            results[endpoint] = [
+                load_scenario(port, path, kind, concurrency, args.requests, args.places,
+                              args.seed + 2 + level, args.timeout)
+                for level, concurrency in enumerate(args.concurrency)
+            ]
+        finally:
+            stop_service(process)
+    return results
+
+
+# --- Reporting ---
+
+def _print_micro(micro):
+    print(f"\n{'stage':<14} {'endpoint':<24} {'p50':>9} {'p95':>9} {'p99':>9} {'ops/s':>10}")
+    for stage_name, entry in micro.items():
+        rows = entry.items() if "count" not in entry else [("", entry)]
+        for endpoint, stats in rows:
+            if "error" in stats:
+                print(f"{stage_name:<14} {endpoint:<24} {stats['error']}")
+            else:
+                print(f"{stage_name:<14} {endpoint:<24} {stats['p50_ms']:>7.2f}ms {stats['p95_ms']:>7.2f}ms "
+                      f"{stats['p99_ms']:>7.2f}ms {stats['rps']:>10,.0f}")
+
+
+def _print_load(load):
+    print(f"\n{'endpoint':<24} {'conc':>5} {'p50':>9} {'p95':>9} {'p99':>9} {'req/s':>8}  status / stages")
+    for endpoint, scenarios in load.items():
+        if isinstance(scenarios, dict):
+            print(f"{endpoint:<24} {scenarios['error']}")
+            continue
+        for s in scenarios:
+            stages = " ".join(f"{name}={ms:.1f}" for name, ms in s["stages_ms"].items())
+            print(f"{endpoint:<24} {s['concurrency']:>5} {s['p50_ms']:>7.1f}ms {s['p95_ms']:>7.1f}ms "
+                  f"{s['p99_ms']:>7.1f}ms {s['rps']:>8.1f}  {s['status']} {stages}")
+
+
+def _flatten(results):
+    # {label: stats} for every comparable row of a results file.
+    rows = {}
+    for stage_name, entry in results.get("micro", {}).items():
+        for endpoint, stats in (entry.items() if "count" not in entry else [("", entry)]):
+            rows[f"micro {stage_name} {endpoint}".strip()] = stats
+    for endpoint, scenarios in results.get("load", {}).items():
+        for s in scenarios if isinstance(scenarios, list) else []:
+            rows[f"load {endpoint} c={s['concurrency']}"] = s
+    return rows
+
+
+def compare(old, new):
+    print(f"\nChange against {old['meta'].get('started')} ({old['meta'].get('commit')}):")
+    old_rows, new_rows = _flatten(old), _flatten(new)
+    for label, stats in new_rows.items():
+        before = old_rows.get(label)
+        if not before or "p50_ms" not in before or "p50_ms" not in stats:
+            continue
+        changes = "  ".join(
+            f"{key[:-3] if key.endswith('_ms') else key} {before[key]:.2f}->{stats[key]:.2f} "
+            f"({(stats[key] - before[key]) / before[key]:+.0%})"
+            for key in ("p50_ms", "p95_ms", "p99_ms", "rps") if before.get(key))
+        print(f"  {label:<40} {changes}")
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    if argv is None and sys.argv[1:2] == ["_serve"]:
+        module_name, port, server, workers = sys.argv[2:6]
+        return _serve(module_name, int(port), server, int(workers))
+
+    parser = argparse.ArgumentParser(description="End-to-end benchmark and load test against a fake geocoder")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="comma-separated endpoint names")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated client concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--warmup-requests", type=int, default=10, help="unrecorded requests before each service")
+    parser.add_argument("--places", type=int, default=100, help="distinct birth-place texts in the load")
+    parser.add_argument("--iterations", type=int, default=200, help="calls per micro-benchmark")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="fake geocoder delay per lookup")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="fake geocoder delay jitter")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fake geocoder 503 rate")
+    parser.add_argument("--not-found-rate", type=float, default=0.0, help="fake geocoder empty-result rate")
+    parser.add_argument("--server", choices=("gunicorn", "werkzeug"), default=None,
+                        help="default: gunicorn when installed")
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn worker processes")
+    parser.add_argument("--timeout", type=float, default=60.0, help="client timeout per request, seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--output", help="results file (default benchmarks/results/e2e-<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+    endpoints = [e for e in args.endpoints.split(",") if e]
+    unknown = [e for e in endpoints if e not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)} (choose from {', '.join(ENDPOINTS)})")
+    args.concurrency = [int(c) for c in args.concurrency.split(",")]
+    if args.server is None:
+        try:
+            import gunicorn  # noqa: F401
+            args.server = "gunicorn"
+        except ImportError:
+            args.server = "werkzeug"
+
+    geocoder = fake_geocoder.start(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                                   not_found_rate=args.not_found_rate, seed=args.seed)
+    scratch = tempfile.mkdtemp(prefix="soulweaver-bench-")
+    # Set before any service module is imported, here and in the service processes.
+    os.environ.update({
+        "NOMINATIM_DOMAIN": geocoder.domain, "NOMINATIM_SCHEME": "http", "NOMINATIM_MIN_INTERVAL": "0",
+        "NOMINATIM_TIMEOUT": str(max(5.0, 4 * (args.latency_ms + args.jitter_ms) / 1000.0)),
+        "PLACE_CACHE_PATH": os.path.join(scratch, "places.sqlite3"),
+        "GAZETTEER_PATH": os.path.join(scratch, "no-gazetteer.idx"), "GEOCODER_OFFLINE": "0",
+    })
+
+    started = datetime.now()
+    results = {"meta": {
+        "started": started.isoformat(timespec="seconds"), "commit": _commit(), "python": platform.python_version(),
+        "platform": platform.platform(), "cpus": os.cpu_count(), "server": args.server,
+        "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+    }}
+    if not args.skip_micro:
+        results["micro"] = micro_benchmarks(endpoints, args.iterations, args.seed)
+        _print_micro(results["micro"])
+    if not args.skip_load:
+        results["load"] = load_tests(endpoints, args, scratch)
+        _print_load(results["load"])
+    results["geocoder"] = geocoder.stats()
+    geocoder.shutdown()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"e2e-{started.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults: {output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
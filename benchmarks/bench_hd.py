@@ -0,0 +1,63 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hd_batch  # noqa: E402
+from solar_arc import body_longitudes, get_solar_arc_table  # noqa: E402
+
+# Births/second for Human Design: hd.HumanDesign per birth versus hd_batch.
+#   python ephemeris_table.py build && python solar_arc.py build
+#   python benchmarks/bench_hd.py --births 10000
+
+
+def _rate(label, count, elapsed, baseline=None):
+    rate = count / elapsed
+    speedup = f"  ({rate / baseline:,.0f}x)" if baseline else ""
+    print(f"{label:<32} {rate:>12,.0f} births/s{speedup}")
+    return rate
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Human Design throughput benchmark")
+    parser.add_argument("--births", type=int, default=10000)
+    parser.add_argument("--row-sample", type=int, default=300, help="births timed on the hd.HumanDesign path")
+    args = parser.parse_args(argv)
+
+    jds = np.random.default_rng(0).uniform(2415385.5, 2488069.5, args.births)
+    baseline = None
+    try:
+        import humandesign as hd
+    except ImportError:
+        print("humandesign is not installed; skipping the hd.HumanDesign baseline")
+    else:
+        table = get_solar_arc_table()
+        if table is None:
+            sys.exit("Build the solar arc table first: python solar_arc.py build")
+        sample = jds[:args.row_sample].tolist()
+        start = time.perf_counter()
+        for jd in sample:
+            chart = hd.HumanDesign(hd.Design(*body_longitudes(jd)), hd.Design(*body_longitudes(table.design_jd(jd))))
+            chart.type, chart.authority, chart.profile, chart.definition
+        baseline = _rate("per birth, hd.HumanDesign", len(sample), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    personality = hd_batch.hd_longitudes(jds)
+    design = hd_batch.hd_longitudes(hd_batch.design_jds(jds))
+    _rate("batch, longitudes", len(jds), time.perf_counter() - start, baseline)
+
+    start = time.perf_counter()
+    result = hd_batch.evaluate(personality, design)
+    _rate("batch, gates -> type/authority", len(jds), time.perf_counter() - start, baseline)
+
+    start = time.perf_counter()
+    hd_batch.to_records(result)
+    _rate("batch, records", len(jds), time.perf_counter() - start, baseline)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from numerology_api import numerology_analysis, numerology_batch, numerology_numbers_batch  # noqa: E402
+
+# Names/second for the per-name path versus the batch path.
+#   python benchmarks/bench_numerology.py --names 200000
+
+
+def random_names(count, seed=0):
+    rng = random.Random(seed)
+    letters = string.ascii_letters
+    return [
+        " ".join("".join(rng.choice(letters) for _ in range(rng.randint(3, 10)))
+                 for _ in range(rng.randint(2, 3)))
+        for _ in range(count)
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Numerology throughput benchmark")
+    parser.add_argument("--names", type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    names = random_names(args.names)
+
+    start = time.perf_counter()
+    scalar = [numerology_analysis(name) for name in names]
+    scalar_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = numerology_batch(names)
+    batch_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    numerology_numbers_batch(names)
+    numbers_elapsed = time.perf_counter() - start
+
+    assert scalar == batch, "batch results differ from numerology_analysis"
+    print(f"names:     {len(names):,}")
+    print(f"per-name:  {len(names) / scalar_elapsed:>12,.0f} names/s")
+    print(f"batch:     {len(names) / batch_elapsed:>12,.0f} names/s "
+          f"({scalar_elapsed / batch_elapsed:.1f}x)")
+    print(f"numbers:   {len(names) / numbers_elapsed:>12,.0f} names/s "
+          f"({scalar_elapsed / numbers_elapsed:.1f}x, numbers only, no result dicts)")
+
+
+if __name__ == "__main__":
+    main()
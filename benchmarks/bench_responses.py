@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hd_batch  # noqa: E402
+import responses  # noqa: E402
+import synastry  # noqa: E402
+from ephemeris_table import PLANETS, get_ephemeris_table  # noqa: E402
+from numerology_api import numerology_batch  # noqa: E402
+
+# Payload size and serialization time per endpoint and response format, from
+# the json.dumps/jsonify the services used before responses.py to msgpack and
+# compressed bodies. Formats whose package is not installed are skipped.
+#   python benchmarks/bench_responses.py --births 10000 --members 100
+
+
+def birth_chart_batch_payload(count):
+    table = get_ephemeris_table()
+    if table is None:
+        return None
+    jds = np.random.default_rng(0).uniform(2415385.5, 2488069.5, count)
+    columns, _ = table.birth_chart_columns(jds)
+    planets = {planet: {name: values.tolist() for name, values in columns[planet].items()} for planet in PLANETS}
+    return {"status": "success", "count": count, "planets": planets, "uncovered_rows": []}
+
+
+def hd_batch_payload(count):
+    jds = np.random.default_rng(1).uniform(2415385.5, 2488069.5, count)
+    records = hd_batch.to_records(hd_batch.human_design_batch(jds))
+    return {"status": "success", "count": count, "human_design": records}
+
+
+def synastry_payload(members):
+    longitudes = np.random.default_rng(2).uniform(0.0, 360.0, (members, len(PLANETS)))
+    report = synastry.compatibility(longitudes, PLANETS, 5)
+    return {
+        "status": "success",
+        "Members": [{"Name": f"Member {i}", "Resolved Place": "Bangkok, Thailand",
+                     "Calculated UTC Time": "1990-05-01 03:30:00 UTC"} for i in range(members)],
+        "Planets": list(PLANETS), "Harmony": report["harmony"], "Tension": report["tension"],
+        "Pairs": report["pairs"],
+    }
+
+
+def natal_payload():
+    signs = ("Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo", "Libra", "Scorpio", "Sagittarius",
+             "Capricorn", "Aquarius", "Pisces")
+    return {
+        "status": "success",
+        "Birth Info": {"Birth Date": "1990-05-01", "Birth Time": "10:30", "Birth Place": "Bangkok, Thailand"},
+        "Western Astrology": {
+            "Planets": [{"name": p, "sign": signs[i], "sign_symbol": "*", "degree": 12.345678, "house": i + 1}
+                        for i, p in enumerate(PLANETS)],
+            "Houses": [{"house": h, "sign": signs[h - 1], "degree": 3.14159} for h in range(1, 13)],
+            "Ascendant": {"sign": "Leo", "degree": 4.5}, "Midheaven (MC)": {"sign": "Taurus", "degree": 27.1},
+        },
+        "Calculation Inputs": {"Resolved Place": "Bangkok, Thailand", "Latitude": 13.7563, "Longitude": 100.5018,
+                               "Timezone Name": "Asia/Bangkok", "Calculated UTC Time": "1990-05-01 03:30:00 UTC"},
+        "Accuracy Note": "Location and timezone are dynamically calculated for accuracy.",
+    }
+
+
+def numerology_payload(count):
+    names = [f"Name Variant {i}" for i in range(count)]
+    return {"status": "success", "count": count,
+            "results": [{"input": n, "result": r} for n, r in zip(names, numerology_batch(names))]}
+
+
+def _time(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = function()
+        best = min(best, time.perf_counter() - start)
+    return len(body), best
+
+
+def formats():
+    yield "json.dumps indent=4", lambda p: json.dumps(p, default=str, indent=4).encode("utf-8")
+    yield "json.dumps compact", lambda p: json.dumps(p, default=str, separators=(",", ":")).encode("utf-8")
+    yield "responses JSON", lambda p: responses.encode(p)[0]
+    yield "responses compact", lambda p: responses.encode(p, schema=responses.COMPACT_SCHEMA)[0]
+    if responses.msgpack is not None:
+        yield "responses msgpack", lambda p: responses.encode(p, accept="application/msgpack")[0]
+    yield "responses JSON+gzip", lambda p: responses.encode(p, accept_encoding="gzip")[0]
+    yield "compact+gzip", lambda p: responses.encode(p, accept_encoding="gzip", schema="compact")[0]
+    if responses.brotli is not None:
+        yield "responses JSON+br", lambda p: responses.encode(p, accept_encoding="br")[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Response size and serialization benchmark")
+    parser.add_argument("--births", type=int, default=10000, help="rows in the birth chart batch")
+    parser.add_argument("--hd", type=int, default=2000, help="rows in the Human Design batch")
+    parser.add_argument("--members", type=int, default=100, help="synastry group size")
+    parser.add_argument("--names", type=int, default=10000, help="names in the numerology batch")
+    parser.add_argument("--repeat", type=int, default=3, help="best-of repeats per format")
+    args = parser.parse_args(argv)
+
+    payloads = {
+        "calculate_natal": natal_payload(),
+        "calculate_birth_chart/batch": birth_chart_batch_payload(args.births),
+        "calculate_hd/batch": hd_batch_payload(args.hd),
+        "calculate_synastry": synastry_payload(args.members),
+        "calculate_numerology/batch": numerology_payload(args.names),
+    }
+    print(f"orjson: {responses.orjson is not None}  msgpack: {responses.msgpack is not None}  "
+          f"brotli: {responses.brotli is not None}")
+    for endpoint, payload in payloads.items():
+        if payload is None:
+            print(f"\n{endpoint}: skipped (python ephemeris_table.py build)")
+            continue
+        print(f"\n{endpoint}")
+        baseline = None
+        for label, encode in formats():
+            size, elapsed = _time(lambda: encode(payload), args.repeat)
+            baseline = baseline or size
+            print(f"  {label:<22} {size:>12,} bytes ({size / baseline:>5.0%}) {elapsed * 1000:>9.2f} ms")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
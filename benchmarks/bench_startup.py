@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Time to first response for each service from a cold interpreter: start a
+# fresh process, import the service, send one request through the Flask test
+# client. --warm-up also runs serving.warm_up() before the request, the way
+# serve() does before gunicorn forks (the cost of a preloaded master).
+#   python benchmarks/bench_startup.py
+#   python benchmarks/bench_startup.py --warm-up --runs 5
+
+# (service module, method, path, JSON body)
+REQUESTS = (
+    ("numerology_api", "POST", "/calculate_numerology", {"name": "Jane Doe"}),
+    ("numerology_api", "GET", "/healthz", None),
+    ("vedic_calculator_api", "GET", "/healthz", None),
+    ("app_1", "GET", "/healthz", None),
+    ("natal_chart_calculator_immanuel", "GET", "/healthz", None),
+    ("human_design_api", "GET", "/healthz", None),
+    ("birth_chart_api", "GET", "/healthz", None),
+    ("profile_api", "GET", "/healthz", None),
+)
+
+_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {service}
+imported = time.perf_counter()
+if {warm_up}:
+    import serving
+    serving.warm_up()
+warmed = time.perf_counter()
+response = {service}.app.test_client().open({path!r}, method={method!r}, json={body!r})
+done = time.perf_counter()
+json.dump({{"import": imported - start, "warm_up": warmed - imported, "request": done - warmed,
+           "status": response.status_code}}, sys.stdout)
+"""
+
+
+def first_response(service, method, path, body, warm_up):
+    script = _SCRIPT.format(service=service, method=method, path=path, body=body, warm_up=warm_up)
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=ROOT)
+    wall = time.perf_counter() - started
+    if process.returncode != 0:
+        return {"error": process.stderr.strip().splitlines()[-1]}
+    return {**json.loads(process.stdout), "total": wall}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Service cold start benchmark")
+    parser.add_argument("--warm-up", action="store_true", help="run serving.warm_up() before the first request")
+    parser.add_argument("--runs", type=int, default=3, help="cold starts per service (median reported)")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'service':<34} {'request':<28} {'import':>8} {'warm-up':>8} {'request':>8} {'total':>8}")
+    for service, method, path, body in REQUESTS:
+        runs = [first_response(service, method, path, body, args.warm_up) for _ in range(args.runs)]
+        label = f"{method} {path}"
+        failed = next((run for run in runs if "error" in run), None)
+        if failed is not None:
+            print(f"{service:<34} {label:<28} failed: {failed['error']}")
+            results.append({"service": service, "request": label, "error": failed["error"]})
+            continue
+        median = {key: sorted(run[key] for run in runs)[len(runs) // 2]
+                  for key in ("import", "warm_up", "request", "total")}
+        print(f"{service:<34} {label:<28} " + " ".join(
+            f"{median[key] * 1000:>6.0f}ms" for key in ("import", "warm_up", "request", "total")))
+        results.append({"service": service, "request": label, "status": runs[0]["status"], **median})
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"warm_up": args.warm_up, "runs": args.runs, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synastry  # noqa: E402
+from ephemeris_table import PLANETS  # noqa: E402
+
+# Group compatibility time by group size (longitudes are random: the cost
+# depends only on the number of members).
+#   python benchmarks/bench_synastry.py --members 50,100,200,300
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synastry matrix benchmark")
+    parser.add_argument("--members", default="10,50,100,200,300", help="comma-separated group sizes")
+    parser.add_argument("--max-aspects", type=int, default=5, help="aspects listed per pair")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    print(f"{'members':>8} {'tensor':>9} {'scores':>9} {'aspects':>9} {'total':>9}")
+    for members in (int(m) for m in args.members.split(",")):
+        longitudes = rng.uniform(0.0, 360.0, (members, len(PLANETS)))
+        start = time.perf_counter()
+        aspect, strength = synastry.aspect_tensor(longitudes)
+        tensor = time.perf_counter()
+        synastry.pair_scores(aspect, strength, PLANETS)
+        scores = time.perf_counter()
+        synastry.pair_aspects(aspect, strength, PLANETS, args.max_aspects)
+        done = time.perf_counter()
+        print(f"{members:>8} {tensor - start:>8.3f}s {scores - tensor:>8.3f}s "
+              f"{done - scores:>8.3f}s {done - start:>8.3f}s")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
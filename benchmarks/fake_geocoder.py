@@ -0,0 +1,145 @@
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Local stand-in for Nominatim's /search, for benchmarks and load tests that
+# must not hit the real service. Every query resolves to one of CITIES: the one
+# it starts with, else one picked by a hash of the query, so the same text
+# always gets the same answer and timezones resolve to a real zone. Latency,
+# errors and "not found" answers are configurable.
+#
+#   python benchmarks/fake_geocoder.py --port 8088 --latency-ms 150 --error-rate 0.01
+#   NOMINATIM_DOMAIN=127.0.0.1:8088 NOMINATIM_SCHEME=http NOMINATIM_MIN_INTERVAL=0 \
+#       python vedic_calculator_api.py --dev
+
+# (name, latitude, longitude, display name)
+CITIES = (
+    ("Bangkok", 13.7563, 100.5018, "Bangkok, Thailand"),
+    ("Chiang Mai", 18.7883, 98.9853, "Chiang Mai, Thailand"),
+    ("Tokyo", 35.6762, 139.6503, "Tokyo, Japan"),
+    ("Mumbai", 19.0760, 72.8777, "Mumbai, Maharashtra, India"),
+    ("Delhi", 28.7041, 77.1025, "Delhi, India"),
+    ("Sydney", -33.8688, 151.2093, "Sydney, New South Wales, Australia"),
+    ("London", 51.5074, -0.1278, "London, Greater London, England, United Kingdom"),
+    ("Paris", 48.8566, 2.3522, "Paris, Ile-de-France, France"),
+    ("Berlin", 52.5200, 13.4050, "Berlin, Germany"),
+    ("New York", 40.7128, -74.0060, "New York, United States"),
+    ("Los Angeles", 34.0522, -118.2437, "Los Angeles, California, United States"),
+    ("Sao Paulo", -23.5505, -46.6333, "Sao Paulo, Brazil"),
+    ("Cairo", 30.0444, 31.2357, "Cairo, Egypt"),
+    ("Nairobi", -1.2921, 36.8219, "Nairobi, Kenya"),
+    ("Moscow", 55.7558, 37.6173, "Moscow, Russia"),
+    ("Singapore", 1.3521, 103.8198, "Singapore"),
+)
+
+
+class FakeNominatim(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, not_found_rate=0.0, seed=0):
+        super().__init__(address, _Handler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.not_found_rate = not_found_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.not_found = 0
+        self._lock = threading.Lock()
+
+    @property
+    def domain(self):
+        host, port = self.server_address[:2]
+        return f"{host}:{port}"
+
+    def stats(self):
+        return {"requests": self.requests, "errors": self.errors, "not_found": self.not_found,
+                "latency_ms": self.latency_ms, "jitter_ms": self.jitter_ms,
+                "error_rate": self.error_rate, "not_found_rate": self.not_found_rate}
+
+    def answer(self, query):
+        """(status, body) for one /search query, after the configured delay."""
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms))
+            roll = self.random.random()
+        time.sleep(delay / 1000.0)
+        if roll < self.error_rate:
+            with self._lock:
+                self.errors += 1
+            return 503, {"error": "fake geocoder: injected failure"}
+        if roll < self.error_rate + self.not_found_rate or not query.strip():
+            with self._lock:
+                self.not_found += 1
+            return 200, []
+        folded = query.casefold()
+        city = next((c for c in CITIES if folded.startswith(c[0].casefold())), None)
+        if city is None:
+            city = CITIES[zlib.crc32(folded.encode("utf-8")) % len(CITIES)]
+        name, latitude, longitude, display_name = city
+        return 200, [{
+            "place_id": zlib.crc32(display_name.encode("utf-8")),
+            "lat": f"{latitude:.7f}", "lon": f"{longitude:.7f}",
+            "display_name": display_name, "class": "place", "type": "city", "importance": 0.8,
+            "boundingbox": [f"{latitude - 0.2:.7f}", f"{latitude + 0.2:.7f}",
+                            f"{longitude - 0.2:.7f}", f"{longitude + 0.2:.7f}"],
+        }]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/stats":
+            status, body = 200, self.server.stats()
+        elif url.path in ("/search", "/search.php"):
+            status, body = self.server.answer(parse_qs(url.query).get("q", [""])[0])
+        else:
+            status, body = 404, {"error": "not found"}
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(host="127.0.0.1", port=0, **options):
+    """Run a FakeNominatim on a background thread; shut it down with .shutdown()."""
+    server = FakeNominatim((host, port), **options)
+    threading.Thread(target=server.serve_forever, name="fake-geocoder", daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local fake Nominatim /search server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay before every answer")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="+/- uniform jitter on the delay")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of queries answered with 503")
+    parser.add_argument("--not-found-rate", type=float, default=0.0, help="share of queries with no result")
+    args = parser.parse_args(argv)
+
+    server = FakeNominatim((args.host, args.port), latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                           error_rate=args.error_rate, not_found_rate=args.not_found_rate)
+    print(f"fake Nominatim on http://{server.domain}/search (NOMINATIM_DOMAIN={server.domain} NOMINATIM_SCHEME=http)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
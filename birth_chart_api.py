@@ -1,15 +1,58 @@
-from flask import Flask, request, jsonify
-from datetime import datetime
-import pytz
-from geopy.geocoders import Nominatim
-from timezonefinder import TimezoneFinder
+import os
+
+import numpy as np
+from flask import Flask, request
+from werkzeug.exceptions import HTTPException
+import instrumentation
+import responses
+from responses import respond
+from idempotency import birth_data_inputs, idempotent
+from serving import resolve_place, run_chart, serve
+from timezones import BirthTimeError, resolve_birth_moment
+from chart_cache import add_stats_route, cached_chart
+from chart_records import BirthChartRecord
 
 # ใช้ไลบรารีโหราศาสตร์
-from immanuel import Chart as ImmanuelChart, const as ImmanuelConst
+import engines
+from ephemeris_table import PLANETS as TABLE_PLANETS, get_ephemeris_table
+from solar_arc import datetime_to_jd, utc_to_julian_days
+
+# immanuel โหลดตอนคำนวณดวงครั้งแรก (engines.py) ไม่ใช่ตอน import service
+immanuel = engines.lazy("immanuel")
 
 app = Flask(__name__)
+instrumentation.init_app(app)
+responses.init_app(app)
+add_stats_route(app)
+
+PLANETS = [
+    "SUN", "MOON", "MERCURY", "VENUS", "MARS",
+    "JUPITER", "SATURN", "URANUS", "NEPTUNE", "PLUTO"
+]
+
+@cached_chart("birth_chart", record=BirthChartRecord)
+def compute_birth_chart(birth_datetime_utc, latitude, longitude):
+    # ตำแหน่งดาวจากเวลา UTC ที่ resolve แล้ว (ใช้ร่วมกับ profile_api.py)
+    table = get_ephemeris_table()
+    if table is not None and table.covers(datetime_to_jd(birth_datetime_utc)):
+        # เส้นทางเร็ว: interpolate จากตาราง ephemeris (python ephemeris_table.py build)
+        # ไม่ต้องสร้าง ImmanuelChart ทั้งดวง
+        return table.birth_chart(birth_datetime_utc)
+
+    chart = immanuel.Chart(birth_datetime_utc, latitude, longitude)
+    chart_data = {}
+    for planet in PLANETS:
+        planet_const = getattr(immanuel.const, planet)
+        p_info = chart.ephemeris[planet_const]
+        chart_data[planet] = {
+            "longitude": p_info.longitude,
+            "sign": p_info.get_sign_name(),
+            "degree": p_info.get_degree_in_sign()
+        }
+    return chart_data
 
 @app.route("/calculate_birth_chart", methods=["POST"])
+@idempotent(birth_data_inputs)
 def calculate_birth_chart():
     try:
         birth_data = request.get_json()
@@ -19,60 +62,90 @@ def calculate_birth_chart():
         
         # ตรวจสอบข้อมูล
         if not birth_date_str or not birth_time_str or not birth_place_raw:
-            return jsonify({"status": "error", "message": "Missing required fields."}), 400
+            return respond({"status": "error", "message": "Missing required fields."}), 400
         
         # หาตำแหน่งและ timezone
-        geolocator = Nominatim(user_agent="birth_chart_api")
-        tf = TimezoneFinder()
-        location = geolocator.geocode(birth_place_raw)
+        location = resolve_place(birth_place_raw, user_agent="birth_chart_api")
         if location is None:
-            return jsonify({"status": "error", "message": f"Birth place '{birth_place_raw}' not found."}), 400
+            return respond({"status": "error", "message": f"Birth place '{birth_place_raw}' not found."}), 400
         
         latitude = location.latitude
         longitude = location.longitude
-        timezone_name = tf.timezone_at(lng=longitude, lat=latitude)
-        if timezone_name is None:
-            return jsonify({"status": "error", "message": f"Timezone not found for '{birth_place_raw}'."}), 400
-        
-        local_timezone = pytz.timezone(timezone_name)
         try:
-            birth_datetime_naive = datetime.strptime(f"{birth_date_str} {birth_time_str}", '%Y-%m-%d %H:%M')
-        except Exception:
-            return jsonify({"status": "error", "message": "Invalid Birth Date or Birth Time format. Use YYYY-MM-DD and HH:MM."}), 400
-        
-        # แปลงเป็นเวลาท้องถิ่นและ UTC
-        birth_datetime_local = local_timezone.localize(birth_datetime_naive, is_dst=None)
-        birth_datetime_utc = birth_datetime_local.astimezone(pytz.utc)
+            moment = resolve_birth_moment(birth_date_str, birth_time_str, latitude, longitude, birth_place_raw)
+        except BirthTimeError as e:
+            return respond(e.to_dict()), 400
+        timezone_name = moment.timezone_name
+        birth_datetime_utc = moment.utc
 
-        chart = ImmanuelChart(birth_datetime_utc, latitude, longitude)
-        planets = [
-            "SUN", "MOON", "MERCURY", "VENUS", "MARS",
-            "JUPITER", "SATURN", "URANUS", "NEPTUNE", "PLUTO"
-        ]
-        chart_data = {}
-        for planet in planets:
-            planet_const = getattr(ImmanuelConst, planet)
-            p_info = chart.ephemeris[planet_const]
-            chart_data[planet] = {
-                "longitude": p_info.longitude,
-                "sign": p_info.get_sign_name(),
-                "degree": p_info.get_degree_in_sign()
-            }
-        return jsonify({
+        chart_data = run_chart(compute_birth_chart, birth_datetime_utc, latitude, longitude)
+        with instrumentation.stage("serialize"):
+            return respond({
+                "status": "success",
+                "inputs": {
+                    "Birth Date": birth_date_str,
+                    "Birth Time": birth_time_str,
+                    "Birth Place": birth_place_raw,
+                    "Resolved Address": location.address,
+                    "Latitude": latitude,
+                    "Longitude": longitude,
+                    "Timezone Name": timezone_name,
+                },
+                "birth_chart": chart_data
+            })
+    except HTTPException:
+        # 503 / 504 from serving.py
+        raise
+    except Exception as e:
+        return respond({"status": "error", "message": str(e)}), 500
+
+BIRTH_CHART_BATCH_LIMIT = int(os.environ.get("BIRTH_CHART_BATCH_LIMIT", "500000"))
+def birth_chart_batch(julian_days):
+    # ตำแหน่งดาวของทุกแถวพร้อมกันจากตาราง ephemeris, คืนค่าเป็นคอลัมน์ต่อดาว
+    table = get_ephemeris_table()
+    columns, covered = table.birth_chart_columns(julian_days)
+    uncovered = np.nonzero(~covered)[0].tolist()
+    result = {}
+    for planet in TABLE_PLANETS:
+        column = {name: values.tolist() for name, values in columns[planet].items()}
+        for i in uncovered:
+            for values in column.values():
+                values[i] = None
+        result[planet] = column
+    return result, uncovered
+
+@app.route("/calculate_birth_chart/batch", methods=["POST"])
+def calculate_birth_chart_batch():
+    # รับ {"utc": [...], "latitude": [...], "longitude": [...]} แล้วคืนค่าแบบคอลัมน์
+    # (ตำแหน่งดาวเป็น geocentric จึงไม่ขึ้นกับ lat/lon แต่ตรวจให้ยาวเท่ากันเพื่อให้แถวตรงกัน)
+    data = request.get_json(silent=True) or {}
+    utc = data.get("utc")
+    latitudes = data.get("latitude")
+    longitudes = data.get("longitude")
+    if not isinstance(utc, list) or not isinstance(latitudes, list) or not isinstance(longitudes, list):
+        return respond({"status": "error", "message": "Expected JSON arrays: utc, latitude, longitude."}), 400
+    if not len(utc) == len(latitudes) == len(longitudes):
+        return respond({"status": "error", "message": "utc, latitude and longitude must have the same length."}), 400
+    if len(utc) > BIRTH_CHART_BATCH_LIMIT:
+        return respond({"status": "error", "message": f"At most {BIRTH_CHART_BATCH_LIMIT} births per batch."}), 400
+    if get_ephemeris_table() is None:
+        return respond({"status": "error",
+                        "message": "Batch charts need the ephemeris table (python ephemeris_table.py build)."}), 503
+    try:
+        julian_days = utc_to_julian_days(utc)
+    except ValueError as e:
+        return respond({"status": "error", "message": str(e)}), 400
+
+    with instrumentation.stage("chart"):
+        columns, uncovered = birth_chart_batch(julian_days)
+    with instrumentation.stage("serialize"):
+        return respond({
             "status": "success",
-            "inputs": {
-                "Birth Date": birth_date_str,
-                "Birth Time": birth_time_str,
-                "Birth Place": birth_place_raw,
-                "Resolved Address": location.address,
-                "Latitude": latitude,
-                "Longitude": longitude,
-                "Timezone Name": timezone_name,
-            },
-            "birth_chart": chart_data
+            "count": len(utc),
+            "planets": columns,
+            # แถวที่อยู่นอกช่วงตาราง (1900-2100) มีค่าเป็น null
+            "uncovered_rows": uncovered
         })
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5003)
\ No newline at end of file
+    serve(app, port=5003)
\ No newline at end of file
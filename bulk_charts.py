@@ -0,0 +1,291 @@
+import argparse
+import csv
+import hashlib
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from geocoding import normalize_place, resolve_place
+from timezones import BirthTimeError, resolve_birth_moment
+from vedic_engine import AYANAMSAS, DEFAULT_AYANAMSA, normalize_ayanamsa
+
+# Offline chart generation for a whole subscriber sheet.
+#
+#   python bulk_charts.py subscribers.csv --out reports/ --kinds vedic,natal,hd
+#
+# Input is CSV or JSONL with the columns the sign-up forms collect (fullName,
+# email, birthDate/dob, birthTime, birthPlace; the API's "Birth Date" style
+# names work too). Places are deduplicated and resolved once, through the
+# same cache / gazetteer / Nominatim chain as the services, then rows are
+# computed in chunks on one process per core. Every finished chunk is written
+# to its own part file and recorded in checkpoint.json, so rerunning the same
+# command after a crash only computes the chunks that are missing.
+
+# kind -> (output section, module, function)
+KINDS = {
+    "vedic": ("Vedic Astrology", "vedic_calculator_api", "compute_vedic"),
+    "natal": ("Western Astrology", "natal_chart_calculator_immanuel", "compute_natal"),
+    "birth_chart": ("Birth Chart", "birth_chart_api", "compute_birth_chart"),
+    "hd": ("Human Design", "human_design_api", "compute_human_design"),
+    "numerology": ("Numerology", "numerology_api", "numerology_analysis"),
+}
+
+COLUMNS = {
+    "Full Name": ("Full Name", "fullName", "name", "full_name"),
+    "Email Address": ("Email Address", "email", "Email"),
+    "Birth Date": ("Birth Date", "birthDate", "dob", "birth_date"),
+    "Birth Time": ("Birth Time", "birthTime", "birth_time"),
+    "Birth Place": ("Birth Place", "birthPlace", "birth_place"),
+}
+
+CHECKPOINT_NAME = "checkpoint.json"
+GEOCODE_USER_AGENT = "the_soul_weaver_bulk_charts"
+
+
+def read_rows(path):
+    if path.endswith((".jsonl", ".ndjson")):
+        with open(path, encoding="utf-8") as f:
+            raw_rows = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            raw_rows = list(csv.DictReader(f))
+
+    rows = []
+    for raw in raw_rows:
+        row = {}
+        for field, aliases in COLUMNS.items():
+            value = next((raw[a] for a in aliases if raw.get(a) not in (None, "")), None)
+            row[field] = value.strip() if isinstance(value, str) else value
+        rows.append(row)
+    return rows
+
+
+def resolve_places(rows, report_every=100):
+    """Resolve every distinct birth place once.
+
+    Returns {normalized place: ResolvedPlace, None when it does not exist, or
+    the error text when the lookup itself failed}."""
+    distinct = {}
+    for row in rows:
+        if row["Birth Place"]:
+            distinct.setdefault(normalize_place(row["Birth Place"]), row["Birth Place"])
+
+    places = {}
+    start = time.perf_counter()
+    for i, (key, raw) in enumerate(distinct.items(), 1):
+        try:
+            places[key] = resolve_place(raw, user_agent=GEOCODE_USER_AGENT)
+        except Exception as e:
+            print(f"  geocoding '{raw}' failed: {e}", file=sys.stderr)
+            places[key] = str(e)
+        if i % report_every == 0 or i == len(distinct):
+            print(f"  places {i}/{len(distinct)} ({time.perf_counter() - start:.1f}s)")
+    return places
+
+
+_computers = {}
+
+
+def _init_worker(kinds):
+    # One chart at a time per worker process, so vedic_engine does not need its
+    # own pools here.
+    from vedic_engine import engine
+    engine.mode = "inline"
+    for kind in kinds:
+        _, module, function = KINDS[kind]
+        _computers[kind] = getattr(importlib.import_module(module), function)
+
+
+def _compute_row(index, row, place, kinds, ayanamsa):
+    record = {"row": index, **row}
+    if not all([row["Birth Date"], row["Birth Time"], row["Birth Place"]]):
+        return {**record, "status": "error", "message": "Missing Birth Date, Birth Time, or Birth Place."}
+    if place is None:
+        return {**record, "status": "error", "message": f"Birth place '{row['Birth Place']}' not found."}
+    if isinstance(place, str):
+        # Network trouble, not a bad row: the chunk stays out of the checkpoint.
+        return {**record, "status": "error", "message": f"Geocoding failed: {place}", "retry": True}
+    try:
+        moment = resolve_birth_moment(row["Birth Date"], row["Birth Time"],
+                                      place.latitude, place.longitude, row["Birth Place"])
+    except BirthTimeError as e:
+        return {**record, **e.to_dict()}
+
+    record["status"] = "success"
+    for kind in kinds:
+        section, compute = KINDS[kind][0], _computers[kind]
+        try:
+            if kind == "vedic":
+                record[section] = compute(moment.local, moment.offset_hours, place.latitude, place.longitude,
+                                          ayanamsa=ayanamsa)
+            elif kind == "numerology":
+                name = row["Full Name"]
+                record[section] = compute(name) if name and any(c.isalpha() for c in name) else None
+            else:
+                record[section] = compute(moment.utc, place.latitude, place.longitude)
+        except Exception as e:
+            # Same as the profile endpoint: one failing chart keeps the others.
+            record[section] = {"status": "error", "message": str(e)}
+    record["Calculation Inputs"] = {
+        "Resolved Place": place.address,
+        "Latitude": place.latitude,
+        "Longitude": place.longitude,
+        "Timezone Name": moment.timezone_name,
+        "UTC Offset (Hours)": moment.offset_hours,
+        "Calculated UTC Time": moment.utc.strftime('%Y-%m-%d %H:%M:%S %Z'),
+    }
+    return record
+
+
+def _places_for(rows, places):
+    # Only the places a chunk needs travel to its worker.
+    keys = {normalize_place(row["Birth Place"]) for row in rows if row["Birth Place"]}
+    return {key: places.get(key) for key in keys}
+
+
+def _compute_chunk(task):
+    chunk, first_index, rows, places, kinds, ayanamsa = task
+    records = [
+        _compute_row(first_index + i, row, places.get(normalize_place(row["Birth Place"] or "")), kinds, ayanamsa)
+        for i, row in enumerate(rows)
+    ]
+    return chunk, records
+
+
+def _write_atomic(path, write):
+    tmp = path + ".tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def write_chunk(out_dir, chunk, records, fmt):
+    path = os.path.join(out_dir, f"part-{chunk:05d}.{fmt}")
+    if fmt == "jsonl":
+        def write(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, default=str, ensure_ascii=False) + "\n")
+    else:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # Chart sections have a different shape per kind; keep them as JSON text columns.
+        flat = [{k: json.dumps(v, default=str, ensure_ascii=False) if isinstance(v, (dict, list)) else v
+                 for k, v in record.items()} for record in records]
+
+        def write(tmp):
+            pq.write_table(pa.Table.from_pylist(flat), tmp)
+    _write_atomic(path, write)
+    return path
+
+
+def file_digest(path):
+    # Content hash of the input: an edit in place that keeps the row count must
+    # not resume a checkpoint written for the old rows.
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Checkpoint:
+    def __init__(self, out_dir, settings):
+        self.path = os.path.join(out_dir, CHECKPOINT_NAME)
+        self.settings = settings
+        self.done = set()
+
+    def load(self, restart=False):
+        if restart or not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved["settings"] != self.settings:
+            sys.exit(f"{self.path} was written with different settings {saved['settings']}; "
+                     "use the same arguments to resume or --restart to start over.")
+        self.done = set(saved["done"])
+
+    def mark_done(self, chunk):
+        self.done.add(chunk)
+
+        def write(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"settings": self.settings, "done": sorted(self.done)}, f)
+        _write_atomic(self.path, write)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute charts for every row of a CSV/JSONL file.")
+    parser.add_argument("input", help="CSV or JSONL (.jsonl / .ndjson) file of birth data")
+    parser.add_argument("--out", required=True, help="output directory for part files and the checkpoint")
+    parser.add_argument("--kinds", default="vedic,natal,hd",
+                        help=f"comma-separated chart kinds: {', '.join(KINDS)}")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), default="jsonl")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--ayanamsa", default=DEFAULT_AYANAMSA, help=", ".join(AYANAMSAS))
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    args = parser.parse_args(argv)
+
+    kinds = [k.strip() for k in args.kinds.split(",") if k.strip()]
+    unknown = [k for k in kinds if k not in KINDS]
+    if unknown:
+        parser.error(f"unknown chart kinds: {', '.join(unknown)}")
+    ayanamsa = normalize_ayanamsa(args.ayanamsa)
+    if args.format == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            sys.exit("--format parquet needs pyarrow (pip install pyarrow).")
+
+    os.makedirs(args.out, exist_ok=True)
+    rows = read_rows(args.input)
+    checkpoint = Checkpoint(args.out, {
+        "input": os.path.abspath(args.input), "sha256": file_digest(args.input), "rows": len(rows),
+        "kinds": kinds, "format": args.format, "chunk_size": args.chunk_size, "ayanamsa": ayanamsa,
+    })
+    checkpoint.load(args.restart)
+
+    chunks = [(c, c * args.chunk_size) for c in range((len(rows) + args.chunk_size - 1) // args.chunk_size)]
+    pending = [(c, first) for c, first in chunks if c not in checkpoint.done]
+    pending_rows = sum(len(rows[first:first + args.chunk_size]) for _, first in pending)
+    print(f"{len(rows)} rows, {len(chunks)} chunks, {len(chunks) - len(pending)} already done")
+    if not pending:
+        return
+
+    print("resolving places")
+    places = resolve_places([row for _, first in pending for row in rows[first:first + args.chunk_size]])
+
+    print(f"computing {', '.join(kinds)} on {args.workers} workers")
+    tasks = (
+        (c, first, chunk_rows, _places_for(chunk_rows, places), kinds, ayanamsa)
+        for c, first in pending
+        for chunk_rows in [rows[first:first + args.chunk_size]]
+    )
+    start = time.perf_counter()
+    computed = errors = retry_chunks = 0
+    with multiprocessing.Pool(args.workers, initializer=_init_worker, initargs=(kinds,)) as pool:
+        for chunk, records in pool.imap_unordered(_compute_chunk, tasks):
+            path = write_chunk(args.out, chunk, records, args.format)
+            if any(record.get("retry") for record in records):
+                retry_chunks += 1
+            else:
+                checkpoint.mark_done(chunk)
+            computed += len(records)
+            errors += sum(record["status"] != "success" for record in records)
+            elapsed = time.perf_counter() - start
+            rate = computed / elapsed
+            print(f"  {path}: {computed}/{pending_rows} rows, {rate:,.1f} rows/s, "
+                  f"eta {(pending_rows - computed) / rate:,.0f}s")
+
+    elapsed = time.perf_counter() - start
+    print(f"done: {computed} rows ({errors} with errors) in {elapsed:.1f}s, {computed / elapsed:,.1f} rows/s")
+    if retry_chunks:
+        print(f"{retry_chunks} chunks had geocoding failures and were not checkpointed; rerun to retry them.")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
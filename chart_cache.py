@@ -0,0 +1,150 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from responses import respond
+
+from geocoding import place_cache
+from instrumentation import register_cache, stage
+
+# Bounded LRU + TTL cache in front of the chart constructors.
+# Keys are (chart kind, UTC minute, rounded lat, rounded lon, variant), where the
+# variant is whatever else changes the chart (ayanamsa, house system).
+# Cached results are shared between requests and must be treated as read-only
+# (charts cached as chart_records are rendered into a new dict on every call).
+
+CHART_CACHE_SIZE = int(os.environ.get("CHART_CACHE_SIZE", "10000"))
+CHART_CACHE_TTL = float(os.environ.get("CHART_CACHE_TTL", str(24 * 3600)))
+# Decimal places kept from latitude/longitude; 2 places is roughly 1 km.
+CHART_CACHE_PRECISION = int(os.environ.get("CHART_CACHE_PRECISION", "2"))
+
+MISSING = object()
+
+
+def chart_key(kind, birth_datetime, latitude, longitude, variant=None):
+    # birth_datetime must be timezone-aware; local and UTC datetimes of the same
+    # instant give the same key.
+    utc_minute = int(birth_datetime.timestamp() // 60)
+    return (kind, utc_minute, round(latitude, CHART_CACHE_PRECISION),
+            round(longitude, CHART_CACHE_PRECISION), variant)
+
+
+class ChartCache:
+    def __init__(self, max_entries=CHART_CACHE_SIZE, ttl=CHART_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return MISSING
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": self.hits / lookups if lookups else None,
+            }
+
+
+chart_cache = ChartCache()
+register_cache("chart", lambda: (chart_cache.hits, chart_cache.misses))
+
+
+def cached_chart(kind, variant=None, record=None):
+    """Cache a compute_* function whose first argument is an aware birth datetime
+    and whose last two arguments without a default are latitude and longitude.
+
+    Its arguments with defaults (e.g. ayanamsa) become part of the cache key,
+    defaulted ones included, so leaving out a default and passing it give the
+    same entry. With `record` (a chart_records class) the cache holds compact
+    records and every call returns a dict freshly rendered from one."""
+    def decorator(compute):
+        signature = inspect.signature(compute)
+        required = [p.name for p in signature.parameters.values() if p.default is p.empty]
+        latitude_name, longitude_name = required[-2:]
+
+        def cache_key(*args, **options):
+            bound = signature.bind(*args, **options)
+            bound.apply_defaults()
+            arguments = bound.arguments
+            defaulted = tuple((name, value) for name, value in arguments.items() if name not in required)
+            key_variant = (variant,) + defaulted if defaulted else variant
+            return chart_key(kind, arguments[required[0]], arguments[latitude_name], arguments[longitude_name],
+                             key_variant)
+
+        def compact(*args, **options):
+            # The value the cache stores (and chart workers send back).
+            result = compute(*args, **options)
+            return result if record is None else record.compact(result)
+
+        def render(value):
+            return value.to_dict() if record is not None and isinstance(value, record) else value
+
+        @functools.wraps(compute)
+        def wrapper(*args, **options):
+            with stage("chart"):
+                return render(chart_cache.get_or_compute(cache_key(*args, **options),
+                                                         lambda: compact(*args, **options)))
+
+        wrapper.cache_key = cache_key
+        wrapper.uncached = compute
+        wrapper.compact = compact
+        wrapper.render = render
+        return wrapper
+    return decorator
+
+
+def add_stats_route(app):
+    # GET /cache_stats: counters for sizing the chart and place caches.
+    @app.route("/cache_stats", methods=["GET"])
+    def cache_stats():
+        return respond({
+            "status": "success",
+            "chart_cache": chart_cache.stats(),
+            "place_cache": {"hits": place_cache.hits, "misses": place_cache.misses},
+        })
+    return app
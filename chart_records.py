@@ -0,0 +1,266 @@
+import struct
+
+import engines
+from ephemeris_table import PLANETS as BIRTH_CHART_PLANETS, SIGNS
+from panchanga import NAKSHATRA_NAMES, TITHI_NAMES
+from vedic_core import CALCULATION_MODES
+from vedic_engine import AYANAMSA_LABELS, AYANAMSAS
+
+# Compact chart records for the chart cache.
+#
+# A cached chart used to be the nested dict the service returns (a dict per
+# planet repeating "sign" / "sign_symbol" / "degree" / "house"), about 5-10 KB
+# each. A record keeps the same chart as one immutable bytes value: float64
+# degrees / longitudes, then one byte per sign, house, tithi or nakshatra index.
+# Names are looked up in SIGNS / TITHI_KEYS / NAKSHATRA_NAMES (the keys of
+# vedic_calculator_api's TITHI_REPORT / NAKSHATRA_REPORT) when the response is
+# rendered, so a record costs a few hundred bytes and millions fit in memory.
+#
+#   @cached_chart("natal", variant="PLACIDUS", record=NatalRecord)
+#
+# makes the cache hold records and every call return record.to_dict().
+# compact(result) only returns a record when its to_dict() gives back exactly
+# the same result; anything else (an engine that names signs differently, an
+# unexpected field) is cached as the dict it was.
+#
+# pack() / unpack() turn a record into bytes and back (one type byte + the
+# record's own bytes), for an on-disk or shared-memory cache:
+#   python benchmarks/bench_chart_records.py
+
+immanuel = engines.lazy("immanuel")
+
+SIGN_SYMBOLS = ("♈", "♉", "♊", "♋", "♌", "♍",
+                "♎", "♏", "♐", "♑", "♒", "♓")
+SIGN_INDEX = {name: i for i, name in enumerate(SIGNS)}
+# Same order as TITHI_REPORT: the 14 paksha tithis, then full and new moon.
+TITHI_KEYS = TITHI_NAMES + ("PURNIMA", "AMAVASYA")
+TITHI_INDEX = {name: i for i, name in enumerate(TITHI_KEYS)}
+NAKSHATRA_INDEX = {name: i for i, name in enumerate(NAKSHATRA_NAMES)}
+
+_record_types = {}  # type byte -> record class
+_vedic_report = None
+
+
+def register_record(cls):
+    """Make `cls` known to unpack() under its `type_code`."""
+    if _record_types.setdefault(cls.type_code, cls) is not cls:
+        raise ValueError(f"record type code {cls.type_code} is already used")
+    return cls
+
+
+def register_vedic_report(report):
+    # vedic_calculator_api passes its report(tithi, nakshatra) function, so
+    # VedicRecord renders the same interpretations without importing the service.
+    global _vedic_report
+    _vedic_report = report
+
+
+class ChartRecord:
+    """One chart as an immutable bytes value; subclasses define the layout."""
+
+    __slots__ = ("data",)
+    type_code = None
+
+    def __init__(self, data):
+        self.data = bytes(data)
+
+    @classmethod
+    def from_result(cls, result):
+        raise NotImplementedError
+
+    def to_dict(self):
+        raise NotImplementedError
+
+    @classmethod
+    def compact(cls, result):
+        """A record for `result`, or `result` itself when no record renders it back exactly."""
+        try:
+            record = cls.from_result(result)
+            if record.to_dict() == result:
+                return record
+        except (KeyError, IndexError, TypeError, ValueError, AttributeError, ImportError, struct.error):
+            pass
+        return result
+
+    def pack(self):
+        return bytes((self.type_code,)) + self.data
+
+    def __reduce__(self):
+        # Chart workers send records back to the service process this way.
+        return type(self), (self.data,)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.data == other.data
+
+    def __hash__(self):
+        return hash((self.type_code, self.data))
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {len(self.data)} bytes>"
+
+
+def _floats(values):
+    # An int degree would come back as a float (and render as "15.0"), so only
+    # float results are packed.
+    values = list(values)
+    if not all(isinstance(value, float) for value in values):
+        raise TypeError("expected float degrees")
+    return values
+
+
+def unpack(data):
+    """The record pack() was given."""
+    view = memoryview(data)
+    return _record_types[view[0]](view[1:])
+
+
+def pack_many(records):
+    """Records as one bytes value: a 4-byte length before each packed record."""
+    parts = []
+    for record in records:
+        packed = record.pack()
+        parts.append(struct.pack("<I", len(packed)))
+        parts.append(packed)
+    return b"".join(parts)
+
+
+def unpack_many(data):
+    """The records of pack_many(), read straight from `data` (bytes, mmap, shared memory)."""
+    view = memoryview(data)
+    records = []
+    offset = 0
+    while offset < len(view):
+        (length,) = struct.unpack_from("<I", view, offset)
+        offset += 4
+        records.append(unpack(view[offset:offset + length]))
+        offset += length
+    return records
+
+
+_NATAL_PLANETS = None
+
+
+def natal_planets():
+    # The planets compute_natal lists, in its order (immanuel.const.PLANETS).
+    global _NATAL_PLANETS
+    if _NATAL_PLANETS is None:
+        _NATAL_PLANETS = tuple(immanuel.const.PLANETS)
+    return _NATAL_PLANETS
+
+
+def _natal_struct(planets):
+    # planet degrees, 12 cusp degrees, ascendant, MC | planet signs, planet
+    # houses, cusp signs, ascendant sign, MC sign
+    return struct.Struct(f"<B{planets + 14}d{2 * planets + 14}B")
+
+
+@register_record
+class NatalRecord(ChartRecord):
+    """compute_natal: planets with sign / degree / house, Placidus cusps, ascendant and MC."""
+
+    __slots__ = ()
+    type_code = 1
+    _structs = {}
+
+    @classmethod
+    def _struct(cls, planets):
+        layout = cls._structs.get(planets)
+        if layout is None:
+            layout = cls._structs.setdefault(planets, _natal_struct(planets))
+        return layout
+
+    @classmethod
+    def from_result(cls, result):
+        planets, houses = result["Planets"], result["Houses"]
+        if len(houses) != 12:
+            raise ValueError("expected 12 house cusps")
+        points = planets + houses + [result["Ascendant"], result["Midheaven (MC)"]]
+        degrees = _floats(point["degree"] for point in points)
+        codes = ([SIGN_INDEX[p["sign"]] for p in planets] + [p["house"] for p in planets]
+                 + [SIGN_INDEX[h["sign"]] for h in houses]
+                 + [SIGN_INDEX[result["Ascendant"]["sign"]], SIGN_INDEX[result["Midheaven (MC)"]["sign"]]])
+        return cls(cls._struct(len(planets)).pack(len(planets), *degrees, *codes))
+
+    def to_dict(self):
+        planets = self.data[0]
+        values = self._struct(planets).unpack(self.data)
+        degrees, codes = values[1:planets + 15], values[planets + 15:]
+        signs, houses = codes[:planets], codes[planets:2 * planets]
+        cusp_signs = codes[2 * planets:2 * planets + 12]
+        return {
+            "Planets": [
+                {"name": name, "sign": SIGNS[signs[i]], "sign_symbol": SIGN_SYMBOLS[signs[i]],
+                 "degree": degrees[i], "house": houses[i]}
+                for i, name in enumerate(natal_planets()[:planets])
+            ],
+            "Houses": [
+                {"house": i + 1, "sign": SIGNS[cusp_signs[i]], "degree": degrees[planets + i]}
+                for i in range(12)
+            ],
+            "Ascendant": {"sign": SIGNS[codes[-2]], "degree": degrees[-2]},
+            "Midheaven (MC)": {"sign": SIGNS[codes[-1]], "degree": degrees[-1]},
+        }
+
+
+@register_record
+class BirthChartRecord(ChartRecord):
+    """compute_birth_chart: longitude, sign and degree in sign per planet."""
+
+    __slots__ = ()
+    type_code = 2
+    _layout = struct.Struct(f"<{2 * len(BIRTH_CHART_PLANETS)}d{len(BIRTH_CHART_PLANETS)}B")
+
+    @classmethod
+    def from_result(cls, result):
+        rows = [result[planet] for planet in BIRTH_CHART_PLANETS]
+        if len(result) != len(rows):
+            raise ValueError("unexpected planets")
+        return cls(cls._layout.pack(*_floats(row["longitude"] for row in rows), *_floats(row["degree"] for row in rows),
+                                    *[SIGN_INDEX[row["sign"]] for row in rows]))
+
+    def to_dict(self):
+        count = len(BIRTH_CHART_PLANETS)
+        values = self._layout.unpack(self.data)
+        return {
+            planet: {"longitude": values[i], "sign": SIGNS[values[2 * count + i]], "degree": values[count + i]}
+            for i, planet in enumerate(BIRTH_CHART_PLANETS)
+        }
+
+
+@register_record
+class VedicRecord(ChartRecord):
+    """compute_vedic: tithi, Moon nakshatra + pada, Moon / Saturn / Rahu / Ketu signs, ayanamsa, mode."""
+
+    __slots__ = ()
+    type_code = 3
+    _layout = struct.Struct("<9B")
+
+    @classmethod
+    def from_result(cls, result):
+        if _vedic_report is None:
+            raise ValueError("no vedic report registered")
+        data = result["VedicData"]
+        return cls(cls._layout.pack(
+            TITHI_INDEX[data["Tithi"]], NAKSHATRA_INDEX[data["Nakshatra"]], data["Nakshatra Pada"],
+            SIGN_INDEX[data["Moon Sign"]], SIGN_INDEX[data["Saturn Sign"]],
+            SIGN_INDEX[data["Rahu Sign"]], SIGN_INDEX[data["Ketu Sign"]],
+            AYANAMSAS.index(next(k for k, label in AYANAMSA_LABELS.items() if label == data["Ayanamsa"])),
+            CALCULATION_MODES.index(data["Calculation Mode"]),
+        ))
+
+    def to_dict(self):
+        tithi, nakshatra, pada, moon, saturn, rahu, ketu, ayanamsa, mode = self._layout.unpack(self.data)
+        return {
+            "VedicData": {
+                "Tithi": TITHI_KEYS[tithi],
+                "Nakshatra": NAKSHATRA_NAMES[nakshatra],
+                "Nakshatra Pada": pada,
+                "Moon Sign": SIGNS[moon],
+                "Saturn Sign": SIGNS[saturn],
+                "Rahu Sign": SIGNS[rahu],
+                "Ketu Sign": SIGNS[ketu],
+                "Ayanamsa": AYANAMSA_LABELS[AYANAMSAS[ayanamsa]],
+                "Calculation Mode": CALCULATION_MODES[mode],
+            },
+            "Report": _vedic_report(TITHI_KEYS[tithi], NAKSHATRA_NAMES[nakshatra]),
+        }
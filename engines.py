@@ -0,0 +1,189 @@
+import argparse
+import importlib
+import json
+import subprocess
+import sys
+import time
+
+# Heavy libraries are imported on first use instead of at module load:
+#
+#   immanuel = engines.lazy("immanuel")
+#   ...
+#   chart = immanuel.Chart(...)   # the first attribute access imports immanuel
+#
+# so a service only pays for the engines its requests actually use, and the
+# numerology service, /healthz and the CLIs never load PyJHora, immanuel,
+# humandesign, geopy or timezonefinder. warm_up() imports every engine that
+# has been declared (and runs the hooks registered with on_warm_up); serving.py
+# calls it before gunicorn forks so the workers share one loaded copy.
+#
+#   python engines.py report                 # import time per module, per service
+#   python engines.py report --warm-up vedic_calculator_api
+
+SERVICES = (
+    "vedic_calculator_api", "app_1", "natal_chart_calculator_immanuel", "human_design_api",
+    "birth_chart_api", "numerology_api", "profile_api",
+)
+
+_lazy_modules = {}  # name -> LazyModule
+_import_seconds = {}  # name -> seconds its first import took in this process
+_warm_up_hooks = []
+
+
+class LazyModule:
+    """Stands in for a module until one of its attributes is used."""
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            module = self.__dict__["_module"] = load(self.__dict__["_name"])
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return f"<lazy module '{self.__dict__['_name']}' ({state})>"
+
+
+def lazy(name):
+    """A LazyModule for `name`, shared by every module that declares it."""
+    module = _lazy_modules.get(name)
+    if module is None:
+        module = _lazy_modules.setdefault(name, LazyModule(name))
+    return module
+
+
+def load(name):
+    """Import `name` now, recording how long the first import took."""
+    module = sys.modules.get(name)
+    if module is None:
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        _import_seconds.setdefault(name, time.perf_counter() - start)
+    return module
+
+
+def on_warm_up(hook):
+    """Run `hook()` in warm_up(), after the engines are imported. Usable as a decorator."""
+    _warm_up_hooks.append(hook)
+    return hook
+
+
+def warm_up():
+    """Import every declared engine and run the warm-up hooks; {name: seconds} per step.
+
+    An engine that is not installed is skipped here; the requests that need it
+    fail with the ImportError as before."""
+    timings = {}
+    for name, module in list(_lazy_modules.items()):
+        start = time.perf_counter()
+        try:
+            module._load()
+        except ImportError:
+            continue
+        timings[name] = time.perf_counter() - start
+    for hook in _warm_up_hooks:
+        start = time.perf_counter()
+        hook()
+        timings[getattr(hook, "__qualname__", repr(hook))] = time.perf_counter() - start
+    return timings
+
+
+def loaded():
+    """{engine: loaded?} for every declared engine."""
+    return {name: module.__dict__["_module"] is not None for name, module in sorted(_lazy_modules.items())}
+
+
+def import_seconds():
+    """{engine: seconds} for the engines imported so far in this process."""
+    return dict(_import_seconds)
+
+
+# --- Import-time report ---
+
+_REPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {service}
+imported = time.perf_counter()
+import engines
+warm = engines.warm_up() if {warm_up} else {{}}
+json.dump({{"import": imported - start, "warm_up": warm, "engines": engines.loaded()}}, sys.stdout)
+"""
+
+
+def _parse_importtime(stderr, service):
+    # -X importtime lines: "import time: self [us] | cumulative | <indent>name",
+    # a module's own imports listed (one level deeper) before it.
+    rows = []
+    for line in stderr.splitlines():
+        parts = line[len("import time:"):].split("|") if line.startswith("import time:") else ()
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        cumulative_us, name = parts[1], parts[2]
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        rows.append((depth, int(cumulative_us), name.strip()))
+    for index in range(len(rows) - 1, -1, -1):
+        if rows[index][2] == service:
+            break
+    else:
+        return []
+    depth = rows[index][0]
+    direct = []
+    for child_depth, cumulative, name in reversed(rows[:index]):
+        if child_depth <= depth:
+            break
+        if child_depth == depth + 1:
+            direct.append((cumulative / 1e6, name))
+    return sorted(direct, reverse=True)
+
+
+def report(service, warm_up_engines=False, top=12):
+    """Import a service in a fresh interpreter and describe where the time went."""
+    script = _REPORT_SCRIPT.format(service=service, warm_up=warm_up_engines)
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", script], capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if process.returncode != 0:
+        return {"service": service, "error": process.stderr.strip().splitlines()[-1]}
+    result = json.loads(process.stdout)
+    result.update(service=service, process=wall, modules=_parse_importtime(process.stderr, service)[:top])
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lazy engine loading: import-time report.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    report_parser = sub.add_parser("report", help="import time per module for each service")
+    report_parser.add_argument("services", nargs="*", default=SERVICES)
+    report_parser.add_argument("--warm-up", action="store_true", help="also time warm_up() after the import")
+    report_parser.add_argument("--top", type=int, default=12, help="modules listed per service")
+    args = parser.parse_args(argv)
+
+    for service in args.services:
+        result = report(service, args.warm_up, args.top)
+        if "error" in result:
+            print(f"{service}: failed to import ({result['error']})\n")
+            continue
+        print(f"{service}: import {result['import'] * 1000:.0f} ms, process {result['process'] * 1000:.0f} ms")
+        for seconds, name in result["modules"]:
+            print(f"  {seconds * 1000:>8.1f} ms  {name}")
+        for name, seconds in result["warm_up"].items():
+            print(f"  {seconds * 1000:>8.1f} ms  warm_up: {name}")
+        not_loaded = [name for name, is_loaded in result["engines"].items() if not is_loaded]
+        if not_loaded:
+            print(f"  not loaded: {', '.join(not_loaded)}")
+        print()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
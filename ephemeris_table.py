@@ -0,0 +1,246 @@
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytz
+import swisseph as swe
+
+from solar_arc import HD_NODE, datetime_to_jd, jd_to_datetime
+
+# Precomputed geocentric longitudes of the ten birth chart planets (and the mean
+# lunar node, for Human Design), so a birth chart is a table lookup instead of a
+# full ImmanuelChart.
+#
+# Table layout (.npy, float64, shape (rows, bodies, 2)):
+#   row 0            [[start Julian day (UT), step in days], 0, ..., [swisseph body of the node column, 0]]
+#   row 1 + i, b     [unwrapped longitude, speed in deg/day] of TABLE_BODIES[b] at start + i * step
+# Tables built before the node column have the ten planets only; tables whose
+# node column is not HD_NODE (early builds tabulated the true node) are read
+# as planets only, and Human Design then computes the node with swisseph.
+# Longitudes are unwrapped per planet (no jump at 360), and values between rows
+# use cubic Hermite interpolation on longitude + speed. Because the speed goes
+# through zero at a station, the curve turns round smoothly there instead of
+# overshooting the way a linear or value-only spline does near a retrograde.
+#
+# The file is memory-mapped: every worker shares the same pages.
+
+EPHEMERIS_TABLE_PATH = os.environ.get(
+    "EPHEMERIS_TABLE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "ephemeris.npy"),
+)
+TABLE_START = (1900, 1, 1)
+TABLE_END = (2100, 12, 31)
+# One day keeps the Moon within a fraction of an arc-second.
+TABLE_STEP_DAYS = 1.0
+
+PLANETS = ("SUN", "MOON", "MERCURY", "VENUS", "MARS",
+           "JUPITER", "SATURN", "URANUS", "NEPTUNE", "PLUTO")
+# The node Human Design uses (solar_arc.HD_NODE).
+TABLE_BODIES = PLANETS + (HD_NODE,)
+_SWE_PLANETS = [getattr(swe, name) for name in PLANETS]
+_SWE_BODIES = [getattr(swe, name) for name in TABLE_BODIES]
+SIGNS = ("Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo",
+         "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces")
+
+
+def build_table(path=EPHEMERIS_TABLE_PATH, step=TABLE_STEP_DAYS):
+    start = swe.julday(*TABLE_START, 0.0)
+    end = swe.julday(*TABLE_END, 24.0)
+    jds = np.arange(start, end + step, step)
+    table = np.zeros((len(jds) + 1, len(TABLE_BODIES), 2))
+    table[0, 0] = (start, step)
+    table[0, len(PLANETS), 0] = _SWE_BODIES[-1]
+    flags = swe.FLG_SWIEPH | swe.FLG_SPEED
+    for i, jd in enumerate(jds):
+        for p, body in enumerate(_SWE_BODIES):
+            position = swe.calc_ut(jd, body, flags)[0]
+            table[i + 1, p] = (position[0], position[3])
+    table[1:, :, 0] = np.rad2deg(np.unwrap(np.deg2rad(table[1:, :, 0]), axis=0))
+    np.save(path, table)
+    return len(jds)
+
+
+class EphemerisTable:
+    def __init__(self, path=EPHEMERIS_TABLE_PATH):
+        # Plain ndarray views of the mapping: indexing an np.memmap is several
+        # times slower and this is the hot path.
+        table = np.asarray(np.load(path, mmap_mode="r"))
+        self.start, self.step = float(table[0, 0, 0]), float(table[0, 0, 1])
+        self._rows = table[1:]
+        self.longitudes = table[1:, :, 0]
+        self.speeds = table[1:, :, 1]
+        self.end = self.start + self.step * (len(self._rows) - 1)
+        node_column = table.shape[1] > len(PLANETS) and int(table[0, len(PLANETS), 0]) == _SWE_BODIES[-1]
+        self.bodies = TABLE_BODIES if node_column else PLANETS
+
+    def covers(self, jd):
+        return self.start <= jd < self.end
+
+    def positions(self, jd):
+        """Longitudes (0-360) and speeds (deg/day) of the table's bodies at `jd`, as two arrays."""
+        if not self.covers(jd):
+            raise ValueError("Date outside the ephemeris table (1900-2100).")
+        position = (jd - self.start) / self.step
+        i = int(position)
+        t = position - i
+        h = self.step
+        (p0, m0), (p1, m1) = self._rows[i:i + 2].transpose(0, 2, 1)
+        m0, m1 = m0 * h, m1 * h
+        t2, t3 = t * t, t * t * t
+        value = ((2 * t3 - 3 * t2 + 1) * p0 + (t3 - 2 * t2 + t) * m0
+                 + (-2 * t3 + 3 * t2) * p1 + (t3 - t2) * m1)
+        speed = ((6 * t2 - 6 * t) * p0 + (3 * t2 - 4 * t + 1) * m0
+                 + (-6 * t2 + 6 * t) * p1 + (3 * t2 - 2 * t) * m1) / h
+        return value % 360.0, speed
+
+    def positions_batch(self, jds):
+        """positions() for an array of Julian days: (n, bodies) longitudes and speeds.
+
+        Rows outside the table come back as NaN."""
+        jds = np.asarray(jds, dtype=np.float64)
+        covered = (jds >= self.start) & (jds < self.end)
+        position = np.where(covered, (jds - self.start) / self.step, 0.0)
+        i = position.astype(np.intp)
+        t = (position - i)[:, None]
+        h = self.step
+        p0, m0 = self._rows[i, :, 0], self._rows[i, :, 1] * h
+        p1, m1 = self._rows[i + 1, :, 0], self._rows[i + 1, :, 1] * h
+        t2, t3 = t * t, t * t * t
+        value = ((2 * t3 - 3 * t2 + 1) * p0 + (t3 - 2 * t2 + t) * m0
+                 + (-2 * t3 + 3 * t2) * p1 + (t3 - t2) * m1)
+        speed = ((6 * t2 - 6 * t) * p0 + (3 * t2 - 4 * t + 1) * m0
+                 + (-6 * t2 + 6 * t) * p1 + (3 * t2 - 2 * t) * m1) / h
+        value %= 360.0
+        value[~covered] = np.nan
+        speed[~covered] = np.nan
+        return value, speed
+
+    def birth_chart_columns(self, jds):
+        """birth_chart() for many births at once, as columns per planet.
+
+        Returns ({planet: {"longitude": array, "sign": array of names, "degree":
+        array}}, boolean array of rows the table covers)."""
+        longitudes, _ = self.positions_batch(jds)
+        covered = ~np.isnan(longitudes[:, 0])
+        sign_index = (np.nan_to_num(longitudes) // 30.0).astype(np.intp) % 12
+        sign_names = np.array(SIGNS, dtype=object)
+        columns = {}
+        for p, planet in enumerate(PLANETS):
+            columns[planet] = {
+                "longitude": longitudes[:, p],
+                "sign": sign_names[sign_index[:, p]],
+                "degree": longitudes[:, p] % 30.0,
+            }
+        return columns, covered
+
+    def birth_chart(self, birth_datetime_utc):
+        # Same fields as the ImmanuelChart path of compute_birth_chart.
+        longitudes, _ = self.positions(datetime_to_jd(birth_datetime_utc))
+        chart = {}
+        for planet, longitude in zip(PLANETS, longitudes.tolist()):
+            chart[planet] = {
+                "longitude": longitude,
+                "sign": SIGNS[int(longitude // 30) % 12],
+                "degree": longitude % 30.0,
+            }
+        return chart
+
+    def stations(self, planet):
+        """Julian days (row resolution) where `planet` changes direction."""
+        speeds = self.speeds[:, PLANETS.index(planet)]
+        rows = np.nonzero(np.diff(np.sign(speeds)) != 0)[0]
+        return self.start + self.step * rows
+
+
+_table = None
+
+
+def get_ephemeris_table():
+    """Return the process-wide EphemerisTable, or None when it has not been built."""
+    global _table
+    if _table is None and os.path.exists(EPHEMERIS_TABLE_PATH):
+        _table = EphemerisTable(EPHEMERIS_TABLE_PATH)
+    return _table
+
+
+def _reference(reference):
+    if reference == "swisseph":
+        flags = swe.FLG_SWIEPH | swe.FLG_SPEED
+        return lambda dt: [swe.calc_ut(datetime_to_jd(dt), body, flags)[0][0] for body in _SWE_PLANETS]
+    from immanuel import Chart as ImmanuelChart, const as ImmanuelConst
+    return lambda dt: [ImmanuelChart(dt, 0.0, 0.0).ephemeris[getattr(ImmanuelConst, name)].longitude
+                       for name in PLANETS]
+
+
+def _compare(table, reference, births):
+    errors = np.empty((len(births), len(PLANETS)))
+    table_elapsed = reference_elapsed = 0.0
+    for n, birth in enumerate(births):
+        start = time.perf_counter()
+        got = table.positions(datetime_to_jd(birth))[0][:len(PLANETS)]
+        table_elapsed += time.perf_counter() - start
+
+        start = time.perf_counter()
+        want = np.array(reference(birth))
+        reference_elapsed += time.perf_counter() - start
+        errors[n] = np.abs((got - want + 180.0) % 360.0 - 180.0) * 3600.0
+    return errors, table_elapsed / len(births), reference_elapsed / len(births)
+
+
+def _report(label, errors):
+    print(f"{label}: {len(errors)} samples, arc-seconds (max / p99)")
+    for p, planet in enumerate(PLANETS):
+        column = errors[:, p]
+        print(f"  {planet:<8} {column.max():8.3f} / {np.percentile(column, 99):8.3f}")
+
+
+def _validate(samples, seed, reference_name):
+    table = EphemerisTable()
+    reference = _reference(reference_name)
+    rng = random.Random(seed)
+    epoch = pytz.utc.localize(datetime(1900, 1, 2))
+    span_minutes = int((table.end - table.start - 2) * 1440)
+    births = [epoch + timedelta(minutes=rng.randrange(span_minutes)) for _ in range(samples)]
+    errors, table_us, reference_us = _compare(table, reference, births)
+    _report(f"random birth times vs {reference_name}", errors)
+
+    # Within a day of every Mercury..Pluto station, where interpolation is hardest.
+    near_stations = []
+    for planet in PLANETS[2:]:
+        stations = list(table.stations(planet))
+        for jd in rng.sample(stations, min(max(samples // 8, 1), len(stations))):
+            jd += rng.uniform(-1.0, 2.0)
+            if table.covers(jd):
+                near_stations.append(jd_to_datetime(jd))
+    _report(f"near retrograde stations vs {reference_name}", _compare(table, reference, near_stations)[0])
+
+    print(f"table lookup:    {table_us * 1e6:.1f} us/chart")
+    print(f"reference:       {reference_us * 1e6:.1f} us/chart")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or validate the planetary ephemeris table.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help=f"precompute planet longitudes {TABLE_START[0]}-{TABLE_END[0]}")
+    build.add_argument("--out", default=EPHEMERIS_TABLE_PATH)
+    build.add_argument("--step", type=float, default=TABLE_STEP_DAYS, help="days between rows")
+    validate = sub.add_parser("validate", help="arc-second error against immanuel (or swisseph)")
+    validate.add_argument("--samples", type=int, default=2000)
+    validate.add_argument("--seed", type=int, default=0)
+    validate.add_argument("--reference", choices=("immanuel", "swisseph"), default="immanuel")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        start = time.perf_counter()
+        rows = build_table(args.out, args.step)
+        print(f"wrote {rows} rows to {args.out} in {time.perf_counter() - start:.1f}s")
+    else:
+        _validate(args.samples, args.seed, args.reference)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,359 @@
+import argparse
+import difflib
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+import unicodedata
+
+from geocoding import ResolvedPlace, normalize_place
+
+# Offline place index built from a GeoNames dump (e.g. cities500.txt from
+# https://download.geonames.org/export/dump/).
+#
+# File layout (little endian, all sections 4-byte aligned):
+#   header     MAGIC, then 7 x uint32: place count, key count and the byte
+#              offsets of the place, key-offset, key-target, key-blob and
+#              country sections
+#   places     per place: float32 lat, float32 lon, uint32 population,
+#              uint32 offset of its display name in the key blob
+#   key offs   uint32 offsets into the key blob, sorted by key bytes
+#   key tgts   uint32 place index for each key
+#   key blob   NUL-terminated UTF-8 strings (normalized keys + display names);
+#              a key is "name\tISO\tadmin1 code" (GAZ1 indexes: "name\tISO")
+#   countries  "alias\tISO\n" and "alias\tISO.admin1\n" lines mapping country and
+#              first-level region names / codes to codes; an alias can have
+#              several lines ("georgia" -> GE and US.GA)
+#
+# The file is memory-mapped, so every worker process shares the same pages
+# and a lookup is a binary search over the sorted keys.
+#
+# Every qualifier after the name ("Springfield, Illinois, USA") must be a country
+# or region the index knows, and the place must be in it; a qualifier it cannot
+# check makes the lookup a miss, so the online geocoder answers it instead.
+
+GAZETTEER_PATH = os.environ.get(
+    "GAZETTEER_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazetteer.idx"),
+)
+
+MAGIC = b"GAZ2"
+READABLE = (b"GAZ1", MAGIC)
+_HEADER = struct.Struct("<4s7I")
+_PLACE = struct.Struct("<ffII")
+FUZZY_CUTOFF = 0.85
+FUZZY_WINDOW = 400
+
+
+def _strip_accents(text):
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def _key_variants(name):
+    key = normalize_place(name)
+    if not key:
+        return set()
+    return {key, _strip_accents(key)}
+
+
+def _read_countries(path):
+    # countryInfo.txt: ISO, ISO3, ISO-Numeric, fips, Country, ...
+    aliases = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 5:
+                continue
+            iso, iso3, country = cols[0], cols[1], cols[4]
+            for alias in (iso, iso3, country):
+                for variant in _key_variants(alias):
+                    aliases[variant] = iso
+    return aliases
+
+
+def _read_admin1(path):
+    # admin1CodesASCII.txt: "US.IL", name, ASCII name, geonameid
+    aliases = {}
+    names = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 3 or "." not in cols[0]:
+                continue
+            code = cols[0]
+            names[code] = cols[1]
+            short = code.partition(".")[2]
+            # Numeric codes ("TH.40") mean nothing to a user; letter codes ("IL") do.
+            for alias in (cols[1], cols[2], short if short.isalpha() else ""):
+                for variant in _key_variants(alias):
+                    aliases.setdefault(variant, set()).add(code)
+    return aliases, names
+
+
+def build_index(dump_path, out_path, countries_path=None, min_population=0, alternates=True, admin1_path=None):
+    country_aliases = _read_countries(countries_path) if countries_path else {}
+    admin1_aliases, admin1_names = _read_admin1(admin1_path) if admin1_path else ({}, {})
+    country_names = {}
+    for alias, iso in country_aliases.items():
+        if len(alias) > 3:
+            country_names.setdefault(iso, alias.title())
+
+    places = []  # (lat, lon, population, display name)
+    keys = []    # (key bytes, place index)
+    with open(dump_path, encoding="utf-8") as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 15:
+                continue
+            population = int(cols[14] or 0)
+            if population < min_population:
+                continue
+            name, ascii_name, alternate_names = cols[1], cols[2], cols[3]
+            iso, admin1 = cols[8], cols[10]
+            index = len(places)
+            region = admin1_names.get(f"{iso}.{admin1}")
+            display = ", ".join(part for part in (name, region if region != name else None,
+                                                  country_names.get(iso, iso)) if part)
+            places.append((float(cols[4]), float(cols[5]), min(population, 0xFFFFFFFF), display))
+
+            names = {name, ascii_name}
+            if alternates and alternate_names:
+                names.update(alternate_names.split(","))
+            variants = set()
+            for n in names:
+                variants |= _key_variants(n)
+            for variant in variants:
+                # Country and region codes ride along in the key so qualifiers can be
+                # checked without touching the place record.
+                keys.append((f"{variant}\t{iso}\t{admin1}".encode("utf-8"), index))
+
+    keys.sort()
+
+    blob = bytearray()
+    key_offsets = []
+    for key, _ in keys:
+        key_offsets.append(len(blob))
+        blob += key + b"\0"
+    name_offsets = []
+    for place in places:
+        name_offsets.append(len(blob))
+        blob += place[3].encode("utf-8") + b"\0"
+    while len(blob) % 4:
+        blob += b"\0"
+
+    qualifiers = sorted(country_aliases.items())
+    qualifiers += sorted((alias, code) for alias, codes in admin1_aliases.items() for code in codes)
+    countries = "".join(f"{alias}\t{code}\n" for alias, code in qualifiers).encode("utf-8")
+
+    places_at = _HEADER.size
+    key_offsets_at = places_at + _PLACE.size * len(places)
+    key_targets_at = key_offsets_at + 4 * len(keys)
+    blob_at = key_targets_at + 4 * len(keys)
+    countries_at = blob_at + len(blob)
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(_HEADER.pack(MAGIC, len(places), len(keys), places_at,
+                               key_offsets_at, key_targets_at, blob_at, countries_at))
+        for (lat, lon, population, _), name_offset in zip(places, name_offsets):
+            out.write(_PLACE.pack(lat, lon, population, name_offset))
+        out.write(struct.pack(f"<{len(keys)}I", *key_offsets))
+        out.write(struct.pack(f"<{len(keys)}I", *(index for _, index in keys)))
+        out.write(blob)
+        out.write(countries)
+    os.replace(tmp_path, out_path)
+    return len(places), len(keys)
+
+
+class Gazetteer:
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.place_count, self.key_count, self._places_at, key_offsets_at,
+         key_targets_at, self._blob_at, countries_at) = _HEADER.unpack_from(self._map, 0)
+        if magic not in READABLE:
+            raise ValueError(f"{path} is not a gazetteer index")
+        view = memoryview(self._map)
+        self._key_offsets = view[key_offsets_at:key_targets_at].cast("I")
+        self._key_targets = view[key_targets_at:self._blob_at].cast("I")
+        # alias -> [(ISO, admin1 code or None), ...]
+        self.qualifiers = {}
+        for line in self._map[countries_at:].decode("utf-8").splitlines():
+            alias, code = line.split("\t")
+            iso, _, admin1 = code.partition(".")
+            self.qualifiers.setdefault(alias, []).append((iso, admin1 or None))
+
+    def _string(self, offset):
+        start = self._blob_at + offset
+        return self._map[start:self._map.find(b"\0", start)]
+
+    def _key(self, i):
+        return self._string(self._key_offsets[i])
+
+    def _lower_bound(self, prefix):
+        lo, hi = 0, self.key_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _place(self, index):
+        lat, lon, population, name_offset = _PLACE.unpack_from(
+            self._map, self._places_at + index * _PLACE.size)
+        return population, ResolvedPlace(round(lat, 5), round(lon, 5), self._string(name_offset).decode("utf-8"))
+
+    @staticmethod
+    def _split_key(key):
+        # b"name\tISO\tadmin1" (or b"name\tISO" in GAZ1 indexes) -> (name, ISO, admin1)
+        name, iso, admin1 = (key.decode("utf-8").split("\t") + [""])[:3]
+        return name, iso, admin1
+
+    def _matches(self, name, accept):
+        # All places whose key is exactly `name` and whose country / region `accept`s.
+        prefix = f"{name}\t".encode("utf-8")
+        i = self._lower_bound(prefix)
+        while i < self.key_count:
+            key = self._key(i)
+            if not key.startswith(prefix):
+                break
+            _, iso, admin1 = self._split_key(key)
+            if accept(iso, admin1):
+                yield self._key_targets[i]
+            i += 1
+
+    def _best(self, indexes):
+        best = None
+        for index in indexes:
+            candidate = self._place(index)
+            if best is None or candidate[0] > best[0]:
+                best = candidate
+        return best[1] if best else None
+
+    def _prefixed(self, name, accept):
+        # Places whose name starts with `name` ("bangk" -> "bangkok"), most populous first.
+        prefix = name.encode("utf-8")
+        i = self._lower_bound(prefix)
+        end = min(i + FUZZY_WINDOW, self.key_count)
+        while i < end:
+            key = self._key(i)
+            if not key.startswith(prefix):
+                break
+            _, iso, admin1 = self._split_key(key)
+            if accept(iso, admin1):
+                yield self._key_targets[i]
+            i += 1
+
+    def _fuzzy(self, name, accept):
+        # Scan a window of keys sharing the first characters and pick the closest name.
+        stem = name[:3].encode("utf-8")
+        i = self._lower_bound(stem)
+        candidates = {}
+        for j in range(i, min(i + FUZZY_WINDOW, self.key_count)):
+            key = self._key(j)
+            if not key.startswith(stem):
+                break
+            key_name, iso, admin1 = self._split_key(key)
+            if accept(iso, admin1):
+                candidates.setdefault(key_name, []).append(self._key_targets[j])
+        close = difflib.get_close_matches(name, list(candidates), n=1, cutoff=FUZZY_CUTOFF)
+        return self._best(candidates[close[0]]) if close else None
+
+    def _qualifier(self, text):
+        # [(ISO, admin1 code or None), ...] a qualifier can mean; empty when unknown.
+        return self.qualifiers.get(text) or self.qualifiers.get(_strip_accents(text)) or []
+
+    def lookup(self, raw, fuzzy=False):
+        """The place `raw` names, or None to leave it to the online geocoder.
+
+        Every qualifier ("Springfield, Illinois, USA") must be a country or
+        region in the index that contains the place. Only exact names are
+        matched unless `fuzzy` is set; prefix and close-spelling matches would
+        turn an unknown or misspelled town into some other place without anyone
+        noticing."""
+        parts = normalize_place(raw).split(", ")
+        name = parts[0]
+        if not name:
+            return None
+        qualifiers = [self._qualifier(part) for part in parts[1:]]
+        if not all(qualifiers):
+            # A qualifier the index cannot check: picking the largest place
+            # with that name would be a confident wrong answer.
+            return None
+
+        def accept(iso, admin1):
+            return all(any(iso == q_iso and (q_admin1 is None or admin1 == q_admin1)
+                           for q_iso, q_admin1 in options)
+                       for options in qualifiers)
+
+        place = self._best(self._matches(name, accept))
+        if place is None and fuzzy:
+            place = self._best(self._prefixed(name, accept))
+        if place is None and fuzzy:
+            place = self._fuzzy(_strip_accents(name), accept)
+        return place
+
+    def sample_names(self, count, seed=0):
+        rng = random.Random(seed)
+        return [self._key(rng.randrange(self.key_count)).decode("utf-8").partition("\t")[0]
+                for _ in range(count)]
+
+
+_gazetteer = None
+
+
+def get_gazetteer():
+    """Return the process-wide Gazetteer, or None when no index has been built."""
+    global _gazetteer
+    if _gazetteer is None and os.path.exists(GAZETTEER_PATH):
+        _gazetteer = Gazetteer(GAZETTEER_PATH)
+    return _gazetteer
+
+
+def _bench(index_path, count):
+    gazetteer = Gazetteer(index_path)
+    names = gazetteer.sample_names(count)
+    misspelled = [n[:-1] + ("x" if n[-1:] != "x" else "y") for n in names]
+    for label, queries, fuzzy in (("exact", names, False), ("fuzzy", misspelled, True)):
+        hits = 0
+        start = time.perf_counter()
+        for query in queries:
+            hits += gazetteer.lookup(query, fuzzy=fuzzy) is not None
+        elapsed = time.perf_counter() - start
+        print(f"{label:>6}: {len(queries) / elapsed:,.0f} lookups/s "
+              f"({elapsed / len(queries) * 1e6:.1f} us/lookup, {hits}/{len(queries)} resolved)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or benchmark the offline gazetteer index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="build an index from a GeoNames dump")
+    build.add_argument("dump", help="GeoNames cities file, e.g. cities500.txt")
+    build.add_argument("--out", default=GAZETTEER_PATH)
+    build.add_argument("--countries", help="GeoNames countryInfo.txt for country-name qualifiers")
+    build.add_argument("--admin1", help="GeoNames admin1CodesASCII.txt for state / province qualifiers")
+    build.add_argument("--min-population", type=int, default=0)
+    build.add_argument("--no-alternates", action="store_true", help="skip alternate names")
+    bench = sub.add_parser("bench", help="measure lookups per second")
+    bench.add_argument("--index", default=GAZETTEER_PATH)
+    bench.add_argument("--count", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        start = time.perf_counter()
+        places, keys = build_index(args.dump, args.out, args.countries,
+                                   args.min_population, not args.no_alternates, args.admin1)
+        print(f"indexed {places} places under {keys} keys into {args.out} "
+              f"({os.path.getsize(args.out) / 1e6:.1f} MB, {time.perf_counter() - start:.1f}s)")
+    else:
+        _bench(args.index, args.count)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
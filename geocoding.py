@@ -0,0 +1,232 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, namedtuple
+
+import engines
+from instrumentation import register_cache, stage
+
+# Shared place resolution for every birth-data service.
+# Lookup order: in-process LRU -> SQLite store on disk -> offline gazetteer
+# (gazetteer.py, if an index has been built) -> Nominatim.
+# Places that Nominatim could not find are cached too (negative caching),
+# with a shorter TTL so a typo does not hit the network on every retry.
+
+PLACE_CACHE_PATH = os.environ.get(
+    "PLACE_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "place_cache.sqlite3"),
+)
+PLACE_CACHE_SIZE = int(os.environ.get("PLACE_CACHE_SIZE", "4096"))
+PLACE_CACHE_TTL = float(os.environ.get("PLACE_CACHE_TTL", str(30 * 24 * 3600)))
+PLACE_CACHE_NEGATIVE_TTL = float(os.environ.get("PLACE_CACHE_NEGATIVE_TTL", str(24 * 3600)))
+# Air-gapped workers: resolve only from the cache and the offline gazetteer.
+GEOCODER_OFFLINE = os.environ.get("GEOCODER_OFFLINE", "") not in ("", "0", "false")
+
+# Which Nominatim to ask: the public instance by default, or a self-hosted one /
+# the benchmark stand-in (benchmarks/fake_geocoder.py, NOMINATIM_SCHEME=http).
+NOMINATIM_DOMAIN = os.environ.get("NOMINATIM_DOMAIN", "nominatim.openstreetmap.org")
+NOMINATIM_SCHEME = os.environ.get("NOMINATIM_SCHEME", "https")
+NOMINATIM_TIMEOUT = float(os.environ.get("NOMINATIM_TIMEOUT", "1"))
+# Public Nominatim usage policy: at most one request per second. Only lower
+# this for a server of your own.
+NOMINATIM_MIN_INTERVAL = float(os.environ.get("NOMINATIM_MIN_INTERVAL", "1.0"))
+
+ResolvedPlace = namedtuple("ResolvedPlace", ["latitude", "longitude", "address"])
+
+MISSING = object()
+
+geocoders = engines.lazy("geopy.geocoders")
+
+
+def normalize_place(raw):
+    # "  bangkok ,Thailand " / "Bangkok, THAILAND" -> "bangkok, thailand"
+    text = unicodedata.normalize("NFKC", raw).casefold()
+    parts = [re.sub(r"\s+", " ", part).strip(" .") for part in text.split(",")]
+    return ", ".join(part for part in parts if part)
+
+
+class PlaceCache:
+    def __init__(self, path=PLACE_CACHE_PATH, max_entries=PLACE_CACHE_SIZE,
+                 ttl=PLACE_CACHE_TTL, negative_ttl=PLACE_CACHE_NEGATIVE_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()  # key -> (expires_at, ResolvedPlace or None)
+        self._lock = threading.Lock()
+        self._db = None
+        self._pid = None
+
+    def _connection(self):
+        # Opened on first use, once per process: gunicorn's preload_app forks the
+        # workers after import, and a SQLite handle must not cross a fork.
+        if self.path and (self._db is None or self._pid != os.getpid()):
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS places ("
+                " key TEXT PRIMARY KEY,"
+                " latitude REAL,"
+                " longitude REAL,"
+                " address TEXT,"
+                " expires_at REAL NOT NULL)"
+            )
+            self._db, self._pid = db, os.getpid()
+        return self._db
+
+    def get(self, key):
+        # Returns a ResolvedPlace, None for a cached "not found", or MISSING.
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] > now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._memory[key]
+
+            db = self._connection()
+            if db is not None:
+                row = db.execute(
+                    "SELECT latitude, longitude, address, expires_at FROM places WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is not None and row[3] > now:
+                    place = None if row[0] is None else ResolvedPlace(row[0], row[1], row[2])
+                    self._remember(key, row[3], place)
+                    self.hits += 1
+                    return place
+
+            self.misses += 1
+            return MISSING
+
+    def peek(self, key):
+        # get() from memory only, never waiting on the SQLite store: for callers
+        # that must not block (async_geocoding.py), which fall back to get() on a
+        # thread. A miss is left for that get() to count.
+        if not self._lock.acquire(blocking=False):
+            return MISSING
+        try:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            return MISSING
+        finally:
+            self._lock.release()
+
+    def put(self, key, place, persist=True):
+        ttl = self.ttl if place is not None else self.negative_ttl
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(key, expires_at, place)
+            db = self._connection() if persist else None
+            if db is not None:
+                db.execute(
+                    "INSERT OR REPLACE INTO places (key, latitude, longitude, address, expires_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key,
+                     place.latitude if place else None,
+                     place.longitude if place else None,
+                     place.address if place else None,
+                     expires_at),
+                )
+
+    def _remember(self, key, expires_at, place):
+        self._memory[key] = (expires_at, place)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def purge_expired(self):
+        with self._lock:
+            db = self._connection()
+            if db is not None:
+                db.execute("DELETE FROM places WHERE expires_at <= ?", (time.time(),))
+
+
+place_cache = PlaceCache()
+register_cache("place", lambda: (place_cache.hits, place_cache.misses))
+
+_geolocators = {}
+_network_lock = threading.Lock()
+_last_network_call = 0.0
+
+
+def _geolocator(user_agent):
+    geolocator = _geolocators.get(user_agent)
+    if geolocator is None:
+        geolocator = _geolocators.setdefault(user_agent, geocoders.Nominatim(
+            user_agent=user_agent, domain=NOMINATIM_DOMAIN, scheme=NOMINATIM_SCHEME, timeout=NOMINATIM_TIMEOUT))
+    return geolocator
+
+
+def _geocode_remote(raw, user_agent):
+    global _last_network_call
+    if NOMINATIM_MIN_INTERVAL <= 0:
+        # A server of our own without a rate limit: no need to queue.
+        return _geolocator(user_agent).geocode(raw)
+    # Serialise outbound calls so concurrent requests stay under the Nominatim rate limit.
+    with _network_lock:
+        geolocator = _geolocator(user_agent)
+        wait = NOMINATIM_MIN_INTERVAL - (time.monotonic() - _last_network_call)
+        if wait > 0:
+            time.sleep(wait)
+        try:
+            return geolocator.geocode(raw)
+        finally:
+            _last_network_call = time.monotonic()
+
+
+def resolve_place(raw, user_agent="the_soul_weaver_app", offload=None):
+    """Resolve a free-text birth place to a ResolvedPlace, or None if it does not exist.
+
+    Cache hits are answered in the calling thread; on a miss the gazetteer /
+    Nominatim lookup runs through `offload(fn, *args)` when one is given
+    (serving.py passes its bounded geocoding thread pool)."""
+    with stage("geocode"):
+        key = normalize_place(raw)
+        cached = place_cache.get(key)
+        if cached is not MISSING:
+            return cached
+        if offload is not None:
+            return offload(_lookup_place, key, raw, user_agent)
+        return _lookup_place(key, raw, user_agent)
+
+
+def _lookup_place(key, raw, user_agent):
+    place = offline_place(key, raw)
+    if place is not None or GEOCODER_OFFLINE:
+        return place
+    return remember_place(key, _geocode_remote(raw, user_agent))
+
+
+def offline_place(key, raw):
+    """Look a cache miss up in the offline gazetteer (exact names only); None when it
+    has no match, so the online geocoder gets the query."""
+    # Imported here: gazetteer.py itself builds on this module.
+    from gazetteer import get_gazetteer
+    gazetteer = get_gazetteer()
+    if gazetteer is None:
+        return None
+    place = gazetteer.lookup(raw)
+    if place is not None:
+        # The index is already on disk; keep the hit in memory only.
+        place_cache.put(key, place, persist=False)
+    return place
+
+
+def remember_place(key, location):
+    # Cache a geocoder answer (a geopy Location or None) and return it as a ResolvedPlace.
+    place = None
+    if location is not None:
+        place = ResolvedPlace(location.latitude, location.longitude, location.address)
+    place_cache.put(key, place)
+    return place
@@ -0,0 +1,293 @@
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+import swisseph as swe
+
+from ephemeris_table import get_ephemeris_table
+from solar_arc import DESIGN_ARC, HD_BODIES, HD_NODE, body_longitudes, get_solar_arc_table
+
+# Human Design for many births at once, as NumPy arrays instead of one
+# hd.HumanDesign object per person.
+#
+#   longitude -> gate / line / color / tone
+#       The Rave Mandala starts gate 41 at 302 deg (2 deg Aquarius); every gate is
+#       5.625 deg, split into 6 lines x 6 colors x 6 tones. One array of the 13824
+#       tones round the wheel gives all four numbers from a single integer index.
+#   gates -> channels -> centers
+#       Each person's 26 activations become a 64-bit gate mask; a channel is
+#       defined when both of its gate bits are set, and the two centers it joins
+#       are then defined. Centers are a 9-bit mask.
+#   centers -> Type / Authority / Definition
+#       Connectivity between centers is a transitive closure over 9-bit
+#       reachability masks (a few rounds of OR), vectorized over all people.
+
+TONES_PER_GATE = 6 * 6 * 6
+WHEEL_START = 302.0
+GATE_ARC = 360.0 / 64
+TONE_ARC = GATE_ARC / TONES_PER_GATE
+
+# Gates in wheel order from WHEEL_START.
+WHEEL = (41, 19, 13, 49, 30, 55, 37, 63, 22, 36, 25, 17, 21, 51, 42, 3,
+         27, 24, 2, 23, 8, 20, 16, 35, 45, 12, 15, 52, 39, 53, 62, 56,
+         31, 33, 7, 4, 29, 59, 40, 64, 47, 6, 46, 18, 48, 57, 32, 50,
+         28, 44, 1, 43, 14, 34, 9, 5, 26, 11, 10, 58, 38, 54, 61, 60)
+
+CENTERS = ("Head", "Ajna", "Throat", "G", "Heart", "Sacral", "Solar Plexus", "Spleen", "Root")
+CENTER_GATES = {
+    "Head": (64, 61, 63),
+    "Ajna": (47, 24, 4, 17, 43, 11),
+    "Throat": (62, 23, 56, 35, 12, 45, 33, 8, 31, 20, 16),
+    "G": (1, 13, 25, 46, 2, 15, 10, 7),
+    "Heart": (21, 40, 26, 51),
+    "Sacral": (5, 14, 29, 59, 9, 3, 42, 27, 34),
+    "Solar Plexus": (6, 37, 22, 36, 49, 55, 30),
+    "Spleen": (48, 57, 44, 50, 32, 28, 18),
+    "Root": (53, 60, 52, 19, 39, 41, 58, 38, 54),
+}
+CHANNELS = ((1, 8), (2, 14), (3, 60), (4, 63), (5, 15), (6, 59), (7, 31), (9, 52), (10, 20),
+            (10, 34), (10, 57), (11, 56), (12, 22), (13, 33), (16, 48), (17, 62), (18, 58),
+            (19, 49), (20, 34), (20, 57), (21, 45), (23, 43), (24, 61), (25, 51), (26, 44),
+            (27, 50), (28, 38), (29, 46), (30, 41), (32, 54), (34, 57), (35, 36), (37, 40),
+            (39, 55), (42, 53), (47, 64))
+
+TYPES = ("Reflector", "Generator", "Manifesting Generator", "Manifestor", "Projector")
+STRATEGIES = {
+    "Reflector": "Wait a Lunar Cycle",
+    "Generator": "To Respond",
+    "Manifesting Generator": "To Respond",
+    "Manifestor": "To Inform",
+    "Projector": "Wait for the Invitation",
+}
+AUTHORITIES = ("Lunar", "Emotional", "Sacral", "Splenic", "Ego Manifested", "Ego Projected",
+               "Self-Projected", "Mental")
+DEFINITIONS = ("None", "Single", "Split", "Triple Split", "Quadruple Split")
+
+# One entry per tone round the wheel.
+_GATE_BY_TONE = np.repeat(np.array(WHEEL, dtype=np.int8), TONES_PER_GATE)
+_LINE_BY_TONE = np.tile(np.repeat(np.arange(1, 7, dtype=np.int8), 36), 64)
+_COLOR_BY_TONE = np.tile(np.repeat(np.arange(1, 7, dtype=np.int8), 6), 64 * 6)
+_TONE_BY_TONE = np.tile(np.arange(1, 7, dtype=np.int8), 64 * 36)
+
+_CENTER_OF_GATE = {gate: CENTERS.index(center) for center, gates in CENTER_GATES.items() for gate in gates}
+_CHANNEL_GATES = np.array([(1 << (a - 1)) | (1 << (b - 1)) for a, b in CHANNELS], dtype=np.uint64)
+_CHANNEL_ENDS = [(_CENTER_OF_GATE[a], _CENTER_OF_GATE[b]) for a, b in CHANNELS]
+_CHANNEL_CENTERS = np.array([(1 << a) | (1 << b) for a, b in _CHANNEL_ENDS], dtype=np.uint16)
+_BIT = {center: 1 << i for i, center in enumerate(CENTERS)}
+_MOTORS = _BIT["Heart"] | _BIT["Solar Plexus"] | _BIT["Root"]
+_EGO_MANIFESTED = CHANNELS.index((21, 45))
+
+
+def activations(longitudes):
+    """Gate, line, color and tone (int8 arrays shaped like `longitudes`) of tropical longitudes."""
+    offset = (np.asarray(longitudes, dtype=np.float64) - WHEEL_START) % 360.0
+    index = np.minimum((offset / TONE_ARC).astype(np.intp), len(_GATE_BY_TONE) - 1)
+    return _GATE_BY_TONE[index], _LINE_BY_TONE[index], _COLOR_BY_TONE[index], _TONE_BY_TONE[index]
+
+
+def _reachability(channels, centers):
+    # reach[:, c]: bitmask of the centers connected to center c (itself included
+    # when defined).
+    count = len(centers)
+    reach = np.zeros((count, len(CENTERS)), dtype=np.uint16)
+    for c in range(len(CENTERS)):
+        reach[:, c] = centers & (1 << c)
+    for k, (a, b) in enumerate(_CHANNEL_ENDS):
+        defined = channels[:, k]
+        reach[defined, a] |= np.uint16(1 << b)
+        reach[defined, b] |= np.uint16(1 << a)
+    # Path doubling: after n rounds paths of up to 2^n channels are joined; 9
+    # centers never need more than 8.
+    shifts = np.arange(len(CENTERS), dtype=np.uint16)
+    for _ in range(3):
+        via = ((reach[:, :, None] >> shifts) & 1).astype(bool)
+        reach = np.bitwise_or.reduce(np.where(via, reach[:, None, :], np.uint16(0)), axis=2)
+    return reach
+
+
+def evaluate(personality, design):
+    """Human Design for many people from (N, 13) personality and design longitudes
+    in HD_BODIES order. Returns a dict of NumPy arrays (see to_records)."""
+    longitudes = np.concatenate([np.asarray(personality, dtype=np.float64),
+                                 np.asarray(design, dtype=np.float64)], axis=1)
+    gates, lines, colors, tones = activations(longitudes)
+
+    gate_mask = np.bitwise_or.reduce(np.left_shift(np.uint64(1), (gates - 1).astype(np.uint64)), axis=1)
+    channels = (gate_mask[:, None] & _CHANNEL_GATES) == _CHANNEL_GATES
+    centers = np.bitwise_or.reduce(np.where(channels, _CHANNEL_CENTERS, np.uint16(0)), axis=1)
+    reach = _reachability(channels, centers)
+
+    def defined(name):
+        return (centers & _BIT[name]) != 0
+
+    throat = reach[:, CENTERS.index("Throat")]
+    motor_to_throat = (throat & _MOTORS) != 0
+    sacral_to_throat = (throat & _BIT["Sacral"]) != 0
+    types = np.select(
+        [centers == 0, defined("Sacral") & (motor_to_throat | sacral_to_throat), defined("Sacral"),
+         motor_to_throat],
+        [0, 2, 1, 3], default=4)
+    authorities = np.select(
+        [centers == 0, defined("Solar Plexus"), defined("Sacral"), defined("Spleen"),
+         defined("Heart") & channels[:, _EGO_MANIFESTED], defined("Heart"), defined("G")],
+        [0, 1, 2, 3, 4, 5, 6], default=7)
+
+    # One component per defined center that is the lowest bit of its own reach set.
+    lowest = reach & (~reach + np.uint16(1))
+    roots = (lowest == (np.uint16(1) << np.arange(len(CENTERS), dtype=np.uint16))) & (reach != 0)
+    components = roots.sum(axis=1)
+
+    sun = HD_BODIES.index("SUN")
+    return {
+        "gates": gates, "lines": lines, "colors": colors, "tones": tones,
+        "gate_mask": gate_mask, "channels": channels, "centers": centers,
+        "type": types, "authority": authorities,
+        "profile": np.stack([lines[:, sun], lines[:, len(HD_BODIES) + sun]], axis=1),
+        "definition": np.minimum(components, len(DEFINITIONS) - 1),
+    }
+
+
+def to_records(result):
+    """evaluate() output as one dict per person, in compute_human_design's shape
+    plus the activated gates and channels."""
+    records = []
+    bodies = [f"Personality {name}" for name in HD_BODIES] + [f"Design {name}" for name in HD_BODIES]
+    for i in range(len(result["type"])):
+        centers = int(result["centers"][i])
+        kind = TYPES[result["type"][i]]
+        records.append({
+            "Type": kind,
+            "Strategy": STRATEGIES[kind],
+            "Authority": AUTHORITIES[result["authority"][i]],
+            "Profile": "{}/{}".format(*result["profile"][i].tolist()),
+            "Definition": DEFINITIONS[result["definition"][i]],
+            "Defined Centers": [c for c in CENTERS if centers & _BIT[c]],
+            "Open Centers": [c for c in CENTERS if not centers & _BIT[c]],
+            "Channels": [f"{a}-{b}" for (a, b), on in zip(CHANNELS, result["channels"][i].tolist()) if on],
+            "Activations": {
+                body: "{}.{}".format(gate, line)
+                for body, gate, line in zip(bodies, result["gates"][i].tolist(), result["lines"][i].tolist())
+            },
+        })
+    return records
+
+
+def hd_longitudes(jds):
+    """(N, 13) longitudes of HD_BODIES at each Julian day: one batched lookup in the
+    ephemeris table when it is built (with its node column), else swisseph per row."""
+    jds = np.asarray(jds, dtype=np.float64)
+    table = get_ephemeris_table()
+    if table is None or HD_NODE not in table.bodies:
+        return np.array([body_longitudes(jd) for jd in jds.tolist()]).reshape(len(jds), len(HD_BODIES))
+    positions, _ = table.positions_batch(jds)
+    result = np.empty((len(jds), len(HD_BODIES)))
+    for b, name in enumerate(HD_BODIES):
+        if name in table.bodies:
+            result[:, b] = positions[:, table.bodies.index(name)]
+    node = positions[:, table.bodies.index(HD_NODE)]
+    result[:, HD_BODIES.index("NORTH_NODE")] = node
+    result[:, HD_BODIES.index("SOUTH_NODE")] = (node + 180.0) % 360.0
+    result[:, HD_BODIES.index("EARTH")] = (result[:, HD_BODIES.index("SUN")] + 180.0) % 360.0
+    # Rows outside the table (NaN) fall back to swisseph.
+    for i in np.nonzero(np.isnan(result).any(axis=1))[0].tolist():
+        result[i] = body_longitudes(float(jds[i]))
+    return result
+
+
+def _design_jd_swisseph(jd):
+    # Newton on the Sun's longitude, for births the solar arc table does not cover.
+    target = swe.calc_ut(jd, swe.SUN)[0][0] - DESIGN_ARC
+    design = jd - DESIGN_ARC / 0.9856
+    for _ in range(6):
+        position = swe.calc_ut(design, swe.SUN, swe.FLG_SWIEPH | swe.FLG_SPEED)[0]
+        step = ((position[0] - target + 180.0) % 360.0 - 180.0) / position[3]
+        design -= step
+        if abs(step) < 1e-7:
+            break
+    return design
+
+
+def design_jds(jds):
+    jds = np.asarray(jds, dtype=np.float64)
+    table = get_solar_arc_table()
+    if table is not None:
+        covered = table.covers_design(jds)
+        result = np.full(len(jds), np.nan)
+        result[covered] = table.design_jds(jds[covered])
+    else:
+        result = np.full(len(jds), np.nan)
+    for i in np.nonzero(np.isnan(result))[0].tolist():
+        result[i] = _design_jd_swisseph(float(jds[i]))
+    return result
+
+
+def human_design_batch(jds):
+    """evaluate() for births at the given Julian days (UT)."""
+    return evaluate(hd_longitudes(jds), hd_longitudes(design_jds(jds)))
+
+
+# hd.HumanDesign spells some values differently ("Solar_Plexus", "Emotional -
+# Solar Plexus", "Split Definition"); compare on lower-case words.
+_NOISE_WORDS = {"authority", "definition", "center", "centre", "centers"}
+_ALIASES = {"solar plexus": "emotional", "emotional solar plexus": "emotional", "splenic": "spleen"}
+
+
+def _normalize(value):
+    if isinstance(value, (list, tuple, set)):
+        return sorted(_normalize(v) for v in value)
+    words = str(value).lower().replace("_", " ").replace("-", " ").split()
+    text = " ".join(w for w in words if w not in _NOISE_WORDS)
+    return _ALIASES.get(text, text)
+
+
+def _validate(samples, seed):
+    import humandesign as hd
+
+    rng = random.Random(seed)
+    jds = np.array([rng.uniform(2415385.5, 2488069.5) for _ in range(samples)])
+    start = time.perf_counter()
+    personality, design = hd_longitudes(jds), hd_longitudes(design_jds(jds))
+    longitudes_elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    records = to_records(evaluate(personality, design))
+    batch_elapsed = time.perf_counter() - start
+
+    fields = ("Type", "Authority", "Profile", "Definition", "Defined Centers")
+    attributes = ("type", "authority", "profile", "definition", "defined_centers")
+    mismatches = dict.fromkeys(fields, 0)
+    examples = []
+    start = time.perf_counter()
+    for i, record in enumerate(records):
+        chart = hd.HumanDesign(hd.Design(*personality[i]), hd.Design(*design[i]))
+        for field, attribute in zip(fields, attributes):
+            if _normalize(record[field]) != _normalize(getattr(chart, attribute)):
+                mismatches[field] += 1
+                if len(examples) < 10:
+                    examples.append((i, field, record[field], getattr(chart, attribute)))
+    reference_elapsed = time.perf_counter() - start
+
+    print(f"samples: {samples}")
+    for field, count in mismatches.items():
+        print(f"  {field:<16} {count} mismatches")
+    for i, field, got, want in examples:
+        print(f"  row {i} {field}: batch {got!r} / hd {want!r}")
+    print(f"longitudes: {longitudes_elapsed / samples * 1e6:.1f} us/birth")
+    print(f"batch:      {batch_elapsed / samples * 1e6:.1f} us/birth")
+    print(f"hd:         {reference_elapsed / samples * 1e6:.1f} us/birth")
+    return not any(mismatches.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the batch Human Design engine against hd.HumanDesign.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    validate = sub.add_parser("validate", help="compare random births with hd.HumanDesign")
+    validate.add_argument("--samples", type=int, default=2000)
+    validate.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    return 0 if _validate(args.samples, args.seed) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,76 @@
-from flask import Flask, request, jsonify
-from datetime import datetime
-import pytz
-from geopy.geocoders import Nominatim
-from timezonefinder import TimezoneFinder
+import os
+
+from flask import Flask, request
+from werkzeug.exceptions import HTTPException
+import instrumentation
+import responses
+from responses import respond
+from idempotency import birth_data_inputs, idempotent
+from serving import resolve_place, run_chart, serve
+from timezones import BirthTimeError, resolve_birth_moment
+from chart_cache import add_stats_route, cached_chart
 
 # ต้องติดตั้งและ import ไลบรารีภายนอกเหล่านี้ใน environment จริง
-from immanuel import Chart as ImmanuelChart, const as ImmanuelConst
-import humandesign as hd
+import engines
+from solar_arc import body_longitudes, datetime_to_jd, get_solar_arc_table, utc_to_julian_days
+import hd_batch
+
+# โหลดตอนคำนวณดวงครั้งแรก (engines.py) ไม่ใช่ตอน import service
+immanuel = engines.lazy("immanuel")
+hd = engines.lazy("humandesign")
 
 app = Flask(__name__)
+instrumentation.init_app(app)
+responses.init_app(app)
+add_stats_route(app)
+
+# ชื่อค่าคงที่ใน immanuel.const (อ่านตอนใช้ เพื่อไม่ต้อง import immanuel ตอนโหลด service)
+PLANETS_PERSONALITY = [
+    "SUN", "EARTH", "MOON", "NORTH_NODE", "SOUTH_NODE", "MERCURY", "VENUS", "MARS",
+    "JUPITER", "SATURN", "URANUS", "NEPTUNE", "PLUTO"
+]
+
+@cached_chart("human_design")
+def compute_human_design(birth_datetime_utc, latitude, longitude):
+    # คำนวณ Human Design จากเวลา UTC ที่ resolve แล้ว (ใช้ร่วมกับ profile_api.py)
+
+    table = get_solar_arc_table()
+    birth_jd = datetime_to_jd(birth_datetime_utc)
+    if table is not None and table.covers_design([birth_jd])[0]:
+        # เส้นทางเร็ว: อ่านเฉพาะ longitude 13 ดาวจาก Swiss Ephemeris และหา design time
+        # จากตาราง solar arc (python solar_arc.py build) ไม่ต้องสร้าง ImmanuelChart สองครั้ง
+        # วันเกิด / design date นอกช่วงตาราง (1900-2100) ใช้เส้นทางเดิมด้านล่าง
+        hd_personality = hd.Design(*body_longitudes(birth_jd))
+        hd_design = hd.Design(*body_longitudes(table.design_jd(birth_jd)))
+    else:
+        # Chart (Personality/ดำ)
+        chart_immanuel = immanuel.Chart(birth_datetime_utc, latitude, longitude)
+        hd_personality = hd.Design(
+            *[chart_immanuel.ephemeris[getattr(immanuel.const, p)].longitude for p in PLANETS_PERSONALITY]
+        )
+
+        # Chart (Design/แดง - 88 วันก่อนเกิด)
+        design_time_utc = hd.utils.get_design_time(birth_datetime_utc)
+        chart_design = immanuel.Chart(design_time_utc, latitude, longitude)
+        hd_design = hd.Design(
+            *[chart_design.ephemeris[getattr(immanuel.const, p)].longitude for p in PLANETS_PERSONALITY]
+        )
+
+    # รวมสองส่วน
+    hd_chart = hd.HumanDesign(hd_personality, hd_design)
+
+    return {
+        "Type": hd_chart.type,
+        "Strategy": hd_chart.strategy,
+        "Authority": hd_chart.authority,
+        "Profile": hd_chart.profile,
+        "Definition": hd_chart.definition,
+        "Defined Centers": hd_chart.defined_centers,
+        "Open Centers": hd_chart.open_centers
+    }
 
 @app.route("/calculate_hd", methods=["POST"])
+@idempotent(birth_data_inputs)
 def calculate_hd():
     try:
         # 1. รับข้อมูล input ที่จำเป็น
@@ -21,79 +81,71 @@ def calculate_hd():
         
         # Validate ข้อมูล
         if not birth_date_str or not birth_time_str or not birth_place_raw:
-            return jsonify({"status": "error", "message": "Missing required fields: Birth Date, Birth Time, or Birth Place."}), 400
+            return respond({"status": "error", "message": "Missing required fields: Birth Date, Birth Time, or Birth Place."}), 400
         
         # 2. Geocoding และ Timezone
-        geolocator = Nominatim(user_agent="hd_api")
-        tf = TimezoneFinder()
-        location = geolocator.geocode(birth_place_raw)
+        location = resolve_place(birth_place_raw, user_agent="hd_api")
         if location is None:
-            return jsonify({"status": "error", "message": f"Birth place '{birth_place_raw}' not found."}), 400
+            return respond({"status": "error", "message": f"Birth place '{birth_place_raw}' not found."}), 400
         
         latitude = location.latitude
         longitude = location.longitude
-        timezone_name = tf.timezone_at(lng=longitude, lat=latitude)
-        if timezone_name is None:
-            return jsonify({"status": "error", "message": f"Timezone not found for '{birth_place_raw}'."}), 400
-        
-        local_timezone = pytz.timezone(timezone_name)
         try:
-            birth_datetime_naive = datetime.strptime(f"{birth_date_str} {birth_time_str}", '%Y-%m-%d %H:%M')
-        except Exception:
-            return jsonify({"status": "error", "message": "Invalid Birth Date or Birth Time format. Use YYYY-MM-DD and HH:MM."}), 400
-        
-        # แปลงเป็น local aware datetime และ UTC
-        birth_datetime_local = local_timezone.localize(birth_datetime_naive, is_dst=None)
-        birth_datetime_utc = birth_datetime_local.astimezone(pytz.utc)
+            moment = resolve_birth_moment(birth_date_str, birth_time_str, latitude, longitude, birth_place_raw)
+        except BirthTimeError as e:
+            return respond(e.to_dict()), 400
+        timezone_name = moment.timezone_name
+        birth_datetime_utc = moment.utc
 
-        # Chart (Personality/ดำ)
-        chart_immanuel = ImmanuelChart(birth_datetime_utc, latitude, longitude)
-        planets_personality = [
-            ImmanuelConst.SUN, ImmanuelConst.EARTH, ImmanuelConst.MOON,
-            ImmanuelConst.NORTH_NODE, ImmanuelConst.SOUTH_NODE, ImmanuelConst.MERCURY,
-            ImmanuelConst.VENUS, ImmanuelConst.MARS, ImmanuelConst.JUPITER,
-            ImmanuelConst.SATURN, ImmanuelConst.URANUS, ImmanuelConst.NEPTUNE,
-            ImmanuelConst.PLUTO
-        ]
-        hd_personality = hd.Design(
-            *[chart_immanuel.ephemeris[p].longitude for p in planets_personality]
-        )
+        human_design = run_chart(compute_human_design, birth_datetime_utc, latitude, longitude)
 
-        # Chart (Design/แดง - 88 วันก่อนเกิด)
-        design_time_utc = hd.utils.get_design_time(birth_datetime_utc)
-        chart_design = ImmanuelChart(design_time_utc, latitude, longitude)
-        hd_design = hd.Design(
-            *[chart_design.ephemeris[p].longitude for p in planets_personality]
-        )
+        # สร้าง output
+        with instrumentation.stage("serialize"):
+            return respond({
+                "status": "success",
+                "inputs": {
+                    "Birth Date": birth_date_str,
+                    "Birth Time": birth_time_str,
+                    "Birth Place": birth_place_raw,
+                    "Resolved Address": location.address,
+                    "Latitude": latitude,
+                    "Longitude": longitude,
+                    "Timezone Name": timezone_name,
+                },
+                "human_design": human_design
+            }), 200
 
-        # รวมสองส่วน
-        hd_chart = hd.HumanDesign(hd_personality, hd_design)
+    except HTTPException:
+        # 503 / 504 from serving.py
+        raise
+    except Exception as e:
+        return respond({"status": "error", "message": str(e)}), 500
 
-        # สร้าง output
-        return jsonify({
-            "status": "success",
-            "inputs": {
-                "Birth Date": birth_date_str,
-                "Birth Time": birth_time_str,
-                "Birth Place": birth_place_raw,
-                "Resolved Address": location.address,
-                "Latitude": latitude,
-                "Longitude": longitude,
-                "Timezone Name": timezone_name,
-            },
-            "human_design": {
-                "Type": hd_chart.type,
-                "Strategy": hd_chart.strategy,
-                "Authority": hd_chart.authority,
-                "Profile": hd_chart.profile,
-                "Definition": hd_chart.definition,
-                "Defined Centers": hd_chart.defined_centers,
-                "Open Centers": hd_chart.open_centers
-            }
-        }), 200
+HD_BATCH_LIMIT = int(os.environ.get("HD_BATCH_LIMIT", "10000"))
 
+@app.route("/calculate_hd/batch", methods=["POST"])
+def calculate_hd_batch():
+    # รับ {"utc": [...]} (Unix seconds หรือ ISO 8601 UTC) แล้วคำนวณ Human Design ทุกแถวพร้อมกัน
+    # ด้วย hd_batch.py (lookup gate/line + bitmask ของ channel/center) แทน hd.HumanDesign ทีละคน
+    # Human Design ใช้ตำแหน่งดาวแบบ geocentric จึงไม่ต้องใช้สถานที่เกิด
+    data = request.get_json(silent=True) or {}
+    utc = data.get("utc")
+    if not isinstance(utc, list) or not utc:
+        return respond({"status": "error", "message": "Expected a non-empty JSON array: utc."}), 400
+    if len(utc) > HD_BATCH_LIMIT:
+        return respond({"status": "error", "message": f"At most {HD_BATCH_LIMIT} births per batch."}), 400
+    try:
+        julian_days = utc_to_julian_days(utc)
+    except ValueError as e:
+        return respond({"status": "error", "message": str(e)}), 400
+
+    try:
+        with instrumentation.stage("chart"):
+            records = hd_batch.to_records(hd_batch.human_design_batch(julian_days))
+        with instrumentation.stage("serialize"):
+            return respond({"status": "success", "count": len(records), "human_design": records})
     except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+        return respond({"status": "error", "message": str(e)}), 500
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5002)
\ No newline at end of file
+    serve(app, port=5002)
\ No newline at end of file
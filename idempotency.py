@@ -0,0 +1,140 @@
+import functools
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from flask import Response, make_response, request
+
+import responses
+from chart_cache import ChartCache, MISSING
+from geocoding import normalize_place
+from instrumentation import register_cache, stage
+
+# Repeat submissions of the same inputs are answered without recomputing:
+#
+#   @app.route("/calculate_natal", methods=["POST"])
+#   @idempotent(birth_data_inputs)
+#   def calculate_natal(): ...
+#
+# The inputs function turns the request body into a canonical form (date and
+# time re-formatted, place trimmed and case-folded, whitespace collapsed). Its
+# hash, the endpoint and the negotiated representation (JSON / MessagePack,
+# schema, content coding) key the response store:
+#   - the same inputs again -> the stored 200 response (body already encoded
+#     and compressed) for RESPONSE_STORE_TTL seconds, or 304 with no body and no
+#     work at all when If-None-Match has its ETag;
+#   - anything else         -> the endpoint, whose 200 is stored (unless it is
+#     marked Cache-Control: no-store, e.g. a profile with a failed chart).
+# The ETag is a hash of the body bytes, so it is strong: inputs that differ only
+# in spelling (" bangkok,THAILAND") share a stored entry, whose echoed "Birth
+# Info" is the one of the request that filled it, but a given ETag always means
+# the same bytes. Only representation headers are stored; per-request ones
+# (Server-Timing, Date, ...) are never replayed.
+# The endpoints are POST, but they behave like queries, so If-None-Match gets a
+# 304 here rather than the 412 a state-changing POST would.
+# Change RESPONSE_ETAG_VERSION when a deploy changes what an endpoint returns.
+
+RESPONSE_STORE_SIZE = int(os.environ.get("RESPONSE_STORE_SIZE", "2000"))
+RESPONSE_STORE_TTL = float(os.environ.get("RESPONSE_STORE_TTL", "600"))
+RESPONSE_ETAG_VERSION = os.environ.get("RESPONSE_ETAG_VERSION", "1")
+
+BIRTH_FIELDS = ("Birth Date", "Birth Time", "Birth Place")
+# Fields the services read case-insensitively.
+CASE_INSENSITIVE_FIELDS = {"Email Address", "Ayanamsa", "Mode"}
+# Headers that describe the stored body and are replayed with it.
+STORED_HEADERS = ("Content-Type", "Content-Encoding", "Vary", "X-Response-Schema", "Cache-Control")
+
+response_store = ChartCache(RESPONSE_STORE_SIZE, RESPONSE_STORE_TTL)
+register_cache("response", lambda: (response_store.hits, response_store.misses))
+
+
+def _text(value):
+    return " ".join(value.split()) if isinstance(value, str) else value
+
+
+def _canonical(value, fmt):
+    try:
+        return datetime.strptime(value.strip(), fmt).strftime(fmt)
+    except (AttributeError, ValueError):
+        return None
+
+
+def birth_data_inputs(data):
+    """Canonical inputs of a birth-data request, or None when it has no valid birth moment."""
+    birth_date = _canonical(data.get("Birth Date"), "%Y-%m-%d")
+    birth_time = _canonical(data.get("Birth Time"), "%H:%M")
+    place = data.get("Birth Place")
+    if birth_date is None or birth_time is None or not isinstance(place, str) or not place.strip():
+        return None
+    inputs = {"Birth Date": birth_date, "Birth Time": birth_time, "Birth Place": normalize_place(place)}
+    for field, value in data.items():
+        if field not in BIRTH_FIELDS:
+            value = _text(value)
+            inputs[field] = value.casefold() if field in CASE_INSENSITIVE_FIELDS and isinstance(value, str) else value
+    return inputs
+
+
+def numerology_inputs(data):
+    name = data.get("name")
+    return {"name": _text(name)} if isinstance(name, str) and name.strip() else None
+
+
+def store_key(inputs, representation):
+    # Response store key for one representation of the response to `inputs` on this endpoint.
+    canonical = json.dumps([RESPONSE_ETAG_VERSION, request.path, inputs, representation],
+                           sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def etag_for(body):
+    # Strong ETag: the same value only ever goes with the same bytes.
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _matches(if_none_match, etag):
+    # If-None-Match uses the weak comparison: W/"x" matches "x".
+    tags = [tag.strip() for tag in (if_none_match or "").split(",")]
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
+
+
+def _not_modified(etag):
+    return Response(status=304, headers={"ETag": etag, "Vary": "Accept, Accept-Encoding"})
+
+
+def idempotent(inputs_fn):
+    """Answer repeats of the same canonical inputs with 304 or the stored response."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            data = request.get_json(silent=True)
+            inputs = inputs_fn(data) if isinstance(data, dict) else None
+            if inputs is None:
+                return view(*args, **kwargs)
+
+            representation = responses.representation(request.headers.get("Accept", ""),
+                                                      request.headers.get("Accept-Encoding", ""),
+                                                      request.args.get("schema"))
+            key = store_key(inputs, representation)
+            with stage("response_store"):
+                stored = response_store.get(key)
+            if stored is not MISSING:
+                body, headers, etag = stored
+                if _matches(request.headers.get("If-None-Match"), etag):
+                    return _not_modified(etag)
+                return Response(body, status=200, headers={**headers, "ETag": etag})
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed:
+                return response
+            body = response.get_data()
+            etag = etag_for(body)
+            response.headers["ETag"] = etag
+            if "no-store" not in response.headers.get("Cache-Control", ""):
+                headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+                response_store.put(key, (body, headers, etag))
+            if _matches(request.headers.get("If-None-Match"), etag):
+                return _not_modified(etag)
+            return response
+        return wrapper
+    return decorator
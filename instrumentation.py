@@ -0,0 +1,221 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+
+import engines
+
+# Per-stage latency instrumentation shared by all the Flask services.
+#
+#   with stage("geocode"): ...
+#
+# records how long a stage took in the current request. init_app(app) then adds a
+# Server-Timing header to every response, feeds per-endpoint/per-stage histograms
+# and serves them, with request counts and cache hit ratios, on GET /metrics in
+# Prometheus text format. Outside a request, stage() only runs the block.
+#
+# Set SLOW_REQUEST_PROFILE_MS to sample the stacks of requests slower than that
+# and dump them as collapsed stacks (flamegraph.pl / speedscope format) into
+# SLOW_REQUEST_PROFILE_DIR.
+#
+# GET /healthz answers without touching any chart engine and lists which lazy
+# engines (engines.py) this process has loaded.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+SLOW_REQUEST_PROFILE_MS = float(os.environ.get("SLOW_REQUEST_PROFILE_MS", "0"))
+SLOW_REQUEST_PROFILE_DIR = os.environ.get("SLOW_REQUEST_PROFILE_DIR", "slow_requests")
+PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage_latency = {}  # (endpoint, stage) -> Histogram
+        self.requests = Counter()  # (endpoint, status) -> count
+        self.caches = {}  # name -> callable returning (hits, misses)
+
+    def observe_request(self, endpoint, status, stages, total):
+        with self._lock:
+            self.requests[(endpoint, status)] += 1
+            for name, seconds in list(stages.items()) + [("total", total)]:
+                histogram = self.stage_latency.get((endpoint, name))
+                if histogram is None:
+                    histogram = self.stage_latency[(endpoint, name)] = Histogram()
+                histogram.observe(seconds)
+
+    def register_cache(self, name, counters):
+        self.caches[name] = counters
+
+    def render(self):
+        lines = [
+            "# HELP soulweaver_stage_seconds Request latency per endpoint and stage.",
+            "# TYPE soulweaver_stage_seconds histogram",
+        ]
+        with self._lock:
+            for (endpoint, name), histogram in sorted(self.stage_latency.items()):
+                labels = f'endpoint="{endpoint}",stage="{name}"'
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'soulweaver_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'soulweaver_stage_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"soulweaver_stage_seconds_sum{{{labels}}} {histogram.sum:.6f}")
+                lines.append(f"soulweaver_stage_seconds_count{{{labels}}} {histogram.count}")
+
+            lines += ["# HELP soulweaver_requests_total Requests per endpoint and status code.",
+                      "# TYPE soulweaver_requests_total counter"]
+            for (endpoint, status), count in sorted(self.requests.items()):
+                lines.append(f'soulweaver_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+
+        lines += ["# HELP soulweaver_cache_lookups_total Cache lookups by result.",
+                  "# TYPE soulweaver_cache_lookups_total counter",
+                  "# HELP soulweaver_cache_hit_ratio Cache hits / lookups since start.",
+                  "# TYPE soulweaver_cache_hit_ratio gauge"]
+        for name, counters in sorted(self.caches.items()):
+            hits, misses = counters()
+            lines.append(f'soulweaver_cache_lookups_total{{cache="{name}",result="hit"}} {hits}')
+            lines.append(f'soulweaver_cache_lookups_total{{cache="{name}",result="miss"}} {misses}')
+            if hits + misses:
+                lines.append(f'soulweaver_cache_hit_ratio{{cache="{name}"}} {hits / (hits + misses):.6f}')
+
+        lines += ["# HELP soulweaver_engine_import_seconds Time the first import of a lazy engine took.",
+                  "# TYPE soulweaver_engine_import_seconds gauge"]
+        for name, seconds in sorted(engines.import_seconds().items()):
+            lines.append(f'soulweaver_engine_import_seconds{{module="{name}"}} {seconds:.6f}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def register_cache(name, counters):
+    """Report a cache on /metrics; `counters` returns (hits, misses)."""
+    metrics.register_cache(name, counters)
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context() and hasattr(g, "stage_timings"):
+            timings = g.stage_timings
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+class _StackSampler:
+    # One background thread per process samples the stacks of the request threads
+    # that are currently being profiled.
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._samples = {}  # thread id -> Counter of collapsed stacks
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, thread_id):
+        with self._lock:
+            self._samples[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._samples.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, samples in self._samples.items():
+                    frame = frames.get(thread_id)
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                        frame = frame.f_back
+                    if stack:
+                        samples[";".join(reversed(stack))] += 1
+
+
+_sampler = _StackSampler(PROFILE_SAMPLE_INTERVAL_MS / 1000.0) if SLOW_REQUEST_PROFILE_MS > 0 else None
+
+
+def _dump_slow_request(endpoint, total, samples):
+    os.makedirs(SLOW_REQUEST_PROFILE_DIR, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint.strip('/').replace('/', '_') or 'root'}-{total * 1000:.0f}ms.folded"
+    with open(os.path.join(SLOW_REQUEST_PROFILE_DIR, name), "w") as f:
+        for stack, count in samples.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+def init_app(app):
+    @app.before_request
+    def _start_timing():
+        g.request_started = time.perf_counter()
+        g.stage_timings = {}
+        if _sampler is not None:
+            _sampler.start(threading.get_ident())
+
+    @app.after_request
+    def _finish_timing(response):
+        started = getattr(g, "request_started", None)
+        if started is None:
+            return response
+        total = time.perf_counter() - started
+        timings = g.stage_timings
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+
+        if endpoint not in ("/metrics", "/healthz"):
+            metrics.observe_request(endpoint, response.status_code, timings, total)
+        response.headers["Server-Timing"] = ", ".join(
+            [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items()]
+            + [f"total;dur={total * 1000:.2f}"]
+        )
+
+        if _sampler is not None:
+            samples = _sampler.stop(threading.get_ident())
+            if total * 1000 >= SLOW_REQUEST_PROFILE_MS and samples:
+                _dump_slow_request(endpoint, total, samples)
+        return response
+
+    @app.teardown_request
+    def _stop_sampling(exc):
+        # after_request is skipped when a handler raises; never leave a thread registered.
+        if _sampler is not None:
+            _sampler.stop(threading.get_ident())
+
+    @app.route("/metrics", methods=["GET"])
+    def prometheus_metrics():
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    @app.route("/healthz", methods=["GET"])
+    def healthz():
+        return Response(json.dumps({"status": "ok", "engines": engines.loaded()}), mimetype="application/json")
+
+    return app
@@ -0,0 +1,375 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+from flask import request
+
+from responses import dumps, respond
+
+# Durable job queue for work too slow for one HTTP request (full profiles).
+#
+#   queue = JobQueue()
+#   queue.register("profile", build_profile_job)
+#   job_id, deduplicated = queue.submit("profile", payload, priority=5, dedup=normalized_inputs)
+#
+# Jobs live in a local SQLite file (no broker), so they survive a restart and
+# every gunicorn worker on the machine can submit, claim and read them. Each
+# process runs JOB_WORKERS threads that claim the highest-priority ready job in
+# a write transaction, call its handler and store the result. A handler:
+#   returns a JSON-able value     -> done, value stored as the result
+#   raises RetryLater             -> queued again after an exponential backoff,
+#                                    failed once JOB_MAX_ATTEMPTS is reached
+#   raises JobError(body)         -> failed, body stored as the result
+#   raises anything else          -> failed with {"status": "error", "message": ...}
+# A job whose worker died is requeued when its lease (JOB_LEASE_SECONDS) runs out;
+# every claim counts as an attempt, so a job that keeps killing its worker fails
+# once JOB_MAX_ATTEMPTS is reached.
+# Submitting a job identical (same kind and dedup inputs) to one still queued or
+# running returns that job instead of adding another.
+
+JOB_STORE_PATH = os.environ.get(
+    "JOB_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs.sqlite3"),
+)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.environ.get("JOB_RETRY_BASE_SECONDS", "2"))
+JOB_RETRY_MAX_SECONDS = float(os.environ.get("JOB_RETRY_MAX_SECONDS", "300"))
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "300"))
+JOB_RESULT_TTL = float(os.environ.get("JOB_RESULT_TTL", str(7 * 24 * 3600)))
+JOB_MAX_WAIT = float(os.environ.get("JOB_MAX_WAIT", "30"))
+# How often idle workers and long-polls look at the store for changes made by
+# other processes (changes in this process wake them at once).
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "0.5"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+
+class RetryLater(Exception):
+    """A transient failure (geocoder down, pools full): run the job again later."""
+
+
+class JobError(Exception):
+    """A permanent failure; `body` is stored as the job's result."""
+
+    def __init__(self, body):
+        super().__init__(body.get("message", "job failed"))
+        self.body = body
+
+
+def retry_delay(attempts, base=JOB_RETRY_BASE_SECONDS, cap=JOB_RETRY_MAX_SECONDS):
+    # Exponential backoff with jitter: base * 2^(attempt-1), capped, between 50% and 100%.
+    return min(cap, base * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+
+def dedup_key(kind, inputs):
+    canonical = json.dumps([kind, inputs], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class JobQueue:
+    def __init__(self, path=JOB_STORE_PATH, workers=JOB_WORKERS, max_attempts=JOB_MAX_ATTEMPTS,
+                 lease_seconds=JOB_LEASE_SECONDS, result_ttl=JOB_RESULT_TTL):
+        self.path = path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.result_ttl = result_ttl
+        self.handlers = {}
+        self._changed = threading.Condition()
+        self._lock = threading.Lock()
+        self._db = None
+        self._pid = None
+        self._threads = []
+        self._worker_pid = None
+        self._stopping = False
+        self._next_purge = 0.0
+
+    # --- Store ---
+
+    def _connection(self):
+        # One connection per process: a forked gunicorn worker opens its own.
+        if self._db is None or self._pid != os.getpid():
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " kind TEXT NOT NULL,"
+                " dedup_key TEXT,"
+                " payload TEXT NOT NULL,"
+                " priority INTEGER NOT NULL DEFAULT 0,"
+                " state TEXT NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " run_after REAL NOT NULL,"
+                " lease_expires REAL,"
+                " created_at REAL NOT NULL,"
+                " started_at REAL,"
+                " finished_at REAL,"
+                " error TEXT,"
+                " result TEXT)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (state, priority DESC, run_after, created_at)")
+            # At most one pending job per identical input.
+            db.execute("CREATE UNIQUE INDEX IF NOT EXISTS jobs_pending ON jobs (dedup_key)"
+                       " WHERE state IN ('queued', 'running')")
+            self._db, self._pid = db, os.getpid()
+        return self._db
+
+    def _transaction(self, work):
+        # BEGIN IMMEDIATE takes the write lock up front, so two processes never
+        # claim the same job.
+        with self._lock:
+            db = self._connection()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(db)
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+            return result
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    # --- API ---
+
+    def register(self, kind, handler):
+        """Run `handler(payload)` for jobs of `kind`."""
+        self.handlers[kind] = handler
+        return handler
+
+    def submit(self, kind, payload, priority=0, dedup=None):
+        """Queue a job; returns (job id, True if an identical pending job was reused)."""
+        key = dedup_key(kind, payload if dedup is None else dedup)
+        now = time.time()
+
+        def work(db):
+            row = db.execute("SELECT id, priority FROM jobs WHERE dedup_key = ? AND state IN (?, ?)",
+                             (key, QUEUED, RUNNING)).fetchone()
+            if row is not None:
+                if priority > row[1]:
+                    db.execute("UPDATE jobs SET priority = ? WHERE id = ?", (priority, row[0]))
+                return row[0], True
+            job_id = uuid.uuid4().hex
+            db.execute("INSERT INTO jobs (id, kind, dedup_key, payload, priority, state, run_after, created_at)"
+                       " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                       (job_id, kind, key, dumps(payload).decode("utf-8"), priority, QUEUED, now, now))
+            return job_id, False
+
+        result = self._transaction(work)
+        self._notify()
+        return result
+
+    def get(self, job_id):
+        """The job as a dict (result decoded), or None."""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT id, kind, priority, state, attempts, run_after, created_at, started_at, finished_at,"
+                " error, result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(("id", "kind", "priority", "state", "attempts", "run_after", "created_at", "started_at",
+                        "finished_at", "error"), row[:10]))
+        job["result"] = json.loads(row[10]) if row[10] is not None else None
+        if job["state"] != QUEUED:
+            job.pop("run_after")
+        return job
+
+    def wait(self, job_id, timeout):
+        """get(job_id), after waiting up to `timeout` seconds for it to finish."""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["state"] in FINISHED or remaining <= 0:
+                return job
+            with self._changed:
+                self._changed.wait(min(remaining, JOB_POLL_INTERVAL))
+
+    def counts(self):
+        with self._lock:
+            rows = self._connection().execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return {state: 0 for state in (QUEUED, RUNNING, DONE, FAILED)} | dict(rows)
+
+    def purge(self, older_than=None):
+        """Delete finished jobs older than `older_than` seconds (default: result_ttl)."""
+        cutoff = time.time() - (self.result_ttl if older_than is None else older_than)
+        return self._transaction(lambda db: db.execute(
+            "DELETE FROM jobs WHERE state IN (?, ?) AND finished_at < ?", (DONE, FAILED, cutoff)).rowcount)
+
+    # --- Workers ---
+
+    def claim(self):
+        """Mark the next ready job running and return (id, kind, payload, attempts), or None."""
+        now = time.time()
+
+        def work(db):
+            # Jobs of a worker that died (lease ran out) go back to the queue,
+            # unless they have used up their attempts.
+            error = f"worker died or hung on each of {self.max_attempts} attempts"
+            given_up = db.execute(
+                "UPDATE jobs SET state = ?, result = ?, error = ?, finished_at = ?, lease_expires = NULL"
+                " WHERE state = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, dumps({"status": "error", "message": f"Job failed: {error}."}).decode("utf-8"),
+                 error, now, RUNNING, now, self.max_attempts)).rowcount
+            db.execute("UPDATE jobs SET state = ?, lease_expires = NULL WHERE state = ? AND lease_expires < ?",
+                       (QUEUED, RUNNING, now))
+            row = db.execute("SELECT id, kind, payload, attempts FROM jobs WHERE state = ? AND run_after <= ?"
+                             " ORDER BY priority DESC, run_after, created_at LIMIT 1", (QUEUED, now)).fetchone()
+            if row is None:
+                return given_up, None
+            db.execute("UPDATE jobs SET state = ?, attempts = attempts + 1, started_at = ?, lease_expires = ?"
+                       " WHERE id = ?", (RUNNING, now, now + self.lease_seconds, row[0]))
+            return given_up, (row[0], row[1], json.loads(row[2]), row[3] + 1)
+
+        given_up, claimed = self._transaction(work)
+        if given_up:
+            self._notify()  # long-polls waiting on those jobs
+        return claimed
+
+    def _finish(self, job_id, attempts, state, result=None, error=None, run_after=None):
+        """Record the outcome of claimed attempt `attempts`; False (nothing written) when
+        its lease ran out and the job was requeued or claimed again meanwhile."""
+        now = time.time()
+        encoded = None if result is None else dumps(result).decode("utf-8")
+        written = self._transaction(lambda db: db.execute(
+            "UPDATE jobs SET state = ?, result = ?, error = ?, run_after = COALESCE(?, run_after),"
+            " finished_at = ?, lease_expires = NULL WHERE id = ? AND state = ? AND attempts = ?",
+            (state, encoded, error, run_after, None if state == QUEUED else now, job_id, RUNNING, attempts)).rowcount)
+        if written:
+            self._notify()
+        return bool(written)
+
+    def run_one(self):
+        """Claim and run one job; False when none was ready."""
+        claimed = self.claim()
+        if claimed is None:
+            return False
+        job_id, kind, payload, attempts = claimed
+        handler = self.handlers.get(kind)
+        try:
+            if handler is None:
+                raise JobError({"status": "error", "message": f"No handler for job kind '{kind}'."})
+            result = handler(payload)
+        except RetryLater as e:
+            if attempts >= self.max_attempts:
+                self._finish(job_id, attempts, FAILED, {"status": "error", "message": str(e)},
+                             f"gave up after {attempts} attempts")
+            else:
+                self._finish(job_id, attempts, QUEUED, error=str(e), run_after=time.time() + retry_delay(attempts))
+        except JobError as e:
+            self._finish(job_id, attempts, FAILED, e.body, str(e))
+        except Exception as e:
+            self._finish(job_id, attempts, FAILED, {"status": "error", "message": str(e)}, str(e))
+        else:
+            self._finish(job_id, attempts, DONE, result)
+        return True
+
+    def _work(self):
+        while not self._stopping:
+            # A store error ("database is locked" past its timeout) must not end
+            # the thread: start() never restarts it.
+            try:
+                ran = self.run_one()
+            except sqlite3.Error:
+                ran = False  # try again shortly
+            if time.time() >= self._next_purge:
+                self._next_purge = time.time() + 3600
+                try:
+                    self.purge()
+                except sqlite3.Error:
+                    self._next_purge = time.time() + 60  # finished jobs just stay a little longer
+            if not ran:
+                with self._changed:
+                    self._changed.wait(JOB_POLL_INTERVAL)
+
+    def start(self):
+        """Start this process's worker threads (once per process; no-op when workers=0)."""
+        if self.workers <= 0 or self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker_pid == os.getpid():
+                return
+            # Threads do not survive a fork: each gunicorn worker starts its own.
+            self._stopping = False
+            self._threads = [threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                             for i in range(self.workers)]
+            for thread in self._threads:
+                thread.start()
+            self._worker_pid = os.getpid()
+
+    def stop(self):
+        self._stopping = True
+        self._notify()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self._worker_pid = None
+
+
+def job_view(job):
+    # Public shape of a job for the HTTP API.
+    view = {k: v for k, v in job.items() if k != "result"}
+    if "run_after" in view:
+        view["next_attempt_at"] = view.pop("run_after")
+    return view
+
+
+def add_job_routes(app, queue):
+    # GET /jobs: counts per state. GET /jobs/<id>?wait=20: the job and, once
+    # finished, its result; waits up to `wait` seconds (JOB_MAX_WAIT at most)
+    # for it to finish, so clients can long-poll instead of polling.
+    app.before_request(queue.start)
+
+    @app.route("/jobs", methods=["GET"])
+    def job_counts():
+        return respond({"status": "success", "jobs": queue.counts()})
+
+    @app.route("/jobs/<job_id>", methods=["GET"])
+    def job_status(job_id):
+        try:
+            wait = min(max(float(request.args.get("wait", 0)), 0.0), JOB_MAX_WAIT)
+        except ValueError:
+            return respond({"status": "error", "message": "wait must be a number of seconds."}), 400
+        job = queue.wait(job_id, wait) if wait else queue.get(job_id)
+        if job is None:
+            return respond({"status": "error", "message": f"Unknown job '{job_id}'."}), 404
+        body = {"status": "success", "job": job_view(job)}
+        if job["state"] in FINISHED:
+            body["result"] = job["result"]
+            return respond(body)
+        response = respond(body, status=202)
+        response.headers["Retry-After"] = "1"
+        return response
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Job store maintenance")
+    parser.add_argument("--path", default=JOB_STORE_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="jobs per state")
+    purge = sub.add_parser("purge", help="delete finished jobs")
+    purge.add_argument("--older-than", type=float, default=JOB_RESULT_TTL, help="seconds since they finished")
+    args = parser.parse_args(argv)
+
+    queue = JobQueue(args.path, workers=0)
+    if args.command == "stats":
+        print(json.dumps(queue.counts()))
+    else:
+        print(f"deleted {queue.purge(args.older_than)} finished jobs")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
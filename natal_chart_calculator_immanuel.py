@@ -1,17 +1,73 @@
-from flask import Flask, request, jsonify
-from datetime import datetime
-from immanuel import Chart, const
-import json
+import os
+
+from flask import Flask, request
+from werkzeug.exceptions import HTTPException
+import instrumentation
+import responses
+from responses import respond
+from idempotency import birth_data_inputs, idempotent
+import numpy as np
 
 # --- เพิ่ม Library สำหรับการคำนวณสถานที่และเขตเวลา ---
-from geopy.geocoders import Nominatim
-from timezonefinder import TimezoneFinder
-import pytz
+from serving import resolve_place, run_chart, serve
+from timezones import BirthTimeError, resolve_birth_moment
+from chart_cache import add_stats_route, cached_chart
+from chart_records import NatalRecord
+from ephemeris_table import PLANETS as SYNASTRY_PLANETS, get_ephemeris_table
+from solar_arc import datetime_to_jd
+import synastry
+import engines
 # --------------------------------------------------
 
+# immanuel โหลดตอนคำนวณดวงครั้งแรก (engines.py) ไม่ใช่ตอน import service
+immanuel = engines.lazy("immanuel")
+
 app = Flask(__name__)
+instrumentation.init_app(app)
+responses.init_app(app)
+add_stats_route(app)
+
+# cache เก็บเป็น NatalRecord (chart_records.py) ไม่ใช่ dict ซ้อนกันทั้งก้อน
+@cached_chart("natal", variant="PLACIDUS", record=NatalRecord)
+def compute_natal(birth_datetime_utc, latitude, longitude):
+    # คำนวณ natal chart จากเวลา UTC ที่ resolve แล้ว (ใช้ร่วมกับ profile_api.py)
+    chart = immanuel.Chart(birth_datetime_utc, latitude, longitude, house_system=immanuel.const.PLACIDUS)
+
+    planets_data = []
+    for planet in immanuel.const.PLANETS:
+        position = chart.get(planet)
+        planets_data.append({
+            "name": planet,
+            "sign": position.sign.name,
+            "sign_symbol": position.sign.symbol,
+            "degree": position.degree,
+            "house": position.house.id
+        })
+
+    houses_data = []
+    for house_id in range(1, 13):
+        cusp = chart.get_house_cusp(house_id)
+        houses_data.append({
+            "house": house_id,
+            "sign": cusp.sign.name,
+            "degree": cusp.degree
+        })
+
+    return {
+        "Planets": planets_data,
+        "Houses": houses_data,
+        "Ascendant": {
+            "sign": chart.ascendant.sign.name,
+            "degree": chart.ascendant.degree
+        },
+        "Midheaven (MC)": {
+            "sign": chart.mc.sign.name,
+            "degree": chart.mc.degree
+        }
+    }
 
 @app.route("/calculate_natal", methods=["POST"])
+@idempotent(birth_data_inputs)
 def calculate_natal():
     try:
         birth_data = request.get_json()
@@ -22,60 +78,32 @@ def calculate_natal():
         birth_place_raw = birth_data.get("Birth Place") # e.g., "Bangkok, Thailand"
 
         if not all([birth_date_str, birth_time_str, birth_place_raw]):
-            return jsonify({"status": "error", "message": "Missing required fields: Birth Date, Birth Time, or Birth Place."}), 400
+            return respond({"status": "error", "message": "Missing required fields: Birth Date, Birth Time, or Birth Place."}), 400
 
         # --- 2. การคำนวณ Geocoding และ Timezone (ส่วนที่เพิ่มเข้ามา) ---
-        geolocator = Nominatim(user_agent="the_soul_weaver_western_app")
-        tf = TimezoneFinder()
-
-        location = geolocator.geocode(birth_place_raw)
+        location = resolve_place(birth_place_raw, user_agent="the_soul_weaver_western_app")
         if not location:
-            return jsonify({"status": "error", "message": f"Birth place '{birth_place_raw}' not found."}), 400
+            return respond({"status": "error", "message": f"Birth place '{birth_place_raw}' not found."}), 400
 
         latitude = location.latitude
         longitude = location.longitude
 
-        timezone_name = tf.timezone_at(lng=longitude, lat=latitude)
-        if not timezone_name:
-            return jsonify({"status": "error", "message": f"Could not determine timezone for {birth_place_raw}."}), 400
-
         # --- 3. การจัดการเวลาและเขตเวลา (ส่วนที่แก้ไข) ---
-        
-        birth_datetime_naive_str = f"{birth_date_str} {birth_time_str}"
-        birth_datetime_naive = datetime.strptime(birth_datetime_naive_str, '%Y-%m-%d %H:%M')
 
-        local_timezone = pytz.timezone(timezone_name)
-        birth_datetime_local = local_timezone.localize(birth_datetime_naive, is_dst=None)
-        
+        try:
+            moment = resolve_birth_moment(birth_date_str, birth_time_str, latitude, longitude, birth_place_raw)
+        except BirthTimeError as e:
+            return respond(e.to_dict()), 400
+        timezone_name = moment.timezone_name
+
         # *** สำคัญ: Library immanuel คาดหวังเวลาเป็น UTC ***
-        # เราจึงต้องแปลงเวลาท้องถิ่น (Local) ที่ถูกต้อง ให้เป็นเวลา UTC
-        birth_datetime_utc = birth_datetime_local.astimezone(pytz.utc)
+        # resolve_birth_moment แปลงเวลาท้องถิ่น (Local) ที่ถูกต้อง ให้เป็นเวลา UTC ให้แล้ว
+        birth_datetime_utc = moment.utc
 
         # --- 4. การคำนวณทางโหราศาสตร์ (ใช้ข้อมูลที่ถูกต้องแล้ว) ---
         
         # ส่ง (เวลา UTC ที่ถูกต้อง, lat, lng) เข้าไปคำนวณ
-        chart = Chart(birth_datetime_utc, latitude, longitude, house_system=const.PLACIDUS)
-
-        # --- 5. ดึงผลลัพธ์ ---
-        planets_data = []
-        for planet in const.PLANETS:
-            position = chart.get(planet)
-            planets_data.append({
-                "name": planet,
-                "sign": position.sign.name,
-                "sign_symbol": position.sign.symbol,
-                "degree": position.degree,
-                "house": position.house.id
-            })
-
-        houses_data = []
-        for house_id in range(1, 13):
-            cusp = chart.get_house_cusp(house_id)
-            houses_data.append({
-                "house": house_id,
-                "sign": cusp.sign.name,
-                "degree": cusp.degree
-            })
+        western = run_chart(compute_natal, birth_datetime_utc, latitude, longitude)
 
         result = {
             "status": "success",
@@ -84,18 +112,7 @@ def calculate_natal():
                 "Birth Time": birth_time_str,
                 "Birth Place": birth_place_raw
             },
-            "Western Astrology": {
-                "Planets": planets_data,
-                "Houses": houses_data,
-                "Ascendant": {
-                    "sign": chart.ascendant.sign.name,
-                    "degree": chart.ascendant.degree
-                },
-                "Midheaven (MC)": {
-                    "sign": chart.mc.sign.name,
-                    "degree": chart.mc.degree
-                }
-            },
+            "Western Astrology": western,
             "Calculation Inputs": {
                 "Resolved Place": location.address,
                 "Latitude": latitude,
@@ -106,11 +123,103 @@ def calculate_natal():
             "Accuracy Note": "Location and timezone are dynamically calculated for accuracy."
         }
         
-        # ใช้ default=str เพื่อจัดการกับ object ที่ json.dumps ไม่รู้จัก (ถ้ามี)
-        return json.dumps(result, default=str, indent=4)
+        # object ที่ JSON ไม่รู้จัก (ถ้ามี) ถูกส่งเป็น str() โดย responses.py
+        with instrumentation.stage("serialize"):
+            return respond(result)
+
+    except HTTPException:
+        # 503 / 504 from serving.py
+        raise
+    except Exception as e:
+        return respond({"status": "error", "message": str(e)}), 500
+
+SYNASTRY_MAX_MEMBERS = int(os.environ.get("SYNASTRY_MAX_MEMBERS", "300"))
+SYNASTRY_DEFAULT_MAX_ASPECTS = 5
+
+@cached_chart("natal_longitudes", variant="PLACIDUS")
+def compute_natal_longitudes(birth_datetime_utc, latitude, longitude):
+    # ลองจิจูดดาว (0-360) ตามลำดับ SYNASTRY_PLANETS จาก Chart เดียวกับ compute_natal
+    chart = immanuel.Chart(birth_datetime_utc, latitude, longitude, house_system=immanuel.const.PLACIDUS)
+    return [chart.get(getattr(immanuel.const, planet)).longitude for planet in SYNASTRY_PLANETS]
+
+def member_longitudes(moments, locations):
+    # (สมาชิก, ดาว) ทั้งกลุ่ม: คนที่อยู่ในช่วงตาราง ephemeris อ่านพร้อมกันใน NumPy pass เดียว
+    # ที่เหลือคำนวณ Chart ทีละคน (ผ่าน cache + chart pool)
+    jds = np.array([datetime_to_jd(moment.utc) for moment in moments])
+    table = get_ephemeris_table()
+    if table is not None:
+        longitudes, _ = table.positions_batch(jds)
+    else:
+        longitudes = np.full((len(moments), len(SYNASTRY_PLANETS)), np.nan)
+    for i in np.nonzero(np.isnan(longitudes[:, 0]))[0].tolist():
+        longitudes[i] = run_chart(compute_natal_longitudes, moments[i].utc,
+                                  locations[i].latitude, locations[i].longitude)
+    return longitudes
+
+@app.route("/calculate_synastry", methods=["POST"])
+def calculate_synastry():
+    # รับ {"Members": [{"Name", "Birth Date", "Birth Time", "Birth Place"}, ...], "Max Aspects": 5}
+    # คืนคะแนนความเข้ากันทุกคู่ (เมทริกซ์ N x N) และรายการ aspect ของแต่ละคู่ เรียงคู่ที่เข้ากันที่สุดก่อน
+    try:
+        data = request.get_json(silent=True) or {}
+        members = data.get("Members")
+        if not isinstance(members, list) or not 2 <= len(members) <= SYNASTRY_MAX_MEMBERS:
+            return respond({"status": "error",
+                            "message": f"Members must be a list of 2 to {SYNASTRY_MAX_MEMBERS} people."}), 400
+        max_aspects = data.get("Max Aspects", SYNASTRY_DEFAULT_MAX_ASPECTS)
+        if not isinstance(max_aspects, int) or isinstance(max_aspects, bool) or max_aspects < 0:
+            return respond({"status": "error", "message": "Max Aspects must be a non-negative integer."}), 400
+
+        locations, moments = [], []
+        for index, member in enumerate(members):
+            member = member if isinstance(member, dict) else {}
+            birth_date_str = member.get("Birth Date")
+            birth_time_str = member.get("Birth Time")
+            birth_place_raw = member.get("Birth Place")
+            if not all([birth_date_str, birth_time_str, birth_place_raw]):
+                return respond({"status": "error", "member": index,
+                                "message": "Missing required fields: Birth Date, Birth Time, or Birth Place."}), 400
+            # สถานที่ซ้ำกันในกลุ่มได้จาก cache ของ geocoding.py
+            location = resolve_place(birth_place_raw, user_agent="the_soul_weaver_western_app")
+            if not location:
+                return respond({"status": "error", "member": index,
+                                "message": f"Birth place '{birth_place_raw}' not found."}), 400
+            try:
+                moment = resolve_birth_moment(birth_date_str, birth_time_str,
+                                              location.latitude, location.longitude, birth_place_raw)
+            except BirthTimeError as e:
+                return respond({**e.to_dict(), "member": index}), 400
+            locations.append(location)
+            moments.append(moment)
+
+        with instrumentation.stage("chart"):
+            longitudes = member_longitudes(moments, locations)
+        with instrumentation.stage("synastry"):
+            report = synastry.compatibility(longitudes, SYNASTRY_PLANETS, max_aspects)
+
+        result = {
+            "status": "success",
+            "Members": [
+                {
+                    "Name": member.get("Name") or member.get("Full Name"),
+                    "Resolved Place": location.address,
+                    "Calculated UTC Time": moment.utc.strftime('%Y-%m-%d %H:%M:%S %Z')
+                }
+                for member, location, moment in zip(members, locations, moments)
+            ],
+            "Planets": list(SYNASTRY_PLANETS),
+            "Harmony": report["harmony"],
+            "Tension": report["tension"],
+            "Pairs": report["pairs"]
+        }
+        with instrumentation.stage("serialize"):
+            return respond(result)
 
+    except HTTPException:
+        # 503 / 504 from serving.py
+        raise
     except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+        return respond({"status": "error", "message": str(e)}), 500
 
 if __name__ == "__main__":
-    app.run(debug=True, host='0.0.0.0', port=5001) # เปลี่ยน port เป็น 5001 (หาก 5000 รัน Vedic API อยู่)
+    serve(app, port=5001) # เปลี่ยน port เป็น 5001 (หาก 5000 รัน Vedic API อยู่), --dev สำหรับ debug server
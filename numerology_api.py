@@ -1,6 +1,16 @@
-from flask import Flask, request, jsonify
+import time
+
+import numpy as np
+from flask import Flask, Response, request, stream_with_context
+import instrumentation
+import responses
+from responses import respond
+from idempotency import idempotent, numerology_inputs
+from serving import serve
 
 app = Flask(__name__)
+instrumentation.init_app(app)
+responses.init_app(app)
 
 # พจนานุกรม Pythagorean สำหรับภาษาอังกฤษ
 pythagorean_values = {
@@ -102,19 +112,321 @@ def numerology_analysis(name):
         }
     return result
 
+# --- Batch scoring (mailing lists) ---
+# ค่าตัวอักษรเป็นตาราง 256 ช่อง index ด้วย byte ของชื่อที่ encode แล้ว
+# byte ที่ไม่ใช่ a-z (รวมถึง byte ของตัวอักษร non-ASCII) มีค่า 0 เหมือน pythagorean_values.get
+LETTER_VALUES = np.zeros(256, dtype=np.int64)
+for _char, _value in pythagorean_values.items():
+    LETTER_VALUES[ord(_char)] = _value
+VOWEL_MASK = np.zeros(256, dtype=bool)
+VOWEL_MASK[[ord(c) for c in "aeiou"]] = True
+
+MASTER_NUMBERS = np.array([11, 22, 33])
+BATCH_CHUNK_SIZE = 10000
+
+def reduce_numbers(nums):
+    # reduce_number แบบ vectorized: บวกเลขทุกหลักพร้อมกันทั้ง array
+    # จนเหลือเลขเดียวหรือเจอ Master Number (ผลรวมของชื่อจริงใช้ไม่เกิน 3 รอบ)
+    nums = np.array(nums, dtype=np.int64)
+    active = (nums > 9) & ~np.isin(nums, MASTER_NUMBERS)
+    while active.any():
+        rest = nums[active]
+        total = np.zeros_like(rest)
+        while rest.any():
+            total += rest % 10
+            rest //= 10
+        nums[active] = total
+        active = (nums > 9) & ~np.isin(nums, MASTER_NUMBERS)
+    return nums
+
+def numerology_numbers_batch(names):
+    # คืน (destiny, soul_urge, personality) เป็น numpy array ตามลำดับ names
+    encoded = [name.lower().encode("utf-8") for name in names]
+    lengths = np.fromiter((len(e) for e in encoded), dtype=np.int64, count=len(encoded))
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+
+    codes = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    values = LETTER_VALUES[codes]
+    vowel_values = np.where(VOWEL_MASK[codes], values, 0)
+
+    def per_name(arr):
+        running = np.concatenate(([0], np.cumsum(arr)))
+        return running[ends] - running[starts]
+
+    destiny = per_name(values)
+    soul_urge = per_name(vowel_values)
+    personality = destiny - soul_urge
+    return reduce_numbers(destiny), reduce_numbers(soul_urge), reduce_numbers(personality)
+
+def _number_result(n):
+    return {
+        "number": n,
+        "label": numerology_meanings.get(n, {}).get("label", "N/A"),
+        "meaning": numerology_meanings.get(n, {}).get("meaning", "N/A")
+    }
+
+_NUMBER_RESULTS = {n: _number_result(n) for n in range(34)}
+
+def numerology_batch(names):
+    # ผลเหมือน numerology_analysis ทีละชื่อ แต่คำนวณทั้ง list ทีเดียว
+    destiny, soul_urge, personality = numerology_numbers_batch(names)
+    return [
+        {
+            "destiny_number": _NUMBER_RESULTS[d],
+            "soul_urge_number": _NUMBER_RESULTS[s],
+            "personality_number": _NUMBER_RESULTS[p]
+        }
+        for d, s, p in zip(destiny.tolist(), soul_urge.tolist(), personality.tolist())
+    ]
+
+# --- Name-variant explorer ("ชื่อสะกดแบบไหนได้เลข 22?") ---
+# ผลรวมสระ/พยัญชนะของแต่ละคำคำนวณครั้งเดียว แล้วแต่ละการแก้ไข (แทนที่/แทรกตัวอักษร,
+# ชื่อเล่น, ชื่อกลาง) เป็นแค่การบวก delta เข้าไป ไม่ต้องคำนวณทั้งชื่อใหม่
+# สร้าง string จริงเฉพาะตัวที่ได้เลขตรงเป้าหมาย
+NUMBER_TYPES = ("destiny_number", "soul_urge_number", "personality_number")
+MAX_VARIANT_EDITS = 4
+DEFAULT_VARIANT_BUDGET_MS = 250
+MAX_VARIANT_BUDGET_MS = 2000
+# จำนวนการสะกดสูงสุดต่อระดับของหนึ่งคำ (~200 bytes ต่อรายการ): กัน memory บานก่อนหมดเวลา
+# เช่น แทรกได้ 26 ตัวอักษร x max_edits 4 ในชื่อยาว ๆ
+MAX_VARIANT_FRONTIER = 100000
+
+def letter_sums(text):
+    # (ผลรวมสระ, ผลรวมพยัญชนะ) ตามกติกาเดียวกับ numerology_analysis
+    vowels = consonants = 0
+    for char in text.lower():
+        value = pythagorean_values.get(char)
+        if value:
+            if char in "aeiou":
+                vowels += value
+            else:
+                consonants += value
+    return vowels, consonants
+
+class _VariantSearchStop(Exception):
+    # complete=True: ได้ครบ top_n แล้ว, complete=False: หมดเวลา
+    def __init__(self, complete):
+        super().__init__(complete)
+        self.complete = complete
+
+class _SpellingVariants:
+    # level(k) = [(vowels, consonants, ops, ตำแหน่งถัดไป)] ของทุกการสะกดที่ห่างจาก spelling k ครั้ง
+    # สร้างทีละระดับเมื่อต้องใช้ และ ops เรียงตามตำแหน่ง จึงไม่สร้างชุดเดียวกันซ้ำ
+    def __init__(self, spelling, substitutions, insertions):
+        self.spelling = spelling
+        self.substitutions = substitutions
+        self.insertions = insertions
+        vowels, consonants = letter_sums(spelling)
+        self._levels = [[(vowels, consonants, (), 0)]]
+
+    def level(self, k, deadline):
+        while len(self._levels) <= k:
+            frontier = []
+            for v, c, ops, start in self._levels[-1]:
+                if len(frontier) > MAX_VARIANT_FRONTIER or (len(frontier) > 4096 and time.perf_counter() > deadline):
+                    raise _VariantSearchStop(False)
+                for pos in range(start, len(self.spelling) + 1):
+                    for letter, (dv, dc) in self.insertions:
+                        frontier.append((v + dv, c + dc, ops + ((pos, letter, ""),), pos))
+                    for key, alternatives in self.substitutions:
+                        if self.spelling.startswith(key, pos):
+                            for alt, dv, dc in alternatives:
+                                frontier.append((v + dv, c + dc, ops + ((pos, alt, key),), pos + len(key)))
+            self._levels.append(frontier)
+        return self._levels[k]
+
+class _FixedSpelling:
+    # ชื่อกลาง: ใช้ตามที่ให้มา ไม่แก้ไขเพิ่ม
+    def __init__(self, spelling):
+        self.spelling = spelling
+        self._level = [letter_sums(spelling) + ((), 0)]
+
+    def level(self, k, deadline):
+        return self._level if k == 0 else []
+
+def _apply_ops(spelling, ops):
+    for pos, alt, key in reversed(ops):
+        spelling = spelling[:pos] + alt + spelling[pos + len(key):]
+    return spelling
+
+def _build_slots(name, substitutions, insertions, nicknames, middle_names, max_edits):
+    # แต่ละ slot คือคำหนึ่งคำในชื่อ: list ของ (ต้นทุน, การสะกด, ขึ้นต้นตัวพิมพ์ใหญ่หรือไม่)
+    subs = [
+        (key.lower(), [(alt.lower(),) + tuple(a - b for a, b in zip(letter_sums(alt), letter_sums(key)))
+                       for alt in alternatives])
+        for key, alternatives in substitutions.items() if key
+    ]
+    inserts = [(letter.lower(), letter_sums(letter)) for letter in insertions if letter]
+    nicknames = {k.lower(): v for k, v in nicknames.items()}
+
+    def options(token, alternatives):
+        spellings = [(0, token)] + [(1, alt) for alt in alternatives if alt.lower() != token.lower()]
+        return [(cost, _SpellingVariants(spelling.lower(), subs, inserts), spelling[:1].isupper())
+                for cost, spelling in spellings if cost <= max_edits]
+
+    tokens = name.split()
+    slots = [options(token, nicknames.get(token.lower(), [])) for token in tokens]
+    if middle_names and max_edits >= 1:
+        # slot ชื่อกลาง: ไม่ใส่ (ต้นทุน 0) หรือใส่หนึ่งชื่อ (ต้นทุน 1)
+        middle = [(0, _FixedSpelling(""), False)]
+        middle += [(1, _FixedSpelling(m.lower()), m[:1].isupper()) for m in middle_names if m]
+        slots.insert(min(1, len(slots)), middle)
+    return slots
+
+def explore_name_variants(name, target, number_type="destiny_number", substitutions=None,
+                          insertions=None, nicknames=None, middle_names=None,
+                          max_edits=2, top_n=10, budget_ms=DEFAULT_VARIANT_BUDGET_MS):
+    # ไล่จากจำนวนการแก้ไขน้อยไปมาก ตัวที่เจอก่อนจึงใกล้ชื่อเดิมที่สุด
+    # หยุดเมื่อได้ครบ top_n หรือหมดเวลา budget_ms
+    deadline = time.perf_counter() + budget_ms / 1000.0
+    slots = _build_slots(name, substitutions or {}, insertions or [], nicknames or {},
+                         middle_names or [], max_edits)
+    pick = NUMBER_TYPES.index(number_type)
+    found = {}
+    evaluated = 0
+
+    def visit(slot_index, remaining, vowels, consonants, chosen, changes):
+        nonlocal evaluated
+        if slot_index == len(slots):
+            if remaining:
+                return
+            evaluated += 1
+            if evaluated % 1024 == 0 and time.perf_counter() > deadline:
+                raise _VariantSearchStop(False)
+            number = reduce_number((vowels + consonants, vowels, consonants)[pick])
+            if number == target:
+                words = []
+                for variants, ops, capitalized in chosen:
+                    word = _apply_ops(variants.spelling, ops)
+                    if word:
+                        words.append(word[:1].upper() + word[1:] if capitalized else word)
+                found.setdefault(" ".join(words), changes)
+                if len(found) >= top_n:
+                    raise _VariantSearchStop(True)
+            return
+        for cost, variants, capitalized in slots[slot_index]:
+            for edits in range(0, remaining - cost + 1):
+                for v, c, ops, _ in variants.level(edits, deadline):
+                    visit(slot_index + 1, remaining - cost - edits, vowels + v, consonants + c,
+                          chosen + ((variants, ops, capitalized),), changes)
+
+    complete = True
+    try:
+        for changes in range(0, max_edits + 1):
+            visit(0, changes, 0, 0, (), changes)
+    except _VariantSearchStop as stop:
+        complete = stop.complete
+
+    variants = [
+        {"name": variant, "changes": count, "result": numerology_analysis(variant)}
+        for variant, count in found.items()
+    ]
+    return {"variants": variants, "evaluated": evaluated, "complete": complete}
+
+def _is_valid_name(name):
+    return isinstance(name, str) and any(c.isalpha() for c in name)
+
+def _is_text_list(value):
+    return isinstance(value, list) and all(isinstance(v, str) for v in value)
+
+def _variant_options_error(data):
+    # substitutions / nicknames: {"text": ["alternative", ...]}, insertions / middle_names: ["text", ...]
+    for field in ("substitutions", "nicknames"):
+        value = data.get(field)
+        if value is not None and not (isinstance(value, dict) and all(_is_text_list(v) for v in value.values())):
+            return f"{field} must be an object mapping text to a list of alternatives"
+    for field in ("insertions", "middle_names"):
+        value = data.get(field)
+        if value is not None and not _is_text_list(value):
+            return f"{field} must be a list of text"
+    return None
+
 @app.route("/calculate_numerology", methods=["POST"])
+@idempotent(numerology_inputs)
 def calculate_numerology():
     data = request.get_json()
     name = data.get("name", "")
     if not name or not any(c.isalpha() for c in name):
-        return jsonify({"status": "error", "message": "Please enter a valid English name"}), 400
+        return respond({"status": "error", "message": "Please enter a valid English name"}), 400
 
-    result = numerology_analysis(name)
-    return jsonify({
+    with instrumentation.stage("numerology"):
+        result = numerology_analysis(name)
+    return respond({
         "status": "success",
         "input": name,
         "result": result
     })
 
+@app.route("/calculate_numerology/batch", methods=["POST"])
+def calculate_numerology_batch():
+    # รับ {"names": [...]} หรือ text/plain หนึ่งชื่อต่อบรรทัด แล้วตอบเป็น NDJSON ทีละชื่อ
+    if request.is_json:
+        names = (request.get_json() or {}).get("names")
+    else:
+        names = request.get_data(as_text=True).splitlines()
+    if not isinstance(names, list) or not names:
+        return respond({"status": "error", "message": "Please provide a non-empty list of names"}), 400
+
+    def generate():
+        for i in range(0, len(names), BATCH_CHUNK_SIZE):
+            chunk = names[i:i + BATCH_CHUNK_SIZE]
+            valid = [name for name in chunk if _is_valid_name(name)]
+            results = iter(numerology_batch(valid))
+            lines = []
+            for name in chunk:
+                if _is_valid_name(name):
+                    lines.append(responses.dumps({"status": "success", "input": name, "result": next(results)}))
+                else:
+                    lines.append(responses.dumps({"status": "error", "input": name, "message": "Please enter a valid English name"}))
+            yield b"\n".join(lines) + b"\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+@app.route("/calculate_numerology/variants", methods=["POST"])
+def calculate_numerology_variants():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {}
+    name = data.get("name", "")
+    if not _is_valid_name(name):
+        return respond({"status": "error", "message": "Please enter a valid English name"}), 400
+    target = data.get("target")
+    # True == 1 ใน Python: ไม่รับ bool เป็นเลขเป้าหมาย
+    if isinstance(target, bool) or target not in numerology_meanings:
+        return respond({"status": "error", "message": f"target must be one of {sorted(numerology_meanings)}"}), 400
+    number_type = data.get("number_type", "destiny_number")
+    if number_type not in NUMBER_TYPES:
+        return respond({"status": "error", "message": f"number_type must be one of {list(NUMBER_TYPES)}"}), 400
+    options_error = _variant_options_error(data)
+    if options_error:
+        return respond({"status": "error", "message": options_error}), 400
+
+    try:
+        max_edits = min(int(data.get("max_edits", 2)), MAX_VARIANT_EDITS)
+        top_n = max(int(data.get("top_n", 10)), 1)
+        budget_ms = min(float(data.get("budget_ms", DEFAULT_VARIANT_BUDGET_MS)), MAX_VARIANT_BUDGET_MS)
+    except (TypeError, ValueError):
+        return respond({"status": "error", "message": "max_edits, top_n and budget_ms must be numbers"}), 400
+
+    started = time.perf_counter()
+    with instrumentation.stage("numerology"):
+        explored = explore_name_variants(
+            name, target, number_type,
+            substitutions=data.get("substitutions"),
+            insertions=data.get("insertions"),
+            nicknames=data.get("nicknames"),
+            middle_names=data.get("middle_names"),
+            max_edits=max_edits, top_n=top_n, budget_ms=budget_ms
+        )
+    return respond({
+        "status": "success",
+        "input": name,
+        "target": target,
+        "number_type": number_type,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        **explored
+    })
+
 if __name__ == "__main__":
-    app.run(debug=True, port=5004)
\ No newline at end of file
+    serve(app, port=5004)
\ No newline at end of file
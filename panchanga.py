@@ -0,0 +1,109 @@
+import math
+from bisect import bisect_right
+
+import swisseph as swe
+
+# Tithi / nakshatra calendars without building a chart per day.
+#
+# The Sun-Moon elongation and the sidereal Moon longitude both only increase,
+# so the calendar is a walk over a coarse time grid: wherever a 12 degree
+# (tithi) or 13 deg 20' (nakshatra) boundary falls between two grid points,
+# Newton steps on the body speeds find the crossing instant. A year is ~1500
+# ephemeris calls rather than hundreds of full chart builds.
+#
+# Sidereal longitudes use swisseph's current sidereal mode, which is process
+# global: run these functions in vedic_engine's per-ayanamsa workers
+# (engine.run), never beside another ayanamsa.
+
+TITHI_ARC = 12.0
+NAKSHATRA_ARC = 360.0 / 27.0
+# Elongation grows 10-15 degrees a day, the Moon 12-15: a half-day grid never
+# skips a whole tithi or nakshatra.
+STEP_DAYS = 0.5
+# Newton stops once the crossing is known to within ~0.1 s.
+TOLERANCE_DAYS = 1e-6
+
+TITHI_NAMES = ("PRATIPADA", "DWITIYA", "TRITIYA", "CHATURTHI", "PANCHAMI", "SHASHTHI",
+               "SAPTAMI", "ASHTAMI", "NAVAMI", "DASHAMI", "EKADASHI", "DWADASHI",
+               "TRAYODASHI", "CHATURDASHI")
+NAKSHATRA_NAMES = ("ASHVINI", "BHARANI", "KRITTIKA", "ROHINI", "MRIGASHIRA", "ARDRA",
+                   "PUNARVASU", "PUSHYA", "ASHLESHA", "MAGHA", "PURVA PHALGUNI",
+                   "UTTARA PHALGUNI", "HASTA", "CHITRA", "SWATI", "VISHAKHA", "ANURADHA",
+                   "JYESHTHA", "MULA", "PURVA ASHADHA", "UTTARA ASHADHA", "SHRAVANA",
+                   "DHANISHTHA", "SHATABHISHA", "PURVA BHADRAPADA", "UTTARA BHADRAPADA", "REVATI")
+
+_FLAGS = swe.FLG_SWIEPH | swe.FLG_SPEED
+
+
+def tithi_name(index):
+    """Name and paksha of tithi `index` (0-29, counted from the new moon)."""
+    if index == 14:
+        return "PURNIMA", "Shukla"
+    if index == 29:
+        return "AMAVASYA", "Krishna"
+    return TITHI_NAMES[index % 15], "Shukla" if index < 15 else "Krishna"
+
+
+def _elongation(jd):
+    sun = swe.calc_ut(jd, swe.SUN, _FLAGS)[0]
+    moon = swe.calc_ut(jd, swe.MOON, _FLAGS)[0]
+    return (moon[0] - sun[0]) % 360.0, moon[3] - sun[3]
+
+
+def _sidereal_moon(jd):
+    moon = swe.calc_ut(jd, swe.MOON, _FLAGS)[0]
+    return (moon[0] - swe.get_ayanamsa_ut(jd)) % 360.0, moon[3]
+
+
+def _crossings(angle, start_jd, end_jd, arc):
+    """[(jd, segment index)] for every multiple of `arc` that `angle` crosses in the range,
+    plus the segment in force at start_jd."""
+    value, _ = angle(start_jd)
+    count = int(round(360.0 / arc))
+    events = [(start_jd, int(value // arc) % count)]
+    unwrapped = value
+    jd = start_jd
+    while jd < end_jd:
+        next_jd = min(jd + STEP_DAYS, end_jd)
+        next_value, _ = angle(next_jd)
+        next_unwrapped = unwrapped + (next_value - unwrapped) % 360.0
+        for boundary in range(int(unwrapped // arc) + 1, int(next_unwrapped // arc) + 1):
+            target = boundary * arc
+            # Linear guess, then Newton on the (wrapped) distance to the boundary.
+            t = jd + (target - unwrapped) / (next_unwrapped - unwrapped) * (next_jd - jd)
+            for _ in range(6):
+                current, speed = angle(t)
+                delta = (current - target + 180.0) % 360.0 - 180.0
+                step = delta / speed
+                t -= step
+                if abs(step) < TOLERANCE_DAYS:
+                    break
+            events.append((t, boundary % count))
+        jd, unwrapped = next_jd, next_unwrapped
+    return events
+
+
+def sunrises(start_jd, days, latitude, longitude):
+    """Julian day of sunrise for each day from start_jd (local midnight); None where the Sun does not rise."""
+    rises = []
+    geopos = (longitude, latitude, 0.0)
+    for day in range(days):
+        result, times = swe.rise_trans(start_jd + day, swe.SUN, swe.CALC_RISE, geopos)
+        rise = times[0]
+        rises.append(rise if result == 0 and rise < start_jd + day + 1 else None)
+    return rises
+
+
+def calendar(start_jd, days, latitude, longitude):
+    """Tithi and nakshatra transitions and sunrises for `days` days from local midnight `start_jd`."""
+    end_jd = start_jd + days
+    return {
+        "tithi": _crossings(_elongation, start_jd, end_jd, TITHI_ARC),
+        "nakshatra": _crossings(_sidereal_moon, start_jd, end_jd, NAKSHATRA_ARC),
+        "sunrise": sunrises(start_jd, days, latitude, longitude),
+    }
+
+
+def segment_at(events, jd):
+    """Index of the tithi / nakshatra in force at `jd`, from calendar() transitions."""
+    return events[max(bisect_right(events, (jd, math.inf)) - 1, 0)][1]
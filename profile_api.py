@@ -0,0 +1,201 @@
+from concurrent.futures import wait
+
+from flask import Flask, request
+from werkzeug.exceptions import HTTPException
+import engines
+import instrumentation
+import jobs
+import responses
+from responses import respond
+from idempotency import birth_data_inputs, idempotent
+
+from chart_cache import add_stats_route
+from geocoding import normalize_place
+from serving import ComputeTimeout, Overloaded, chart_pool, engine_pool, resolve_place, serve, submit_chart
+from timezones import BirthTimeError, resolve_birth_moment
+from vedic_calculator_api import compute_vedic
+from vedic_engine import DEFAULT_AYANAMSA, normalize_ayanamsa
+from natal_chart_calculator_immanuel import compute_natal
+from birth_chart_api import compute_birth_chart
+from human_design_api import compute_human_design
+from numerology_api import numerology_analysis
+
+geopy_exc = engines.lazy("geopy.exc")
+
+# Gateway in front of the individual services: the birth place, timezone and
+# datetime are resolved once, then every chart is computed in parallel on
+# serving.py's chart pool, so the response takes about as long as the slowest chart.
+
+app = Flask(__name__)
+instrumentation.init_app(app)
+responses.init_app(app)
+add_stats_route(app)
+
+def compute_profile(moment, location, name=None, ayanamsa=DEFAULT_AYANAMSA):
+    latitude, longitude = location.latitude, location.longitude
+    futures = {
+        # Vedic charts already run in vedic_engine's per-ayanamsa processes; a
+        # thread on engine_pool only waits for them.
+        "Vedic Astrology": submit_chart(compute_vedic, moment.local, moment.offset_hours, latitude, longitude,
+                                        pool=engine_pool, ayanamsa=ayanamsa),
+        "Western Astrology": submit_chart(compute_natal, moment.utc, latitude, longitude),
+        "Birth Chart": submit_chart(compute_birth_chart, moment.utc, latitude, longitude),
+        "Human Design": submit_chart(compute_human_design, moment.utc, latitude, longitude),
+    }
+    if name and any(c.isalpha() for c in name):
+        futures["Numerology"] = chart_pool.submit(numerology_analysis, name)
+
+    # One deadline for all sections, not one per section: the profile answers
+    # within CHART_TIMEOUT, well inside the gunicorn worker timeout. One failing
+    # or unfinished chart should not take the whole profile down with it.
+    # A chart that misses the deadline is not stopped: a running process or
+    # thread cannot be interrupted, so it keeps its BoundedPool slot (and counts
+    # against the queue depth) until it finishes, and its result still fills
+    # the chart cache for a retry.
+    sections = {}
+    with instrumentation.stage("charts"):
+        wait(futures.values(), timeout=chart_pool.timeout)
+        for key, future in futures.items():
+            if not future.done():
+                sections[key] = {"status": "error", "message": f"{key} did not finish in time."}
+                continue
+            try:
+                sections[key] = future.result()
+            except Exception as e:
+                sections[key] = {"status": "error", "message": str(e)}
+    return sections
+
+
+class ProfileInputError(Exception):
+    # ข้อมูลเกิดไม่ครบ / หาสถานที่ไม่เจอ: ตอบ 400 (ไม่ต้อง retry)
+    def __init__(self, body):
+        super().__init__(body.get("message"))
+        self.body = body
+
+
+def build_profile(birth_data):
+    name = birth_data.get("Full Name")
+    birth_date_str = birth_data.get("Birth Date")
+    birth_time_str = birth_data.get("Birth Time")
+    birth_place_raw = birth_data.get("Birth Place")
+
+    if not all([birth_date_str, birth_time_str, birth_place_raw]):
+        raise ProfileInputError({"status": "error", "message": "Missing required fields: Birth Date, Birth Time, or Birth Place."})
+
+    try:
+        ayanamsa = normalize_ayanamsa(birth_data.get("Ayanamsa"))
+    except ValueError as e:
+        raise ProfileInputError({"status": "error", "message": str(e)})
+
+    location = resolve_place(birth_place_raw, user_agent="the_soul_weaver_profile_app")
+    if not location:
+        raise ProfileInputError({"status": "error", "message": f"Birth place '{birth_place_raw}' not found."})
+
+    try:
+        moment = resolve_birth_moment(birth_date_str, birth_time_str,
+                                      location.latitude, location.longitude, birth_place_raw)
+    except BirthTimeError as e:
+        raise ProfileInputError(e.to_dict())
+
+    return {
+        "status": "success",
+        "Birth Info": {
+            "Full Name": name,
+            "Birth Date": birth_date_str,
+            "Birth Time": birth_time_str,
+            "Birth Place": birth_place_raw
+        },
+        **compute_profile(moment, location, name, ayanamsa),
+        "Calculation Inputs": {
+            "Resolved Place": location.address,
+            "Latitude": location.latitude,
+            "Longitude": location.longitude,
+            "Timezone Name": moment.timezone_name,
+            "UTC Offset (Hours)": moment.offset_hours,
+            "Calculated UTC Time": moment.utc.strftime('%Y-%m-%d %H:%M:%S %Z')
+        }
+    }
+
+
+@app.route("/calculate_profile", methods=["POST"])
+@idempotent(birth_data_inputs)
+def calculate_profile():
+    try:
+        result = build_profile(request.get_json())
+        # immanuel values are not always JSON-native; responses.py sends them as str()
+        with instrumentation.stage("serialize"):
+            response = respond(result)
+        if any(isinstance(section, dict) and section.get("status") == "error" for section in result.values()):
+            # chart บางส่วนล้มเหลว (เช่น pool เต็ม): ไม่เก็บไว้ตอบซ้ำใน response store
+            response.headers["Cache-Control"] = "no-store"
+        return response
+
+    except ProfileInputError as e:
+        return respond(e.body), 400
+    except HTTPException:
+        # 503 / 504 from serving.py
+        raise
+    except Exception as e:
+        return respond({"status": "error", "message": str(e)}), 500
+
+
+# --- Job API: POST /jobs/profile แล้ว poll / long-poll ที่ GET /jobs/<id> ---
+# สำหรับตอนที่ service ยุ่งจน /calculate_profile ไม่ทันใน request เดียว
+
+queue = jobs.JobQueue()
+
+
+def profile_job(birth_data):
+    try:
+        return build_profile(birth_data)
+    except ProfileInputError as e:
+        raise jobs.JobError(e.body)
+    except (Overloaded, ComputeTimeout) as e:
+        # pool เต็ม / คำนวณไม่ทัน: ลองใหม่ทีหลัง
+        raise jobs.RetryLater(e.description)
+    except geopy_exc.GeocoderServiceError as e:
+        # Nominatim ล่ม / timeout / rate limit
+        raise jobs.RetryLater(f"Geocoder unavailable: {e}")
+
+
+queue.register("profile", profile_job)
+
+
+@app.route("/jobs/profile", methods=["POST"])
+def submit_profile_job():
+    try:
+        birth_data = request.get_json()
+        birth_place_raw = birth_data.get("Birth Place")
+        if not all([birth_data.get("Birth Date"), birth_data.get("Birth Time"), birth_place_raw]):
+            return respond({"status": "error", "message": "Missing required fields: Birth Date, Birth Time, or Birth Place."}), 400
+
+        try:
+            ayanamsa = normalize_ayanamsa(birth_data.get("Ayanamsa"))
+        except ValueError as e:
+            return respond({"status": "error", "message": str(e)}), 400
+        try:
+            priority = int(birth_data.get("Priority") or 0)
+        except (TypeError, ValueError):
+            return respond({"status": "error", "message": "Priority must be an integer (higher runs first)."}), 400
+
+        # งานที่ input เหมือนกัน (สถานที่ normalize แล้ว) และยังไม่เสร็จ ใช้ job เดิม
+        dedup = {
+            "Full Name": birth_data.get("Full Name"),
+            "Birth Date": birth_data.get("Birth Date"),
+            "Birth Time": birth_data.get("Birth Time"),
+            "Birth Place": normalize_place(birth_place_raw),
+            "Ayanamsa": ayanamsa,
+        }
+        job_id, deduplicated = queue.submit("profile", birth_data, priority=priority, dedup=dedup)
+        queue.start()
+        return respond({"status": "queued", "job_id": job_id, "deduplicated": deduplicated,
+                        "poll": f"/jobs/{job_id}"}, status=202)
+
+    except Exception as e:
+        return respond({"status": "error", "message": str(e)}), 500
+
+
+jobs.add_job_routes(app, queue)
+
+if __name__ == "__main__":
+    serve(app, port=5005)
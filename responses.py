@@ -0,0 +1,213 @@
+import gzip
+import json
+import os
+from datetime import date, datetime
+
+from flask import Response, request
+
+# One response layer for every service endpoint:
+#
+#   return respond(result)            # instead of jsonify(result) / json.dumps(...)
+#   return respond(error_dict), 400
+#
+# - JSON is compact and encoded with orjson when it is installed (datetimes,
+#   NumPy arrays and scalars natively; anything else, e.g. immanuel objects,
+#   as str(), the same as the old json.dumps(default=str)).
+# - `Accept: application/msgpack` gets MessagePack (pip install msgpack).
+# - `?schema=compact` (or `Accept: application/json; schema=compact`) renames
+#   the long keys to the short ones in COMPACT_KEYS and sends zodiac signs as
+#   0-11; GET /response_schema returns both tables so a client can expand them.
+# - Bodies of RESPONSE_COMPRESS_MIN_BYTES or more are brotli (pip install brotli)
+#   or gzip compressed when the client accepts it.
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RESPONSE_COMPRESS_MIN_BYTES = int(os.environ.get("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+RESPONSE_GZIP_LEVEL = int(os.environ.get("RESPONSE_GZIP_LEVEL", "3"))
+RESPONSE_BROTLI_QUALITY = int(os.environ.get("RESPONSE_BROTLI_QUALITY", "4"))
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPES = ("application/msgpack", "application/x-msgpack")
+COMPACT_SCHEMA = "compact"
+COMPACT_SCHEMA_VERSION = "1"
+
+COMPACT_KEYS = {
+    # Envelope and inputs
+    "status": "s", "message": "m", "count": "n",
+    "Birth Info": "bi", "Birth Date": "bd", "Birth Time": "bt", "Birth Place": "bp",
+    "Full Name": "fn", "Email Address": "em", "Name": "nm",
+    "inputs": "in", "Calculation Inputs": "ci", "CalculationInputs": "ci2",
+    "Resolved Place": "rp", "Resolved Address": "ra", "Latitude": "lat", "Longitude": "lon",
+    "Timezone Name": "tz", "UTC Offset (Hours)": "off", "Calculated UTC Time": "utc",
+    "Accuracy Note": "an",
+    # Vedic
+    "VedicData": "vd", "Vedic Astrology": "va", "Tithi": "ti", "Nakshatra": "nk",
+    "Nakshatra Pada": "np", "Moon Sign": "mo", "Saturn Sign": "sa", "Rahu Sign": "ra_",
+    "Ketu Sign": "ke", "Kala Sarpa Yoga": "ksy", "Ayanamsa": "ay", "Ayanamsha": "ay_",
+    "Ephemeris": "eph", "Calculation Mode": "cm", "Report": "rep", "Tithi Report": "tr",
+    "Nakshatra Report": "nr", "Days": "days", "Date": "d", "Sunrise": "sr", "Paksha": "pk",
+    "Tithi Number": "tn", "Transitions": "trn", "Starts": "st", "Reports": "reps",
+    # Western / birth chart
+    "Western Astrology": "wa", "Birth Chart": "bc", "birth_chart": "bc_", "Planets": "pl",
+    "Houses": "hs", "Ascendant": "asc", "Midheaven (MC)": "mc", "name": "na", "sign": "sg",
+    "sign_symbol": "sy", "degree": "dg", "house": "h", "longitude": "lg", "planets": "pls",
+    "uncovered_rows": "ur",
+    # Synastry
+    "Members": "mb", "Harmony": "ha", "Tension": "te", "Pairs": "pr", "members": "mbr",
+    "score": "sc", "harmony": "hr", "tension": "tns", "aspects": "as", "planet_a": "pa",
+    "planet_b": "pb", "aspect": "a", "orb": "o", "strength": "str",
+    # Human Design
+    "Human Design": "hd", "human_design": "hd_", "Type": "ty", "Strategy": "sy_",
+    "Authority": "au", "Profile": "pf", "Definition": "df", "Defined Centers": "dc",
+    "Open Centers": "oc", "Channels": "ch", "Activations": "act",
+    # Numerology
+    "Numerology": "nu", "input": "i", "result": "r", "destiny_number": "dn", "soul_urge_number": "su",
+    "personality_number": "pn", "number": "num", "meaning": "mn", "label": "lb", "variants": "vr",
+    "changes": "cg", "evaluated": "ev", "complete": "cp", "target": "tg", "number_type": "nt",
+    "elapsed_ms": "ms",
+}
+# Same order as ephemeris_table.SIGNS, which is not imported here so that
+# services without charts (numerology) never load the ephemeris code.
+SIGNS = ("Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo", "Libra", "Scorpio", "Sagittarius",
+         "Capricorn", "Aquarius", "Pisces")
+COMPACT_SIGN_KEYS = {"sign", "Moon Sign", "Saturn Sign", "Rahu Sign", "Ketu Sign"}
+_SIGN_INDEX = {name.lower(): index for index, name in enumerate(SIGNS)}
+assert len(set(COMPACT_KEYS.values())) == len(COMPACT_KEYS)
+
+
+def compact(value, key=None):
+    """`value` with COMPACT_KEYS applied to every dict key and sign names as 0-11."""
+    if isinstance(value, dict):
+        return {COMPACT_KEYS.get(k, k): compact(v, k) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [compact(v, key) for v in value]
+    if key in COMPACT_SIGN_KEYS and isinstance(value, str):
+        return _SIGN_INDEX.get(value.lower(), value)
+    return value
+
+
+def schema_description():
+    return {
+        "schema": COMPACT_SCHEMA,
+        "version": COMPACT_SCHEMA_VERSION,
+        "keys": {short: long for long, short in COMPACT_KEYS.items()},
+        "signs": list(SIGNS),
+        "sign_keys": sorted(COMPACT_KEYS[k] for k in COMPACT_SIGN_KEYS),
+    }
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, "tolist"):
+        # NumPy arrays and scalars.
+        return value.tolist()
+    return str(value)
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(value):
+        """Compact JSON as bytes."""
+        return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(value):
+        """Compact JSON as bytes."""
+        return json.dumps(value, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _parse_header(header):
+    # "a/b;q=0.5;schema=compact, c/d" -> {"a/b": {"q": "0.5", "schema": "compact"}, "c/d": {}}
+    items = {}
+    for part in (header or "").split(","):
+        token, *params = [p.strip() for p in part.split(";")]
+        if token:
+            items[token.lower()] = dict(p.split("=", 1) for p in params if "=" in p)
+    return items
+
+
+def _quality(params):
+    try:
+        return float(params.get("q", "1"))
+    except ValueError:
+        return 0.0
+
+
+def _choose(accept):
+    # (use msgpack, schema asked for on the chosen media type)
+    items = _parse_header(accept)
+    json_params = items.get(JSON_MIMETYPE, items.get("*/*", {}))
+    json_quality = _quality(json_params) if json_params or JSON_MIMETYPE in items or "*/*" in items else 0.0
+    if msgpack is not None:
+        for mimetype in MSGPACK_MIMETYPES:
+            if mimetype in items and _quality(items[mimetype]) > 0 and _quality(items[mimetype]) >= json_quality:
+                return True, items[mimetype].get("schema")
+    return False, json_params.get("schema")
+
+
+def _encoding(accept_encoding):
+    items = _parse_header(accept_encoding)
+    if brotli is not None and _quality(items.get("br", {"q": "0"})) > 0:
+        return "br"
+    if _quality(items.get("gzip", {"q": "0"})) > 0:
+        return "gzip"
+    return None
+
+
+def representation(accept="", accept_encoding="", schema=None):
+    """What encode() will send for these request headers: (format, schema, content coding).
+
+    The content coding is the one used if the body is big enough to compress."""
+    use_msgpack, accept_schema = _choose(accept)
+    schema = schema or accept_schema
+    return ("msgpack" if use_msgpack else "json", COMPACT_SCHEMA if schema == COMPACT_SCHEMA else None,
+            _encoding(accept_encoding))
+
+
+def encode(payload, accept="", accept_encoding="", schema=None):
+    """Body bytes and headers for `payload`, negotiated from the request headers."""
+    use_msgpack, accept_schema = _choose(accept)
+    schema = schema or accept_schema
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if schema == COMPACT_SCHEMA:
+        payload = compact(payload)
+        headers["X-Response-Schema"] = f"{COMPACT_SCHEMA}/{COMPACT_SCHEMA_VERSION}"
+    if use_msgpack:
+        body = msgpack.packb(payload, default=_default, use_bin_type=True)
+        headers["Content-Type"] = MSGPACK_MIMETYPES[0]
+    else:
+        body = dumps(payload)
+        headers["Content-Type"] = JSON_MIMETYPE
+    if len(body) >= RESPONSE_COMPRESS_MIN_BYTES:
+        encoding = _encoding(accept_encoding)
+        if encoding == "br":
+            body = brotli.compress(body, quality=RESPONSE_BROTLI_QUALITY)
+        elif encoding == "gzip":
+            # mtime=0: the same payload always compresses to the same bytes (and ETag).
+            body = gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL, mtime=0)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+    return body, headers
+
+
+def respond(payload, status=200):
+    """Flask response for `payload` in the format and encoding the request asks for."""
+    body, headers = encode(payload, request.headers.get("Accept", ""), request.headers.get("Accept-Encoding", ""),
+                           request.args.get("schema"))
+    return Response(body, status=status, headers=headers)
+
+
+def init_app(app):
+    app.add_url_rule("/response_schema", "response_schema", lambda: respond(schema_description()))
@@ -0,0 +1,273 @@
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.exceptions import GatewayTimeout, ServiceUnavailable
+
+import engines
+import geocoding
+from chart_cache import MISSING, chart_cache
+from instrumentation import stage
+
+# Production serving for the Flask services.
+#
+# Request threads only parse, look things up and serialise. The expensive work
+# goes to bounded pools:
+#   chart_pool    processes for CPU-bound chart construction (immanuel, humandesign)
+#   engine_pool   threads that wait on work already running in other processes
+#                 (vedic_engine's per-ayanamsa workers)
+#   geocode_pool  threads for gazetteer / Nominatim lookups on a place-cache miss
+# A pool that already has `workers + queue depth` jobs pending rejects new ones
+# with 503 + Retry-After instead of queueing without limit, and a request that
+# waits longer than its timeout gets 504.
+#
+# serve(app, port) runs gunicorn (gthread workers, preload_app) so the heavy
+# libraries are imported once in the master and shared copy-on-write by the
+# forked workers; --dev keeps the old app.run(debug=True) behaviour. The chart
+# engines are lazy (engines.py): warm_up() loads them before the fork, --lazy
+# skips that for the fastest start and loads each on its first request.
+
+CHART_WORKERS = int(os.environ.get("CHART_WORKERS", os.environ.get("PROFILE_WORKERS", str(os.cpu_count() or 4))))
+CHART_QUEUE_DEPTH = int(os.environ.get("CHART_QUEUE_DEPTH", str(4 * CHART_WORKERS)))
+CHART_TIMEOUT = float(os.environ.get("CHART_TIMEOUT", "30"))
+GEOCODE_THREADS = int(os.environ.get("GEOCODE_THREADS", "4"))
+# Nominatim answers about one uncached place per second, so a deep queue only
+# turns into timeouts.
+GEOCODE_QUEUE_DEPTH = int(os.environ.get("GEOCODE_QUEUE_DEPTH", "16"))
+GEOCODE_TIMEOUT = float(os.environ.get("GEOCODE_TIMEOUT", "20"))
+RETRY_AFTER_SECONDS = int(os.environ.get("RETRY_AFTER_SECONDS", "5"))
+
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", "1"))
+SERVER_THREADS = int(os.environ.get("SERVER_THREADS", "32"))
+# Default for --lazy.
+LAZY_ENGINES = os.environ.get("LAZY_ENGINES", "") not in ("", "0", "false")
+
+
+class _JSONError:
+    # Same body shape as the handlers' own errors, instead of werkzeug's HTML page.
+    def get_body(self, environ=None, scope=None):
+        return json.dumps({"status": "error", "message": self.description})
+
+    def get_headers(self, environ=None, scope=None):
+        headers = [(k, v) for k, v in super().get_headers(environ, scope) if k != "Content-Type"]
+        return headers + [("Content-Type", "application/json")]
+
+
+class Overloaded(_JSONError, ServiceUnavailable):
+    pass
+
+
+class ComputeTimeout(_JSONError, GatewayTimeout):
+    pass
+
+
+def _process_context():
+    # fork keeps the preloaded libraries shared with the chart workers
+    # (Python 3.14 switches the Linux default to forkserver).
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+
+class BoundedPool:
+    def __init__(self, name, make_executor, workers, queue_depth, timeout):
+        self.name = name
+        self.make_executor = make_executor
+        self.workers = workers
+        self.capacity = workers + queue_depth
+        self.timeout = timeout
+        self.pending = 0
+        self.rejected = 0
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created lazily in the process that uses it: a pool built in the
+        # gunicorn master must not be inherited by the forked workers.
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = self.make_executor(self.workers)
+            self._pid = os.getpid()
+        return self._executor
+
+    def _release(self, future):
+        with self._lock:
+            self.pending -= 1
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue `fn`, or raise Overloaded when the pool is already full."""
+        with self._lock:
+            if self.pending >= self.capacity:
+                self.rejected += 1
+                raise Overloaded(f"The {self.name} queue is full, try again shortly.",
+                                 retry_after=RETRY_AFTER_SECONDS)
+            try:
+                future = self._get_executor().submit(fn, *args, **kwargs)
+            except BrokenProcessPool:
+                # A worker died (OOM, segfault in a C extension); start a fresh pool.
+                self._executor = None
+                future = self._get_executor().submit(fn, *args, **kwargs)
+            self.pending += 1
+        # A job that times out keeps its slot until it really finishes, so a
+        # stuck library call still counts against the queue depth.
+        future.add_done_callback(self._release)
+        return future
+
+    def result(self, future, timeout=None):
+        try:
+            return future.result(self.timeout if timeout is None else timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise ComputeTimeout(f"The {self.name} did not finish in time.")
+
+    def run(self, fn, *args, **kwargs):
+        return self.result(self.submit(fn, *args, **kwargs))
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+
+chart_pool = BoundedPool(
+    "chart calculation",
+    lambda workers: ProcessPoolExecutor(max_workers=workers, mp_context=_process_context()),
+    CHART_WORKERS, CHART_QUEUE_DEPTH, CHART_TIMEOUT,
+)
+engine_pool = BoundedPool(
+    "chart calculation",
+    lambda workers: ThreadPoolExecutor(max_workers=workers, thread_name_prefix="engine"),
+    CHART_WORKERS, CHART_QUEUE_DEPTH, CHART_TIMEOUT,
+)
+geocode_pool = BoundedPool(
+    "place lookup",
+    lambda workers: ThreadPoolExecutor(max_workers=workers, thread_name_prefix="geocode"),
+    GEOCODE_THREADS, GEOCODE_QUEUE_DEPTH, GEOCODE_TIMEOUT,
+)
+
+
+def _call_compact(module, name, args, options):
+    # Runs in a chart worker. Looked up by name because the undecorated function
+    # cannot be pickled (its module attribute is the @cached_chart wrapper).
+    # Returns what the cache stores: a compact chart record where there is one.
+    return getattr(importlib.import_module(module), name).compact(*args, **options)
+
+
+def submit_chart(compute, *args, pool=None, **options):
+    """Start a @cached_chart compute_* function on a pool and return a Future.
+
+    This process's chart cache is checked first and filled when the chart is
+    done, so repeats never reach the pool."""
+    pool = pool or chart_pool
+    key = compute.cache_key(*args, **options)
+    cached = chart_cache.get(key)
+    if cached is not MISSING:
+        return _done(compute.render(cached))
+    if pool is chart_pool:
+        future = pool.submit(_call_compact, compute.__module__, compute.__name__, args, options)
+    else:
+        future = pool.submit(compute.compact, *args, **options)
+    return _rendered(future, key, compute)
+
+
+def _rendered(future, key, compute):
+    # Cache the computed value (a record or the dict itself) and hand callers
+    # the rendered dict. Cancelling the returned future (a timeout) cancels the
+    # computation if it has not started yet.
+    rendered = Future()
+
+    def finished(f):
+        try:
+            if f.cancelled():
+                rendered.cancel()
+            elif f.exception() is not None:
+                rendered.set_exception(f.exception())
+            else:
+                chart_cache.put(key, f.result())
+                try:
+                    value = compute.render(f.result())
+                except Exception as e:
+                    rendered.set_exception(e)
+                else:
+                    rendered.set_result(value)
+        except InvalidStateError:
+            pass  # the caller already gave up (timed out and cancelled)
+
+    rendered.add_done_callback(lambda r: r.cancelled() and future.cancel())
+    future.add_done_callback(finished)
+    return rendered
+
+
+def _done(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def run_chart(compute, *args, pool=None, **options):
+    with stage("chart"):
+        pool = pool or chart_pool
+        return pool.result(submit_chart(compute, *args, pool=pool, **options))
+
+
+def resolve_place(raw, user_agent="the_soul_weaver_app"):
+    """geocoding.resolve_place with cache misses looked up on geocode_pool."""
+    return geocoding.resolve_place(raw, user_agent, offload=geocode_pool.run)
+
+
+def warm_up():
+    # Load everything that is expensive to build before gunicorn forks, so
+    # every worker shares one copy of it.
+    engines.warm_up()
+    from timezones import get_timezone_finder
+    from solar_arc import get_solar_arc_table
+    from gazetteer import get_gazetteer
+    from ephemeris_table import get_ephemeris_table
+    get_timezone_finder()
+    get_solar_arc_table()
+    get_ephemeris_table()
+    get_gazetteer()
+
+
+def serve(app, port, host="0.0.0.0", argv=None):
+    parser = argparse.ArgumentParser(description=f"Serve {app.import_name}.")
+    parser.add_argument("--dev", action="store_true", help="Flask development server with debugger and reloader")
+    parser.add_argument("--host", default=host)
+    parser.add_argument("--port", type=int, default=port)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=SERVER_THREADS, help="request threads per worker")
+    parser.add_argument("--lazy", action="store_true", default=LAZY_ENGINES, help="skip the warm-up: load engines and tables on first use")
+    args = parser.parse_args(argv)
+
+    if args.dev:
+        app.run(debug=True, host=args.host, port=args.port)
+        return
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        sys.exit("gunicorn is not installed (pip install gunicorn); use --dev for the development server.")
+
+    class Server(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{args.host}:{args.port}")
+            self.cfg.set("workers", args.workers)
+            self.cfg.set("threads", args.threads)
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("preload_app", True)
+            # Longest a request may legitimately take: a queued chart plus its timeout.
+            self.cfg.set("timeout", int(CHART_TIMEOUT + GEOCODE_TIMEOUT) + 10)
+
+        def load(self):
+            return app
+
+    if not args.lazy:
+        warm_up()
+    Server().run()
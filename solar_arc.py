@@ -0,0 +1,250 @@
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytz
+import swisseph as swe
+
+# Human Design "design time": the moment the Sun was 88 degrees of arc before its
+# position at birth. hd.utils.get_design_time() root-finds that with repeated
+# ephemeris calls; here it is a searchsorted + two Newton steps over a precomputed,
+# memory-mapped table of the Sun's longitude.
+#
+# Table layout (.npy, float64, shape (rows, 2)):
+#   row 0      [start Julian day (UT), step in days]
+#   row 1 + i  [unwrapped apparent solar longitude, speed in deg/day] at start + i * step
+# The longitude is unwrapped (it keeps growing past 360), so it is monotonic and
+# can be searched directly. Values between rows use cubic Hermite interpolation.
+
+SOLAR_ARC_PATH = os.environ.get(
+    "SOLAR_ARC_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "solar_arc.npy"),
+)
+DESIGN_ARC = 88.0
+UNIX_EPOCH_JD = 2440587.5
+TABLE_START = (1900, 1, 1)
+TABLE_END = (2100, 12, 31)
+TABLE_STEP_DAYS = 1.0
+
+# The 13 Human Design bodies, in the order hd.Design expects them.
+HD_BODIES = ("SUN", "EARTH", "MOON", "NORTH_NODE", "SOUTH_NODE", "MERCURY", "VENUS",
+             "MARS", "JUPITER", "SATURN", "URANUS", "NEPTUNE", "PLUTO")
+# The swisseph node behind NORTH_NODE, wherever HD longitudes come from (here,
+# ephemeris_table, hd_batch): the mean node, as in the immanuel path (immanuel's
+# NORTH_NODE is swe.MEAN_NODE). The true node differs by up to ~2 degrees, enough
+# to move its gate / line.
+HD_NODE = "MEAN_NODE"
+_SWE_BODIES = {
+    "SUN": swe.SUN, "MOON": swe.MOON, "NORTH_NODE": getattr(swe, HD_NODE),
+    "MERCURY": swe.MERCURY, "VENUS": swe.VENUS, "MARS": swe.MARS, "JUPITER": swe.JUPITER,
+    "SATURN": swe.SATURN, "URANUS": swe.URANUS, "NEPTUNE": swe.NEPTUNE, "PLUTO": swe.PLUTO,
+}
+# Bodies that are defined as the point opposite another one.
+_OPPOSITE = {"EARTH": "SUN", "SOUTH_NODE": "NORTH_NODE"}
+
+
+def datetime_to_jd(dt):
+    dt = dt.astimezone(pytz.utc)
+    hours = dt.hour + dt.minute / 60.0 + (dt.second + dt.microsecond / 1e6) / 3600.0
+    return swe.julday(dt.year, dt.month, dt.day, hours)
+
+
+def jd_to_datetime(jd):
+    year, month, day, hours = swe.revjul(jd)
+    return pytz.utc.localize(datetime(year, month, day)) + timedelta(hours=hours)
+
+
+def utc_to_julian_days(values):
+    # Unix seconds or ISO 8601 UTC ("1990-05-01T03:30:00Z") -> Julian days (UT), as one array.
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+        seconds = np.asarray(values, dtype=np.float64)
+    else:
+        if not all(isinstance(v, str) for v in values):
+            raise ValueError("utc must be all Unix seconds or all ISO 8601 strings.")
+        stripped = [v[:-1] if v.endswith("Z") else v[:-6] if v.endswith("+00:00") else v for v in values]
+        if any(len(v) > 10 and v[10:].count("+") + v[10:].count("-") for v in stripped):
+            raise ValueError("utc strings must be UTC (no offset other than Z or +00:00).")
+        seconds = np.array(stripped, dtype="datetime64[s]").astype(np.int64).astype(np.float64)
+    return seconds / 86400.0 + UNIX_EPOCH_JD
+
+
+def body_longitudes(jd):
+    """Geocentric tropical longitudes of HD_BODIES at `jd`, without building a chart."""
+    longitudes = {name: swe.calc_ut(jd, body)[0][0] for name, body in _SWE_BODIES.items()}
+    for name, opposite in _OPPOSITE.items():
+        longitudes[name] = (longitudes[opposite] + 180.0) % 360.0
+    return [longitudes[name] for name in HD_BODIES]
+
+
+def build_table(path=SOLAR_ARC_PATH, step=TABLE_STEP_DAYS):
+    start = swe.julday(*TABLE_START, 0.0)
+    end = swe.julday(*TABLE_END, 24.0)
+    jds = np.arange(start, end + step, step)
+    table = np.empty((len(jds) + 1, 2))
+    table[0] = (start, step)
+    for i, jd in enumerate(jds):
+        position = swe.calc_ut(jd, swe.SUN, swe.FLG_SWIEPH | swe.FLG_SPEED)[0]
+        table[i + 1] = (position[0], position[3])
+    table[1:, 0] = np.rad2deg(np.unwrap(np.deg2rad(table[1:, 0])))
+    np.save(path, table)
+    return len(jds)
+
+
+class SolarArcTable:
+    def __init__(self, path=SOLAR_ARC_PATH):
+        table = np.load(path, mmap_mode="r")
+        self.start, self.step = float(table[0, 0]), float(table[0, 1])
+        self.longitudes = table[1:, 0]
+        self.speeds = table[1:, 1]
+        self.end = self.start + self.step * (len(self.longitudes) - 1)
+
+    def covers(self, jd):
+        return self.start <= jd < self.end
+
+    def covers_design(self, birth_jds, arc=DESIGN_ARC):
+        """Boolean array: design_jds() can answer for each birth (the birth and its
+        design date both inside the table)."""
+        birth_jds = np.asarray(birth_jds, dtype=np.float64)
+        covered = (birth_jds >= self.start) & (birth_jds < self.end)
+        target = self._sun_longitudes(np.where(covered, birth_jds, self.start))[0] - arc
+        return covered & (target >= self.longitudes[0])
+
+    def _row(self, jd):
+        if not self.start <= jd < self.end:
+            raise ValueError("Date outside the solar arc table (1900-2100).")
+        position = (jd - self.start) / self.step
+        i = int(position)
+        return i, position - i
+
+    def sun_longitude(self, jd):
+        """Unwrapped solar longitude and speed (deg/day) at `jd`, by cubic Hermite interpolation."""
+        i, t = self._row(jd)
+        h = self.step
+        p0, p1 = self.longitudes[i], self.longitudes[i + 1]
+        m0, m1 = self.speeds[i] * h, self.speeds[i + 1] * h
+        t2, t3 = t * t, t * t * t
+        value = ((2 * t3 - 3 * t2 + 1) * p0 + (t3 - 2 * t2 + t) * m0
+                 + (-2 * t3 + 3 * t2) * p1 + (t3 - t2) * m1)
+        slope = ((6 * t2 - 6 * t) * p0 + (3 * t2 - 4 * t + 1) * m0
+                 + (-6 * t2 + 6 * t) * p1 + (3 * t2 - 2 * t) * m1) / h
+        return value, slope
+
+    def design_jd(self, birth_jd, arc=DESIGN_ARC):
+        target = self.sun_longitude(birth_jd)[0] - arc
+        i = int(np.searchsorted(self.longitudes, target)) - 1
+        if i < 0:
+            raise ValueError("Design date falls before the start of the solar arc table.")
+        # Linear guess inside the bracketing row, then Newton on the Hermite curve.
+        p0, p1 = self.longitudes[i], self.longitudes[i + 1]
+        jd = self.start + self.step * (i + (target - p0) / (p1 - p0))
+        for _ in range(2):
+            value, slope = self.sun_longitude(jd)
+            jd -= (value - target) / slope
+        return jd
+
+    def design_jds(self, birth_jds, arc=DESIGN_ARC):
+        """design_jd() for an array of birth Julian days."""
+        birth_jds = np.asarray(birth_jds, dtype=np.float64)
+        if len(birth_jds) and not ((birth_jds >= self.start) & (birth_jds < self.end)).all():
+            raise ValueError("Date outside the solar arc table (1900-2100).")
+        target = self._sun_longitudes(birth_jds)[0] - arc
+        i = np.searchsorted(self.longitudes, target) - 1
+        if (i < 0).any():
+            raise ValueError("Design date falls before the start of the solar arc table.")
+        p0, p1 = self.longitudes[i], self.longitudes[i + 1]
+        jds = self.start + self.step * (i + (target - p0) / (p1 - p0))
+        for _ in range(2):
+            value, slope = self._sun_longitudes(jds)
+            jds = jds - (value - target) / slope
+        return jds
+
+    def _sun_longitudes(self, jds):
+        # sun_longitude() over an array, for design_jds.
+        position = (jds - self.start) / self.step
+        i = position.astype(np.intp)
+        t = position - i
+        h = self.step
+        p0, p1 = self.longitudes[i], self.longitudes[i + 1]
+        m0, m1 = self.speeds[i] * h, self.speeds[i + 1] * h
+        t2, t3 = t * t, t * t * t
+        value = ((2 * t3 - 3 * t2 + 1) * p0 + (t3 - 2 * t2 + t) * m0
+                 + (-2 * t3 + 3 * t2) * p1 + (t3 - t2) * m1)
+        slope = ((6 * t2 - 6 * t) * p0 + (3 * t2 - 4 * t + 1) * m0
+                 + (-6 * t2 + 6 * t) * p1 + (3 * t2 - 2 * t) * m1) / h
+        return value, slope
+
+    def design_time(self, birth_datetime_utc, arc=DESIGN_ARC):
+        return jd_to_datetime(self.design_jd(datetime_to_jd(birth_datetime_utc), arc))
+
+
+_table = None
+
+
+def get_solar_arc_table():
+    """Return the process-wide SolarArcTable, or None when it has not been built."""
+    global _table
+    if _table is None and os.path.exists(SOLAR_ARC_PATH):
+        _table = SolarArcTable(SOLAR_ARC_PATH)
+    return _table
+
+
+def _check(samples, seed):
+    # Compare against the current path: hd.utils.get_design_time() + ImmanuelChart longitudes.
+    import humandesign as hd
+    from immanuel import Chart as ImmanuelChart, const as ImmanuelConst
+
+    table = SolarArcTable()
+    rng = random.Random(seed)
+    worst_seconds = worst_arcsec = 0.0
+    table_elapsed = reference_elapsed = 0.0
+    for _ in range(samples):
+        birth = pytz.utc.localize(datetime(1901, 1, 1)) + timedelta(minutes=rng.randrange(199 * 366 * 1440))
+
+        start = time.perf_counter()
+        design = table.design_time(birth)
+        longitudes = body_longitudes(datetime_to_jd(design))
+        table_elapsed += time.perf_counter() - start
+
+        start = time.perf_counter()
+        reference = hd.utils.get_design_time(birth)
+        chart = ImmanuelChart(reference, 0.0, 0.0)
+        expected = [chart.ephemeris[getattr(ImmanuelConst, name)].longitude for name in HD_BODIES]
+        reference_elapsed += time.perf_counter() - start
+
+        worst_seconds = max(worst_seconds, abs((design - reference).total_seconds()))
+        for got, want in zip(longitudes, expected):
+            diff = abs((got - want + 180.0) % 360.0 - 180.0) * 3600.0
+            worst_arcsec = max(worst_arcsec, diff)
+
+    print(f"samples:                 {samples}")
+    print(f"max design time error:   {worst_seconds:.2f} s")
+    print(f"max body longitude diff: {worst_arcsec:.2f} arcsec")
+    print(f"table path:              {table_elapsed / samples * 1e6:.0f} us/birth")
+    print(f"reference path:          {reference_elapsed / samples * 1e6:.0f} us/birth")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or check the Human Design solar arc table.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help=f"precompute solar longitudes {TABLE_START[0]}-{TABLE_END[0]}")
+    build.add_argument("--out", default=SOLAR_ARC_PATH)
+    build.add_argument("--step", type=float, default=TABLE_STEP_DAYS, help="days between rows")
+    check = sub.add_parser("check", help="compare against hd.utils.get_design_time + immanuel")
+    check.add_argument("--samples", type=int, default=500)
+    check.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        start = time.perf_counter()
+        rows = build_table(args.out, args.step)
+        print(f"wrote {rows} rows to {args.out} in {time.perf_counter() - start:.1f}s")
+    else:
+        _check(args.samples, args.seed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
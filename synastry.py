@@ -0,0 +1,113 @@
+import numpy as np
+
+# Group compatibility from natal planet longitudes, all pairs at once.
+#
+# For N members with P planets each the whole N x N x P x P tensor of angular
+# separations is one broadcast: min(|a - b|, 360 - |a - b|) is the shortest arc
+# between any two longitudes, in 0-180. Each aspect is then a mask
+# |separation - angle| <= orb (the orbs below never overlap, so a cell has at
+# most one aspect), and its strength falls linearly from 1 when exact to 0 at
+# the edge of the orb. Harmonious aspects add to a pair's score, hard ones
+# subtract, each weighted by the two planets involved.
+
+# (name, angle, orb, sign of the contribution)
+ASPECTS = (
+    ("Conjunction", 0.0, 8.0, 1.0),
+    ("Sextile", 60.0, 6.0, 1.0),
+    ("Square", 90.0, 7.0, -1.0),
+    ("Trine", 120.0, 8.0, 1.0),
+    ("Opposition", 180.0, 8.0, -1.0),
+)
+ASPECT_NAMES = tuple(name for name, _, _, _ in ASPECTS)
+
+# Personal planets count for more in synastry than the slow outer ones, which
+# make the same aspect to everyone born within a few years.
+PLANET_WEIGHTS = {
+    "SUN": 3.0, "MOON": 3.0, "MERCURY": 1.5, "VENUS": 2.5, "MARS": 2.0,
+    "JUPITER": 1.0, "SATURN": 1.0, "URANUS": 0.5, "NEPTUNE": 0.5, "PLUTO": 0.5,
+}
+
+
+_ANGLES = np.array([angle for _, angle, _, _ in ASPECTS], dtype=np.float32)
+_ORBS = np.array([orb for _, _, orb, _ in ASPECTS], dtype=np.float32)
+# Nearest aspect for every half degree of separation (0-180): the midpoints
+# between aspect angles all fall on half degrees, so a lookup is exact.
+_NEAREST = np.searchsorted((_ANGLES[1:] + _ANGLES[:-1]) / 2, np.arange(361) / 2.0, side="right").astype(np.int8)
+
+
+def aspect_tensor(longitudes):
+    """Aspects between every pair of members and planets.
+
+    `longitudes` is (members, planets) in degrees. Returns (aspect, strength),
+    both (members, members, planets, planets): aspect is the index into ASPECTS
+    or -1, strength is 0-1 (0 where there is no aspect)."""
+    lon = np.asarray(longitudes, dtype=np.float32)
+    # float32 and no modulo: the tensor is members^2 * planets^2 cells.
+    separation = np.abs(lon[:, None, :, None] - lon[None, :, None, :])
+    np.minimum(separation, 360.0 - separation, out=separation)
+    nearest = _NEAREST[(separation * 2.0).astype(np.intp)]
+    strength = 1.0 - np.abs(separation - _ANGLES[nearest]) / _ORBS[nearest]
+    np.maximum(strength, 0.0, out=strength)
+    aspect = np.where(strength > 0.0, nearest, np.int8(-1))
+    return aspect, strength
+
+
+def pair_scores(aspect, strength, planets):
+    """(harmony, tension) member x member matrices from aspect_tensor() output."""
+    weights = np.array([PLANET_WEIGHTS.get(p, 1.0) for p in planets], dtype=np.float32)
+    weighted = strength * (weights[:, None] * weights[None, :])
+    # Index -1 (no aspect) has zero strength, so its polarity never counts.
+    hard = np.array([sign < 0 for _, _, _, sign in ASPECTS])[aspect]
+    tension = np.where(hard, weighted, 0.0).sum(axis=(2, 3))
+    harmony = weighted.sum(axis=(2, 3)) - tension
+    return harmony, tension
+
+
+def pair_aspects(aspect, strength, planets, max_per_pair=None):
+    """{(i, j): [aspect dicts, tightest first]} for every pair i < j.
+
+    Only the upper triangle is listed: (j, i) holds the same aspects with the
+    two planets swapped."""
+    members, _, planet_count, _ = aspect.shape
+    i, j = np.triu_indices(members, k=1)
+    cells = planet_count * planet_count
+    pair_strength = strength.reshape(members, members, cells)[i, j]
+    # Tightest first inside each pair; cells without an aspect sort last.
+    order = np.argsort(-pair_strength, axis=1, kind="stable")
+    if max_per_pair is not None:
+        order = order[:, :max_per_pair]
+    values = np.take_along_axis(pair_strength, order, axis=1)
+    names = np.take_along_axis(aspect.reshape(members, members, cells)[i, j], order, axis=1)
+    present = names >= 0
+    # Degrees from exact, back from the strength.
+    orbs = np.round(_ORBS[names] * (1.0 - values.astype(np.float64)), 2)
+    values = np.round(values.astype(np.float64), 3)
+
+    labels = [(planets[c // planet_count], planets[c % planet_count]) for c in range(cells)]
+    result = {}
+    for a, b, row_cells, row_names, row_values, row_orbs, row_present in zip(
+            i.tolist(), j.tolist(), order.tolist(), names.tolist(), values.tolist(), orbs.tolist(),
+            present.tolist()):
+        result[(a, b)] = [
+            {"planet_a": labels[c][0], "planet_b": labels[c][1], "aspect": ASPECT_NAMES[n],
+             "orb": orb, "strength": value}
+            for c, n, value, orb, keep in zip(row_cells, row_names, row_values, row_orbs, row_present)
+            if keep
+        ]
+    return result
+
+
+def compatibility(longitudes, planets, max_per_pair=None):
+    """Scores and aspect lists for every pair of members, best-matched pairs first."""
+    aspect, strength = aspect_tensor(longitudes)
+    harmony, tension = pair_scores(aspect, strength, planets)
+    aspects = pair_aspects(aspect, strength, planets, max_per_pair)
+    harmony = np.round(harmony.astype(np.float64), 2).tolist()
+    tension = np.round(tension.astype(np.float64), 2).tolist()
+    pairs = [
+        {"members": [a, b], "score": round(harmony[a][b] - tension[a][b], 2),
+         "harmony": harmony[a][b], "tension": tension[a][b], "aspects": pair}
+        for (a, b), pair in aspects.items()
+    ]
+    pairs.sort(key=lambda pair: pair["score"], reverse=True)
+    return {"harmony": harmony, "tension": tension, "pairs": pairs}
@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Keep the services' on-disk stores and tables out of the checkout: caches and
+# job stores start empty, and the precomputed tables are absent unless a test
+# builds one.
+_scratch = tempfile.mkdtemp(prefix="soul_weaver_tests_")
+os.environ["PLACE_CACHE_PATH"] = os.path.join(_scratch, "place_cache.sqlite3")
+os.environ["JOB_STORE_PATH"] = os.path.join(_scratch, "jobs.sqlite3")
+os.environ["SOLAR_ARC_PATH"] = os.path.join(_scratch, "solar_arc.npy")
+os.environ["EPHEMERIS_TABLE_PATH"] = os.path.join(_scratch, "ephemeris.npy")
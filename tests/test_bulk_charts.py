@@ -0,0 +1,26 @@
+import pytest
+
+from bulk_charts import Checkpoint, file_digest
+
+
+def _checkpoint(out_dir, input_path):
+    return Checkpoint(str(out_dir), {"input": str(input_path), "sha256": file_digest(input_path), "rows": 1})
+
+
+def test_input_edited_in_place_does_not_resume(tmp_path):
+    sheet = tmp_path / "subscribers.csv"
+    sheet.write_text("Birth Date,Birth Time,Birth Place\n1985-06-15,08:30,Bangkok\n")
+    first = _checkpoint(tmp_path, sheet)
+    first.mark_done(0)
+
+    again = _checkpoint(tmp_path, sheet)
+    again.load()
+    assert again.done == {0}
+
+    # Same number of rows, different content.
+    sheet.write_text("Birth Date,Birth Time,Birth Place\n1990-01-02,11:00,Chiang Mai\n")
+    with pytest.raises(SystemExit):
+        _checkpoint(tmp_path, sheet).load()
+    restarted = _checkpoint(tmp_path, sheet)
+    restarted.load(restart=True)
+    assert restarted.done == set()
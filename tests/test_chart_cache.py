@@ -0,0 +1,24 @@
+from datetime import datetime, timezone
+
+from chart_cache import cached_chart
+
+BIRTH = datetime(1985, 6, 15, 1, 30, tzinfo=timezone.utc)
+
+
+@cached_chart("test")
+def compute_test(birth_datetime, timezone_offset, latitude, longitude, ayanamsa="LAHIRI", mode="full"):
+    return {"ayanamsa": ayanamsa, "mode": mode}
+
+
+def test_defaults_left_out_and_passed_share_a_key():
+    key = compute_test.cache_key(BIRTH, 7.0, 13.75, 100.5)
+    assert compute_test.cache_key(BIRTH, 7.0, 13.75, 100.5, ayanamsa="LAHIRI") == key
+    assert compute_test.cache_key(BIRTH, 7.0, 13.75, 100.5, "LAHIRI", mode="full") == key
+    assert compute_test.cache_key(BIRTH, 7.0, latitude=13.75, longitude=100.5) == key
+
+
+def test_other_options_get_their_own_key():
+    key = compute_test.cache_key(BIRTH, 7.0, 13.75, 100.5)
+    assert compute_test.cache_key(BIRTH, 7.0, 13.75, 100.5, mode="core") != key
+    assert compute_test.cache_key(BIRTH, 7.0, 13.75, 100.5, ayanamsa="KP") != key
+    assert compute_test.cache_key(BIRTH, 7.0, 13.76, 100.5) != key
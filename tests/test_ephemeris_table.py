@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+import ephemeris_table
+from ephemeris_table import PLANETS, EphemerisTable, build_table, swe
+
+
+@pytest.fixture
+def small_table(tmp_path, monkeypatch):
+    monkeypatch.setattr(ephemeris_table, "TABLE_START", (1999, 12, 1))
+    monkeypatch.setattr(ephemeris_table, "TABLE_END", (2000, 3, 1))
+    path = str(tmp_path / "ephemeris.npy")
+    build_table(path)
+    return path
+
+
+def test_node_column_is_the_mean_node(small_table):
+    table = EphemerisTable(small_table)
+    assert table.bodies[-1] == "MEAN_NODE"
+    for jd in np.linspace(table.start + 1.0, table.end - 1.0, 40).tolist():
+        longitudes, _ = table.positions(jd)
+        expected = swe.calc_ut(jd, swe.MEAN_NODE)[0][0]
+        assert abs((longitudes[-1] - expected + 180.0) % 360.0 - 180.0) * 3600.0 < 0.01
+
+
+def test_true_node_tables_are_read_as_planets_only(small_table, tmp_path):
+    # Tables from before the node fix: a true node column and no marker in row 0.
+    old = np.load(small_table)
+    old[0, len(PLANETS)] = 0.0
+    path = str(tmp_path / "old.npy")
+    np.save(path, old)
+    table = EphemerisTable(path)
+    assert table.bodies == PLANETS
+
+    np.save(path, old[:, :len(PLANETS)])
+    assert EphemerisTable(path).bodies == PLANETS
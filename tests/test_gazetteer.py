@@ -0,0 +1,86 @@
+import pytest
+
+import geocoding
+import gazetteer
+
+COUNTRIES = ("TH\tTHA\t764\tTH\tThailand\nUS\tUSA\t840\tUS\tUnited States\n"
+             "GE\tGEO\t268\tGG\tGeorgia\n")
+ADMIN1 = ("US.IL\tIllinois\tIllinois\t4896861\nUS.MO\tMissouri\tMissouri\t4398678\n"
+          "US.GA\tGeorgia\tGeorgia\t4197000\nTH.40\tBangkok\tBangkok\t1609348\n")
+# GeoNames columns: id, name, ascii name, alternate names, lat, lon, class, code,
+# country, cc2, admin1..admin4, population
+PLACES = [
+    ("1", "Bangkok", "Bangkok", "Krung Thep", "13.75", "100.51667", "TH", "40", "5104476"),
+    ("2", "Bang Kapi", "Bang Kapi", "", "13.76", "100.64", "TH", "40", "150000"),
+    ("3", "Chiang Mai", "Chiang Mai", "", "18.79", "98.98", "TH", "", "127240"),
+    ("4", "Springfield", "Springfield", "", "39.80", "-89.64", "US", "IL", "116250"),
+    ("5", "Springfield", "Springfield", "", "37.21", "-93.29", "US", "MO", "169176"),
+    ("6", "Peoria", "Peoria", "", "40.69", "-89.59", "US", "IL", "113150"),
+    ("7", "Atlanta", "Atlanta", "", "33.75", "-84.39", "US", "GA", "498715"),
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    dump = tmp_path / "cities.txt"
+    dump.write_text("".join(
+        "\t".join([pid, name, ascii_name, alternates, lat, lon, "P", "PPL", iso, "", admin1, "", "", "", population])
+        + "\n" for pid, name, ascii_name, alternates, lat, lon, iso, admin1, population in PLACES), encoding="utf-8")
+    countries = tmp_path / "countryInfo.txt"
+    countries.write_text(COUNTRIES, encoding="utf-8")
+    admin1 = tmp_path / "admin1CodesASCII.txt"
+    admin1.write_text(ADMIN1, encoding="utf-8")
+    path = str(tmp_path / "gazetteer.idx")
+    gazetteer.build_index(str(dump), path, str(countries), admin1_path=str(admin1))
+    return gazetteer.Gazetteer(path)
+
+
+def test_exact_names(index):
+    assert index.lookup("Bangkok, Thailand").latitude == pytest.approx(13.75)
+    assert index.lookup(" krung thep ").latitude == pytest.approx(13.75)
+    assert index.lookup("Peoria, Illinois").latitude == pytest.approx(40.69)
+    assert index.lookup("Bangkok").address == "Bangkok, Thailand"
+    assert index.lookup("Peoria").address == "Peoria, Illinois, United States"
+
+
+@pytest.mark.parametrize("raw, latitude", [
+    ("Springfield, Illinois, USA", 39.80),
+    ("Springfield, IL", 39.80),
+    ("springfield, missouri, united states", 37.21),
+    ("Springfield", 37.21),              # no qualifier: the most populous one
+    ("Springfield, USA", 37.21),
+    ("Atlanta, Georgia", 33.75),         # the state, not the country
+    ("Atlanta, Georgia, USA", 33.75),
+])
+def test_region_qualifiers_are_checked(index, raw, latitude):
+    assert index.lookup(raw).latitude == pytest.approx(latitude)
+
+
+@pytest.mark.parametrize("raw", [
+    "Bangkoc, Thailand",       # misspelled
+    "Bangk",                   # prefix of Bangkok
+    "Chiang Rai, Thailand",    # not in the index
+    "Springfield, Ohio",       # a state the index does not know
+    "Springfield, Illinois, Thailand",
+    "Springfield, Missouri, Illinois",
+    "Peoria, Missouri",
+    "Atlanta, Georgia, Georgia, Thailand",
+    "Springfeld, Illinois",
+])
+def test_misses_are_left_to_the_online_geocoder(index, raw):
+    assert index.lookup(raw) is None
+
+
+def test_fuzzy_matching_is_opt_in(index):
+    assert index.lookup("Bangk", fuzzy=True).address == "Bangkok, Thailand"
+    assert index.lookup("Chiang Mia", fuzzy=True).address == "Chiang Mai, Thailand"
+    assert index.lookup("Springfeld, Illinois", fuzzy=True).latitude == pytest.approx(39.80)
+    assert index.lookup("Springfeld, Ohio", fuzzy=True) is None
+
+
+def test_offline_place_misses_fall_through(index, monkeypatch):
+    monkeypatch.setattr(gazetteer, "get_gazetteer", lambda: index)
+    geocoding.place_cache._memory.clear()
+    assert geocoding.offline_place("bangkoc", "Bangkoc") is None
+    assert geocoding.place_cache.get("bangkoc") is geocoding.MISSING
+    assert geocoding.offline_place("bangkok", "Bangkok").address == "Bangkok, Thailand"
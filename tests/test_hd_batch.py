@@ -0,0 +1,61 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+import pytz
+
+import ephemeris_table
+import hd_batch
+import solar_arc
+
+
+@pytest.fixture
+def small_table(tmp_path, monkeypatch):
+    monkeypatch.setattr(ephemeris_table, "TABLE_START", (1989, 12, 1))
+    monkeypatch.setattr(ephemeris_table, "TABLE_END", (1990, 6, 1))
+    path = str(tmp_path / "ephemeris.npy")
+    ephemeris_table.build_table(path)
+    table = ephemeris_table.EphemerisTable(path)
+    monkeypatch.setattr(hd_batch, "get_ephemeris_table", lambda: table)
+    return table
+
+
+def _births(table=None):
+    if table is None:
+        return np.linspace(2415385.5, 2488069.5, 25)
+    # Mostly inside the table, plus one row past its end (swisseph fallback).
+    return np.append(np.linspace(table.start + 0.5, table.end - 0.5, 24), table.end + 10.0)
+
+
+def _assert_same_longitudes(jds):
+    got = hd_batch.hd_longitudes(jds)
+    want = np.array([solar_arc.body_longitudes(jd) for jd in jds.tolist()])
+    diff = np.abs((got - want + 180.0) % 360.0 - 180.0) * 3600.0
+    # The table interpolates the Moon to a fraction of an arc-second.
+    assert diff.max() < 1.0, solar_arc.HD_BODIES[int(diff.max(axis=0).argmax())]
+
+
+def test_batch_longitudes_match_single_chart_without_table(monkeypatch):
+    monkeypatch.setattr(hd_batch, "get_ephemeris_table", lambda: None)
+    _assert_same_longitudes(_births())
+
+
+def test_batch_longitudes_match_single_chart_with_table(small_table):
+    assert solar_arc.HD_NODE in small_table.bodies
+    _assert_same_longitudes(_births(small_table))
+
+
+def test_batch_matches_compute_human_design(monkeypatch, tmp_path):
+    pytest.importorskip("humandesign")
+    import human_design_api
+
+    path = str(tmp_path / "solar_arc.npy")
+    solar_arc.build_table(path)
+    monkeypatch.setattr(human_design_api, "get_solar_arc_table", lambda: solar_arc.SolarArcTable(path))
+
+    births = [pytz.utc.localize(datetime(1990, 5, 1, 3, 30)), pytz.utc.localize(datetime(1967, 11, 23, 18, 5))]
+    records = hd_batch.to_records(hd_batch.human_design_batch([solar_arc.datetime_to_jd(b) for b in births]))
+    for birth, record in zip(births, records):
+        single = human_design_api.compute_human_design.uncached(birth, 13.75, 100.5)
+        for field in ("Type", "Authority", "Profile", "Definition", "Defined Centers"):
+            assert hd_batch._normalize(record[field]) == hd_batch._normalize(single[field]), field
@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+import solar_arc
+
+sweph = pytest.importorskip("immanuel.tools.sweph")
+immanuel_chart = pytest.importorskip("immanuel.const.chart")
+
+
+def _births(count, seed=0):
+    rng = random.Random(seed)
+    start, end = solar_arc.swe.julday(1901, 1, 1, 0.0), solar_arc.swe.julday(2099, 12, 31, 0.0)
+    return [rng.uniform(start, end) for _ in range(count)]
+
+
+def _immanuel_longitudes(jd):
+    # What compute_human_design read from immanuel before the solar arc table.
+    longitudes = []
+    for name in solar_arc.HD_BODIES:
+        if name == "EARTH":
+            longitudes.append((longitudes[0] + 180.0) % 360.0)
+        elif name in ("NORTH_NODE", "SOUTH_NODE"):
+            longitudes.append(sweph.point(getattr(immanuel_chart, name), jd)["lon"])
+        else:
+            longitudes.append(sweph.planet(getattr(immanuel_chart, name), jd)["lon"])
+    return longitudes
+
+
+def _arcsec(a, b):
+    return abs((a - b + 180.0) % 360.0 - 180.0) * 3600.0
+
+
+def test_body_longitudes_match_immanuel():
+    for jd in _births(500):
+        for name, got, want in zip(solar_arc.HD_BODIES, solar_arc.body_longitudes(jd), _immanuel_longitudes(jd)):
+            assert _arcsec(got, want) < 0.01, (name, jd)
+
+
+def test_north_node_is_the_mean_node():
+    jd = solar_arc.swe.julday(1985, 6, 15, 12.0)
+    longitudes = dict(zip(solar_arc.HD_BODIES, solar_arc.body_longitudes(jd)))
+    assert longitudes["NORTH_NODE"] == pytest.approx(solar_arc.swe.calc_ut(jd, solar_arc.swe.MEAN_NODE)[0][0])
+    assert _arcsec(longitudes["SOUTH_NODE"], longitudes["NORTH_NODE"] + 180.0) < 1e-6
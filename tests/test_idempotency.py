@@ -0,0 +1,103 @@
+import pytest
+from flask import Flask, request
+
+import idempotency
+import instrumentation
+import responses
+from idempotency import birth_data_inputs, idempotent
+from responses import respond
+
+BIRTH = {"Birth Date": "1990-05-01", "Birth Time": "10:30", "Birth Place": "Bangkok, Thailand"}
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    instrumentation.init_app(app)
+    responses.init_app(app)
+    calls = []
+
+    @app.route("/chart", methods=["POST"])
+    @idempotent(birth_data_inputs)
+    def chart():
+        data = request.get_json()
+        calls.append(data)
+        response = respond({"Birth Info": data, "Sun": "Taurus"})
+        if data.get("No Store"):
+            response.headers["Cache-Control"] = "no-store"
+        return response
+
+    idempotency.response_store.clear()
+    test_client = app.test_client()
+    test_client.calls = calls
+    return test_client
+
+
+def test_repeat_is_served_from_the_store(client):
+    first = client.post("/chart", json=BIRTH)
+    second = client.post("/chart", json=BIRTH)
+    assert len(client.calls) == 1
+    assert second.data == first.data
+    assert second.headers["ETag"] == first.headers["ETag"]
+
+
+def test_etag_is_the_hash_of_the_body(client):
+    first = client.post("/chart", json=BIRTH)
+    assert first.headers["ETag"] == idempotency.etag_for(first.data)
+    # Same normalized inputs, other spelling: whatever bytes it gets, the ETag describes them.
+    other = client.post("/chart", json={**BIRTH, "Birth Place": " bangkok ,THAILAND"})
+    assert other.headers["ETag"] == idempotency.etag_for(other.data)
+
+
+def test_if_none_match_gets_304_without_work(client):
+    etag = client.post("/chart", json=BIRTH).headers["ETag"]
+    response = client.post("/chart", json=BIRTH, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == etag
+    assert len(client.calls) == 1
+    assert client.post("/chart", json=BIRTH, headers={"If-None-Match": "W/" + etag}).status_code == 304
+
+
+def test_stale_etag_gets_the_body(client):
+    client.post("/chart", json=BIRTH)
+    response = client.post("/chart", json=BIRTH, headers={"If-None-Match": '"0123"'})
+    assert response.status_code == 200
+    assert response.get_json()["Sun"] == "Taurus"
+
+
+def test_computed_response_matching_if_none_match_is_304(client):
+    etag = client.post("/chart", json=BIRTH).headers["ETag"]
+    idempotency.response_store.clear()
+    response = client.post("/chart", json=BIRTH, headers={"If-None-Match": etag})
+    # Recomputed, but identical bytes: nothing to send.
+    assert len(client.calls) == 2
+    assert response.status_code == 304
+
+
+def test_representations_are_stored_separately(client):
+    plain = client.post("/chart", json=BIRTH)
+    compact = client.post("/chart?schema=compact", json=BIRTH)
+    assert len(client.calls) == 2
+    assert plain.headers["ETag"] != compact.headers["ETag"]
+
+
+def test_per_request_headers_are_not_replayed(client):
+    assert "Server-Timing" in client.post("/chart", json=BIRTH).headers
+    [(_, (_, headers, _))] = idempotency.response_store._entries.values()
+    assert "Server-Timing" not in headers
+    assert "Content-Length" not in headers
+
+
+def test_no_store_responses_are_recomputed(client):
+    body = {**BIRTH, "No Store": True}
+    client.post("/chart", json=body)
+    response = client.post("/chart", json=body)
+    assert len(client.calls) == 2
+    assert "ETag" in response.headers
+
+
+def test_requests_without_birth_data_bypass_the_store(client):
+    client.post("/chart", json={"Birth Place": "Bangkok"})
+    client.post("/chart", json={"Birth Place": "Bangkok"})
+    assert len(client.calls) == 2
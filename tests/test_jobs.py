@@ -0,0 +1,134 @@
+import sqlite3
+import time
+
+import pytest
+
+import jobs
+from jobs import DONE, FAILED, QUEUED, RUNNING, JobError, JobQueue, RetryLater
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "retry_delay", lambda attempts: 0.0)
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=1, max_attempts=3, lease_seconds=60)
+    yield queue
+    if queue._threads:
+        queue.stop()
+
+
+def _expire_leases(queue):
+    with queue._lock:
+        queue._connection().execute("UPDATE jobs SET lease_expires = ? WHERE state = 'running'", (time.time() - 1,))
+
+
+def test_done(queue):
+    queue.register("echo", lambda payload: {"echo": payload})
+    job_id, _ = queue.submit("echo", {"a": 1})
+    assert queue.run_one()
+    job = queue.get(job_id)
+    assert (job["state"], job["result"], job["attempts"]) == (DONE, {"echo": {"a": 1}}, 1)
+
+
+def test_retry_later_until_max_attempts(queue):
+    def flaky(payload):
+        raise RetryLater("geocoder down")
+
+    queue.register("flaky", flaky)
+    job_id, _ = queue.submit("flaky", {})
+    for attempt in range(1, 3):
+        assert queue.run_one()
+        job = queue.get(job_id)
+        assert (job["state"], job["attempts"], job["error"]) == (QUEUED, attempt, "geocoder down")
+    assert queue.run_one()
+    job = queue.get(job_id)
+    assert (job["state"], job["attempts"]) == (FAILED, 3)
+    assert job["result"] == {"status": "error", "message": "geocoder down"}
+    assert not queue.run_one()
+
+
+def test_job_error_fails_at_once(queue):
+    def invalid(payload):
+        raise JobError({"status": "error", "message": "Birth place not found."})
+
+    queue.register("invalid", invalid)
+    job_id, _ = queue.submit("invalid", {})
+    queue.run_one()
+    job = queue.get(job_id)
+    assert (job["state"], job["attempts"]) == (FAILED, 1)
+    assert job["result"]["message"] == "Birth place not found."
+
+
+def test_expired_lease_is_requeued_and_counts_as_an_attempt(queue):
+    queue.register("crash", lambda payload: None)
+    job_id, _ = queue.submit("crash", {})
+    for attempt in range(1, 4):
+        # The worker that claimed the job dies without finishing it.
+        assert queue.claim()[3] == attempt
+        _expire_leases(queue)
+    assert queue.claim() is None
+    job = queue.get(job_id)
+    assert (job["state"], job["attempts"]) == (FAILED, 3)
+    assert "worker died" in job["result"]["message"]
+
+
+def test_worker_with_an_expired_lease_cannot_finish_the_next_attempt(queue):
+    def slow(payload):
+        # This worker hangs past its lease; another one requeues and claims the job.
+        _expire_leases(queue)
+        assert queue.claim()[3] == 2
+        return {"from": "attempt 1"}
+
+    queue.register("slow", slow)
+    job_id, _ = queue.submit("slow", {})
+    assert queue.run_one()
+    job = queue.get(job_id)
+    assert (job["state"], job["attempts"], job["result"]) == (RUNNING, 2, None)
+
+    assert queue._finish(job_id, 2, DONE, {"from": "attempt 2"})
+    job = queue.get(job_id)
+    assert (job["state"], job["result"]) == (DONE, {"from": "attempt 2"})
+
+
+def test_dedup_returns_the_pending_job(queue):
+    first, reused = queue.submit("echo", {"a": 1}, dedup={"key": 1})
+    second, reused_again = queue.submit("echo", {"a": 2}, dedup={"key": 1})
+    assert (second, reused, reused_again) == (first, False, True)
+
+
+def test_purge_keeps_recent_and_unfinished_jobs(queue):
+    queue.register("echo", lambda payload: payload)
+    old, _ = queue.submit("echo", {"n": 1})
+    queue.run_one()
+    pending, _ = queue.submit("echo", {"n": 2})
+    with queue._lock:
+        queue._connection().execute("UPDATE jobs SET finished_at = 0 WHERE id = ?", (old,))
+    assert queue.purge() == 1
+    assert queue.get(old) is None
+    assert queue.get(pending)["state"] == QUEUED
+
+
+def test_store_errors_do_not_stop_the_worker(queue, monkeypatch):
+    failures = {"purge": 0, "run_one": 0}
+    run_one, purge = queue.run_one, queue.purge
+
+    def locked_purge(*args, **kwargs):
+        failures["purge"] += 1
+        if failures["purge"] == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return purge(*args, **kwargs)
+
+    def locked_run_one():
+        failures["run_one"] += 1
+        if failures["run_one"] == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return run_one()
+
+    monkeypatch.setattr(queue, "purge", locked_purge)
+    monkeypatch.setattr(queue, "run_one", locked_run_one)
+    monkeypatch.setattr(jobs, "JOB_POLL_INTERVAL", 0.01)
+    queue.register("echo", lambda payload: payload)
+    queue.start()
+    job_id, _ = queue.submit("echo", {"n": 1})
+    assert queue.wait(job_id, 5)["state"] == DONE
+    assert failures["purge"] >= 1 and failures["run_one"] >= 2
+    assert all(thread.is_alive() for thread in queue._threads)
@@ -0,0 +1,49 @@
+import pytest
+
+import numerology_api
+from numerology_api import app, explore_name_variants
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+def _post(client, **body):
+    return client.post("/calculate_numerology/variants", json={"name": "John Smith", "target": 22, **body})
+
+
+def test_variants_reach_the_target(client):
+    response = _post(client, insertions=["h", "e"], substitutions={"i": ["y"]}, max_edits=2, budget_ms=500)
+    assert response.status_code == 200
+    for variant in response.get_json()["variants"]:
+        assert variant["result"]["destiny_number"]["number"] == 22
+
+
+@pytest.mark.parametrize("body", [
+    {"substitutions": [["i", "y"]]},
+    {"substitutions": {"i": "y"}},
+    {"nicknames": ["Johnny"]},
+    {"nicknames": {"john": [1]}},
+    {"insertions": "he"},
+    {"middle_names": {"a": "b"}},
+    {"target": True},
+    {"target": "22"},
+])
+def test_malformed_options_are_400(client, body):
+    response = _post(client, **body)
+    assert response.status_code == 400
+    assert response.get_json()["status"] == "error"
+
+
+def test_non_object_body_is_400(client):
+    assert client.post("/calculate_numerology/variants", json=["John Smith"]).status_code == 400
+
+
+def test_frontier_is_capped(monkeypatch):
+    monkeypatch.setattr(numerology_api, "MAX_VARIANT_FRONTIER", 5000)
+    letters = list("abcdefghijklmnopqrstuvwxyz")
+    result = explore_name_variants("Bartholomew Montgomery", 99, insertions=letters,
+                                   max_edits=4, budget_ms=60000)
+    # Target 99 never matches, so only the frontier cap can end this search early.
+    assert result["complete"] is False
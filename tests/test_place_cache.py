@@ -0,0 +1,41 @@
+import os
+
+from geocoding import MISSING, PlaceCache, ResolvedPlace
+
+BANGKOK = ResolvedPlace(13.75, 100.5, "Bangkok, Thailand")
+
+
+def test_store_is_opened_on_first_use(tmp_path):
+    path = str(tmp_path / "places.sqlite3")
+    cache = PlaceCache(path)
+    assert not os.path.exists(path)
+    assert cache.get("bangkok") is MISSING
+    assert os.path.exists(path)
+
+
+def test_forked_process_opens_its_own_connection(tmp_path):
+    cache = PlaceCache(str(tmp_path / "places.sqlite3"))
+    cache.put("bangkok", BANGKOK)
+    parent = cache._db
+    cache._pid = -1  # as seen from a worker forked after the first use
+    cache._memory.clear()
+    assert cache.get("bangkok") == BANGKOK
+    assert cache._db is not parent
+
+
+def test_memory_only_cache():
+    cache = PlaceCache(None)
+    cache.put("bangkok", BANGKOK)
+    assert cache.get("bangkok") == BANGKOK
+    assert cache.get("chiang mai") is MISSING
+
+
+def test_peek_reads_memory_only_and_never_waits(tmp_path):
+    cache = PlaceCache(str(tmp_path / "places.sqlite3"))
+    cache.put("bangkok", BANGKOK)
+    assert cache.peek("bangkok") == BANGKOK
+    cache._memory.clear()
+    assert cache.peek("bangkok") is MISSING  # only in SQLite: left for get() on a thread
+    assert cache.get("bangkok") == BANGKOK
+    with cache._lock:
+        assert cache.peek("bangkok") is MISSING
@@ -0,0 +1,48 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+import pytz
+
+import hd_batch
+import solar_arc
+
+
+@pytest.fixture
+def table(tmp_path, monkeypatch):
+    monkeypatch.setattr(solar_arc, "TABLE_START", (1990, 1, 1))
+    monkeypatch.setattr(solar_arc, "TABLE_END", (1991, 12, 31))
+    path = str(tmp_path / "solar_arc.npy")
+    solar_arc.build_table(path)
+    return solar_arc.SolarArcTable(path)
+
+
+def _jd(*date):
+    return solar_arc.datetime_to_jd(pytz.utc.localize(datetime(*date)))
+
+
+def test_covers_design(table):
+    births = [_jd(1989, 6, 1), _jd(1990, 2, 10), _jd(1990, 6, 1), _jd(1992, 3, 1)]
+    assert table.covers_design(births).tolist() == [False, False, True, False]
+    design = table.design_jd(_jd(1990, 6, 1))
+    assert table.covers(design)
+    with pytest.raises(ValueError):
+        table.design_jd(_jd(1990, 2, 10))
+
+
+def test_batch_design_dates_outside_the_table_use_swisseph(table, monkeypatch):
+    monkeypatch.setattr(hd_batch, "get_solar_arc_table", lambda: table)
+    births = np.array([_jd(1989, 6, 1), _jd(1990, 2, 10), _jd(1990, 6, 1), _jd(1992, 3, 1)])
+    got = hd_batch.design_jds(births)
+    want = [hd_batch._design_jd_swisseph(jd) for jd in births.tolist()]
+    assert np.abs(got - want).max() * 86400 < 1.0
+
+
+@pytest.mark.parametrize("birth", [datetime(1989, 6, 1), datetime(1990, 2, 10), datetime(1992, 3, 1)])
+def test_single_chart_outside_the_table_falls_back(table, monkeypatch, birth):
+    pytest.importorskip("humandesign")
+    import human_design_api
+
+    monkeypatch.setattr(human_design_api, "get_solar_arc_table", lambda: table)
+    result = human_design_api.compute_human_design.uncached(pytz.utc.localize(birth), 13.75, 100.5)
+    assert result["Type"]
@@ -0,0 +1,49 @@
+from datetime import datetime
+
+import pytest
+import pytz
+
+from timezones import BirthTimeError, localize, resolve_birth_moment
+
+NEW_YORK = (40.7128, -74.0060)
+
+
+def test_ordinary_time():
+    moment = resolve_birth_moment("1990-05-01", "10:30", 13.7563, 100.5018)
+    assert moment.timezone_name == "Asia/Bangkok"
+    assert moment.offset_hours == 7.0
+    assert moment.utc == pytz.utc.localize(datetime(1990, 5, 1, 3, 30))
+
+
+def test_gap_is_rejected():
+    # 2021-03-14 02:00 -> 03:00 in New York.
+    with pytest.raises(BirthTimeError) as error:
+        resolve_birth_moment("2021-03-14", "02:30", *NEW_YORK)
+    assert error.value.code == "nonexistent_time"
+    assert error.value.to_dict()["timezone"] == "America/New_York"
+
+
+def test_overlap_is_rejected_with_both_offsets():
+    # 2021-11-07 02:00 -> 01:00 in New York: 01:30 happened twice.
+    with pytest.raises(BirthTimeError) as error:
+        resolve_birth_moment("2021-11-07", "01:30", *NEW_YORK)
+    assert error.value.code == "ambiguous_time"
+    assert sorted(error.value.details["candidate_offsets"]) == [-5.0, -4.0]
+
+
+@pytest.mark.parametrize("naive, offset", [
+    (datetime(2021, 3, 14, 1, 59), -5),
+    (datetime(2021, 3, 14, 3, 0), -4),
+    (datetime(2021, 11, 7, 0, 59), -4),
+    (datetime(2021, 11, 7, 2, 0), -5),
+])
+def test_edges_of_transitions_match_pytz(naive, offset):
+    local, seconds = localize(naive, "America/New_York")
+    assert seconds == offset * 3600
+    assert local.utcoffset() == pytz.timezone("America/New_York").localize(naive, is_dst=None).utcoffset()
+
+
+def test_invalid_datetime():
+    with pytest.raises(BirthTimeError) as error:
+        resolve_birth_moment("1990-02-30", "10:30", *NEW_YORK)
+    assert error.value.code == "invalid_datetime"
@@ -0,0 +1,56 @@
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import vedic_engine
+from serving import ComputeTimeout
+
+
+def _no_setup(ayanamsa):
+    pass
+
+
+def _pid():
+    return os.getpid()
+
+
+def _crash():
+    os._exit(1)
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    # PyJHora is not needed to exercise the pools.
+    monkeypatch.setattr(vedic_engine, "_init_worker", _no_setup)
+    engine = vedic_engine.VedicEngine(mode="process", workers_per_ayanamsa=1, timeout=2)
+    yield engine
+    engine.shutdown()
+
+
+def test_dead_worker_fails_one_chart_and_the_pool_is_rebuilt(engine):
+    before = engine.run("LAHIRI", _pid)
+    with pytest.raises(BrokenProcessPool):
+        engine.run("LAHIRI", _crash)
+    assert engine.run("LAHIRI", _pid) != before
+
+
+def test_other_ayanamsas_keep_their_pool(engine):
+    raman = engine.run("RAMAN", _pid)
+    with pytest.raises(BrokenProcessPool):
+        engine.run("LAHIRI", _crash)
+    assert engine.run("RAMAN", _pid) == raman
+
+
+def test_slow_chart_times_out(engine):
+    engine.timeout = 0.2
+    with pytest.raises(ComputeTimeout):
+        engine.run("KP", _sleep, 1.0)
+    engine.timeout = 5
+    assert engine.run("KP", _sleep, 0.0) == 0.0
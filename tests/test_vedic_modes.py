@@ -0,0 +1,36 @@
+from datetime import datetime
+
+import pytest
+
+import chart_records
+import vedic_calculator_api
+import vedic_core
+import vedic_engine
+
+# Bangkok, 1985-06-15 08:30 (UTC+7): every core value is clear of its boundary margin.
+BIRTH = (datetime(1985, 6, 15, 8, 30), 7.0, 13.7563, 100.5018)
+
+
+def _vedic(mode):
+    return vedic_calculator_api.compute_vedic.uncached(*BIRTH, ayanamsa="LAHIRI", mode=mode)
+
+
+def test_core_mode_answers_rahu_and_ketu_and_fits_a_record():
+    result = _vedic("core")
+    data = result["VedicData"]
+    assert data["Calculation Mode"] == "core"
+    rahu, ketu = chart_records.SIGN_INDEX[data["Rahu Sign"]], chart_records.SIGN_INDEX[data["Ketu Sign"]]
+    assert (rahu + 6) % 12 == ketu
+
+    record = chart_records.VedicRecord.compact(result)
+    assert isinstance(record, chart_records.VedicRecord)
+    assert chart_records.unpack(record.pack()).to_dict() == result
+
+
+def test_core_and_full_modes_return_the_same_names(monkeypatch):
+    pytest.importorskip("PyJHora")
+    monkeypatch.setattr(vedic_core, "engine", vedic_engine.VedicEngine(mode="inline"))
+    core, full = _vedic("core"), _vedic("full")
+    assert full["VedicData"].pop("Calculation Mode") == "full"
+    assert core["VedicData"].pop("Calculation Mode") == "core"
+    assert core == full
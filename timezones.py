@@ -0,0 +1,137 @@
+import calendar
+import threading
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import pytz
+import engines
+from instrumentation import stage
+
+# Shared timezone resolution for the chart services.
+# One TimezoneFinder per process (polygon data loaded into memory once) and a
+# cached UTC-offset transition table per zone, so turning a local birth time into
+# UTC is a couple of bisects instead of pytz's localize(..., is_dst=None).
+
+BirthMoment = namedtuple("BirthMoment", ["timezone_name", "local", "utc", "offset_hours"])
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M"
+# No zone has ever been further than this from UTC.
+_MAX_OFFSET = 16 * 3600
+
+
+class BirthTimeError(ValueError):
+    """A birth date/time that cannot be turned into a single UTC instant."""
+
+    def __init__(self, code, message, **details):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.details = details
+
+    def to_dict(self):
+        return {"status": "error", "code": self.code, "message": self.message, **self.details}
+
+
+timezonefinder = engines.lazy("timezonefinder")
+_finder = None
+_finder_lock = threading.Lock()
+
+
+def get_timezone_finder():
+    global _finder
+    if _finder is None:
+        with _finder_lock:
+            if _finder is None:
+                _finder = timezonefinder.TimezoneFinder(in_memory=True)
+    return _finder
+
+
+class _ZoneTable:
+    def __init__(self, zone):
+        self.zone = zone
+        utc_times = getattr(zone, "_utc_transition_times", None)
+        if utc_times:
+            # pytz uses datetime(1, 1, 1) as the first "transition".
+            self.starts = [calendar.timegm(t.timetuple()) if t.year > 1 else float("-inf") for t in utc_times]
+            self.infos = list(zone._transition_info)
+            self.offsets = [int(info[0].total_seconds()) for info in self.infos]
+        else:
+            self.starts = None
+
+    def resolve(self, naive):
+        # Returns every (tzinfo, offset seconds) under which `naive` is a valid wall-clock time.
+        if self.starts is None:
+            local = self.zone.localize(naive)
+            return [(local.tzinfo, int(local.utcoffset().total_seconds()))]
+        wall = calendar.timegm(naive.timetuple())
+        first = max(bisect_right(self.starts, wall - _MAX_OFFSET) - 1, 0)
+        last = bisect_right(self.starts, wall + _MAX_OFFSET)
+        matches = []
+        for i in range(first, last):
+            utc = wall - self.offsets[i]
+            end = self.starts[i + 1] if i + 1 < len(self.starts) else float("inf")
+            if self.starts[i] <= utc < end:
+                matches.append((self.zone._tzinfos[self.infos[i]], self.offsets[i]))
+        return matches
+
+
+@lru_cache(maxsize=None)
+def zone_table(timezone_name):
+    return _ZoneTable(pytz.timezone(timezone_name))
+
+
+def timezone_at(latitude, longitude):
+    return get_timezone_finder().timezone_at(lng=longitude, lat=latitude)
+
+
+def localize(naive, timezone_name):
+    """Attach `timezone_name` to a naive local datetime, rejecting DST gaps and overlaps."""
+    matches = zone_table(timezone_name).resolve(naive)
+    if not matches:
+        raise BirthTimeError(
+            "nonexistent_time",
+            f"{naive:%Y-%m-%d %H:%M} does not exist in {timezone_name} (clocks moved forward).",
+            timezone=timezone_name,
+        )
+    if len(matches) > 1:
+        raise BirthTimeError(
+            "ambiguous_time",
+            f"{naive:%Y-%m-%d %H:%M} occurred twice in {timezone_name} (clocks moved back).",
+            timezone=timezone_name,
+            candidate_offsets=[offset / 3600.0 for _, offset in matches],
+        )
+    tzinfo, offset = matches[0]
+    return naive.replace(tzinfo=tzinfo), offset
+
+
+def resolve_birth_moment(birth_date_str, birth_time_str, latitude, longitude, place_label=None):
+    """Return a BirthMoment for a local birth date/time at the given coordinates.
+
+    Raises BirthTimeError for a malformed date/time, an unknown timezone, or a
+    wall-clock time that is ambiguous or skipped by a DST transition.
+    """
+    with stage("timezone"):
+        return _resolve_birth_moment(birth_date_str, birth_time_str, latitude, longitude, place_label)
+
+
+def _resolve_birth_moment(birth_date_str, birth_time_str, latitude, longitude, place_label):
+    try:
+        naive = datetime.strptime(f"{birth_date_str} {birth_time_str}", DATETIME_FORMAT)
+    except (TypeError, ValueError):
+        raise BirthTimeError(
+            "invalid_datetime",
+            "Invalid Birth Date or Birth Time format. Use YYYY-MM-DD and HH:MM.",
+        )
+
+    timezone_name = timezone_at(latitude, longitude)
+    if not timezone_name:
+        raise BirthTimeError(
+            "timezone_not_found",
+            f"Could not determine timezone for {place_label or (latitude, longitude)}.",
+        )
+
+    local, offset = localize(naive, timezone_name)
+    utc = (naive - timedelta(seconds=offset)).replace(tzinfo=pytz.utc)
+    return BirthMoment(timezone_name, local, utc, offset / 3600.0)
@@ -1,13 +1,28 @@
+import calendar
 import json
-from flask import Flask, request, jsonify
-from datetime import datetime
-from PyJHora import * # Import all functions from PyJHora
+from datetime import datetime, timedelta
 
-from geopy.geocoders import Nominatim
-from timezonefinder import TimezoneFinder
 import pytz
+from flask import Flask, request
+from werkzeug.exceptions import HTTPException
+import instrumentation
+import responses
+from responses import respond
+from idempotency import birth_data_inputs, idempotent
+
+from serving import engine_pool, resolve_place, run_chart, serve
+from timezones import BirthTimeError, resolve_birth_moment, timezone_at
+from chart_cache import add_stats_route, cached_chart
+import chart_records
+from vedic_engine import AYANAMSA_LABELS, DEFAULT_AYANAMSA, engine, normalize_ayanamsa
+import panchanga
+import vedic_core
+from solar_arc import datetime_to_jd, jd_to_datetime
 
 app = Flask(__name__)
+instrumentation.init_app(app)
+responses.init_app(app)
+add_stats_route(app)
 
 # Tithi & Nakshatra detailed interpretation
 TITHI_REPORT = {
@@ -59,7 +74,43 @@ NAKSHATRA_REPORT = {
     "REVATI": "The Wealthy. You are the final star. You are nurturing, protective of others, and spiritual."
 }
 
+def vedic_report(tithi_name, moon_nakshatra_name):
+    return {
+        "Tithi Report": TITHI_REPORT.get(tithi_name, "No interpretation available for this Tithi."),
+        "Nakshatra Report": NAKSHATRA_REPORT.get(moon_nakshatra_name, "No interpretation available for this Nakshatra.")
+    }
+
+# ดวงใน cache เก็บเป็น VedicRecord (index ของดิถี/นักษัตร) แล้วสร้าง Report ตอนตอบ
+chart_records.register_vedic_report(vedic_report)
+
+@cached_chart("vedic", record=chart_records.VedicRecord)
+def compute_vedic(birth_datetime_local, timezone_offset, latitude, longitude, ayanamsa=DEFAULT_AYANAMSA,
+                  mode=vedic_core.DEFAULT_MODE):
+    # Chart + interpretation for an already-resolved birth moment (shared with profile_api.py)
+    # mode="core" ใช้สูตรวิเคราะห์ใน vedic_core.py ถ้าไม่ใกล้รอยต่อราศี/นักษัตร/ดิถี ไม่เช่นนั้นใช้ Chart เต็ม
+    positions, mode_used = vedic_core.compute(birth_datetime_local, timezone_offset, latitude, longitude,
+                                              ayanamsa, mode)
+
+    tithi_name = positions["tithi"]
+    moon_nakshatra_name = positions["nakshatra"]
+
+    return {
+        "VedicData": {
+            "Tithi": tithi_name,
+            "Nakshatra": moon_nakshatra_name,
+            "Nakshatra Pada": positions["nakshatra_pada"],
+            "Moon Sign": positions["moon_sign"],
+            "Saturn Sign": positions["saturn_sign"],
+            "Rahu Sign": positions["rahu_sign"],
+            "Ketu Sign": positions["ketu_sign"],
+            "Ayanamsa": AYANAMSA_LABELS[ayanamsa],
+            "Calculation Mode": mode_used
+        },
+        "Report": vedic_report(tithi_name, moon_nakshatra_name)
+    }
+
 @app.route("/calculate_vedic", methods=["POST"])
+@idempotent(birth_data_inputs)
 def calculate_vedic():
     try:
         birth_data = request.get_json()
@@ -68,44 +119,32 @@ def calculate_vedic():
         birth_place_raw = birth_data.get("Birth Place")
 
         if not all([birth_date_str, birth_time_str, birth_place_raw]):
-            return jsonify({"status": "error", "message": "Missing required fields: Birth Date, Birth Time, or Birth Place."}), 400
+            return respond({"status": "error", "message": "Missing required fields: Birth Date, Birth Time, or Birth Place."}), 400
+
+        try:
+            ayanamsa = normalize_ayanamsa(birth_data.get("Ayanamsa"))
+            # "Mode": "core" = เฉพาะราศีจันทร์/เสาร์/ราหู/เกตุ, ดิถี, นักษัตร+ปาทะ แบบเร็ว (ค่าเริ่มต้น "full")
+            mode = vedic_core.normalize_mode(birth_data.get("Mode"))
+        except ValueError as e:
+            return respond({"status": "error", "message": str(e)}), 400
 
-        geolocator = Nominatim(user_agent="vedic_api_app")
-        tf = TimezoneFinder()
-        location = geolocator.geocode(birth_place_raw)
+        location = resolve_place(birth_place_raw, user_agent="vedic_api_app")
         if not location:
-            return jsonify({"status": "error", "message": f"Birth place '{birth_place_raw}' not found."}), 400
+            return respond({"status": "error", "message": f"Birth place '{birth_place_raw}' not found."}), 400
 
         latitude = location.latitude
         longitude = location.longitude
-        timezone_name = tf.timezone_at(lng=longitude, lat=latitude)
-        if not timezone_name:
-            return jsonify({"status": "error", "message": f"Could not determine timezone for {birth_place_raw}."}), 400
-
-        birth_datetime_naive_str = f"{birth_date_str} {birth_time_str}"
-        birth_datetime_naive = datetime.strptime(birth_datetime_naive_str, '%Y-%m-%d %H:%M')
-        local_timezone = pytz.timezone(timezone_name)
-        birth_datetime_local = local_timezone.localize(birth_datetime_naive, is_dst=None) 
-        utc_offset_timedelta = birth_datetime_local.utcoffset()
-        timezone_offset = utc_offset_timedelta.total_seconds() / 3600.0 
-
-        set_ayanamsa(LAHIRI)
-        chart = Chart(birth_datetime_local.year, birth_datetime_local.month, birth_datetime_local.day,
-                      birth_datetime_local.hour, birth_datetime_local.minute, 0, 
-                      timezone_offset, latitude, longitude)
-
-        planets = chart.get_planets()
-
-        tithi_name = chart.get_tithi_name()
-        moon_nakshatra_name = planets[MOON].get_nakshatra_name()
-        moon_nakshatra_pada = planets[MOON].get_nakshatra_pada()
-        moon_sign = planets[MOON].get_sign_name()
-        saturn_sign = planets[SATURN].get_sign_name()
-
-        report_content = {
-            "Tithi Report": TITHI_REPORT.get(tithi_name, "No interpretation available for this Tithi."),
-            "Nakshatra Report": NAKSHATRA_REPORT.get(moon_nakshatra_name, "No interpretation available for this Nakshatra.")
-        }
+        try:
+            moment = resolve_birth_moment(birth_date_str, birth_time_str, latitude, longitude, birth_place_raw)
+        except BirthTimeError as e:
+            return respond(e.to_dict()), 400
+        timezone_name = moment.timezone_name
+        birth_datetime_local = moment.local
+        timezone_offset = moment.offset_hours
+
+        # vedic_engine already computes in its own processes; engine_pool only waits for it
+        vedic = run_chart(compute_vedic, birth_datetime_local, timezone_offset, latitude, longitude,
+                          pool=engine_pool, ayanamsa=ayanamsa, mode=mode)
 
         result = {
             "status": "success",
@@ -114,14 +153,8 @@ def calculate_vedic():
                 "Birth Time": birth_time_str,
                 "Birth Place": birth_place_raw
             },
-            "VedicData": {
-                "Tithi": tithi_name,
-                "Nakshatra": moon_nakshatra_name,
-                "Nakshatra Pada": moon_nakshatra_pada,
-                "Moon Sign": moon_sign,
-                "Saturn Sign": saturn_sign
-            },
-            "Report": report_content,
+            "VedicData": vedic["VedicData"],
+            "Report": vedic["Report"],
             "CalculationInputs": {
                 "Resolved Place": location.address,
                 "Latitude": latitude,
@@ -130,10 +163,109 @@ def calculate_vedic():
                 "UTC Offset (Hours)": timezone_offset
             }
         }
-        return jsonify(result)
+        with instrumentation.stage("serialize"):
+            return respond(result)
+
+    except HTTPException:
+        # 503 / 504 from serving.py
+        raise
+    except Exception as e:
+        return respond({"status": "error", "message": str(e)}), 500
+
+@cached_chart("panchanga")
+def compute_panchanga(start_local, latitude, longitude, days=1, ayanamsa=DEFAULT_AYANAMSA):
+    # ปฏิทิน panchanga รายวันตั้งแต่เที่ยงคืนท้องถิ่น start_local: หาเฉพาะเวลาที่ tithi/nakshatra เปลี่ยน
+    # (panchanga.py) แทนการสร้าง Chart ทุกวัน แล้วอ่านค่า ณ เวลาพระอาทิตย์ขึ้นของแต่ละวัน
+    zone = pytz.timezone(start_local.tzinfo.zone)
+    start_jd = datetime_to_jd(start_local)
+    raw = engine.run(ayanamsa, panchanga.calendar, start_jd, days, latitude, longitude)
+
+    def local_time(jd):
+        return jd_to_datetime(jd).astimezone(zone).isoformat(timespec="seconds")
+
+    def tithi_entry(index):
+        name, paksha = panchanga.tithi_name(index)
+        return {"Tithi": name, "Paksha": paksha, "Tithi Number": index + 1}
+
+    days_data = []
+    for day, sunrise in enumerate(raw["sunrise"]):
+        # ขั้วโลก: วันที่ดวงอาทิตย์ไม่ขึ้น ใช้ค่า ณ เที่ยงคืนท้องถิ่นแทน
+        at = sunrise if sunrise is not None else start_jd + day
+        days_data.append({
+            "Date": (start_local.date() + timedelta(days=day)).isoformat(),
+            "Sunrise": local_time(sunrise) if sunrise is not None else None,
+            **tithi_entry(panchanga.segment_at(raw["tithi"], at)),
+            "Nakshatra": panchanga.NAKSHATRA_NAMES[panchanga.segment_at(raw["nakshatra"], at)],
+        })
+
+    transitions = [{"Starts": local_time(jd), **tithi_entry(index)} for jd, index in raw["tithi"][1:]]
+    transitions += [{"Starts": local_time(jd), "Nakshatra": panchanga.NAKSHATRA_NAMES[index]}
+                    for jd, index in raw["nakshatra"][1:]]
+    transitions.sort(key=lambda t: t["Starts"])
+
+    tithis = {day["Tithi"] for day in days_data}
+    nakshatras = {day["Nakshatra"] for day in days_data}
+    return {
+        "Days": days_data,
+        "Transitions": transitions,
+        "Reports": {
+            "Tithi": {name: TITHI_REPORT.get(name) for name in sorted(tithis)},
+            "Nakshatra": {name: NAKSHATRA_REPORT.get(name) for name in sorted(nakshatras)},
+        },
+    }
+
+@app.route("/calculate_panchanga", methods=["POST"])
+def calculate_panchanga():
+    # รับ {"Place": ..., "Year": 2025, "Month": 1-12 (ไม่ใส่ = ทั้งปี), "Ayanamsa": ...}
+    try:
+        data = request.get_json()
+        place_raw = data.get("Place") or data.get("Birth Place")
+        try:
+            year = int(data.get("Year"))
+            month = int(data["Month"]) if data.get("Month") else None
+            if not 1900 <= year <= 2100 or (month is not None and not 1 <= month <= 12):
+                raise ValueError
+        except (TypeError, ValueError):
+            return respond({"status": "error", "message": "Year must be 1900-2100 and Month 1-12."}), 400
+        if not place_raw:
+            return respond({"status": "error", "message": "Missing required field: Place."}), 400
+        try:
+            ayanamsa = normalize_ayanamsa(data.get("Ayanamsa"))
+        except ValueError as e:
+            return respond({"status": "error", "message": str(e)}), 400
+
+        location = resolve_place(place_raw, user_agent="vedic_api_app")
+        if not location:
+            return respond({"status": "error", "message": f"Place '{place_raw}' not found."}), 400
+        timezone_name = timezone_at(location.latitude, location.longitude)
+        if not timezone_name:
+            return respond({"status": "error", "message": f"Could not determine timezone for {place_raw}."}), 400
+
+        start_local = pytz.timezone(timezone_name).localize(datetime(year, month or 1, 1))
+        days = calendar.monthrange(year, month)[1] if month else (366 if calendar.isleap(year) else 365)
+        result = run_chart(compute_panchanga, start_local, location.latitude, location.longitude,
+                           pool=engine_pool, days=days, ayanamsa=ayanamsa)
 
+        with instrumentation.stage("serialize"):
+            return respond({
+                "status": "success",
+                "Inputs": {
+                    "Place": place_raw,
+                    "Resolved Place": location.address,
+                    "Latitude": location.latitude,
+                    "Longitude": location.longitude,
+                    "Timezone Name": timezone_name,
+                    "Year": year,
+                    "Month": month,
+                    "Ayanamsa": AYANAMSA_LABELS[ayanamsa]
+                },
+                **result
+            })
+    except HTTPException:
+        # 503 / 504 from serving.py
+        raise
     except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+        return respond({"status": "error", "message": str(e)}), 500
 
 if __name__ == "__main__":
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    serve(app, port=5000)
@@ -0,0 +1,318 @@
+import argparse
+import math
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from ephemeris_table import SIGNS
+from panchanga import NAKSHATRA_ARC, NAKSHATRA_NAMES, TITHI_ARC, tithi_name
+from vedic_engine import DEFAULT_AYANAMSA, engine
+
+# "Core signs" mode for the Vedic services: Moon sign, Saturn / Rahu / Ketu
+# signs, tithi and Moon nakshatra + pada from short analytic series instead of a
+# PyJHora Chart.
+#
+#   Sun     Meeus' low-precision solar theory
+#   Moon    leading terms of Meeus' ELP-2000 series
+#   Rahu    mean node + periodic terms fitted to swisseph's true node
+#   Saturn  Schlyter's orbital elements + the Jupiter-Saturn perturbations
+#   Lahiri  polynomial fit of swisseph's Lahiri ayanamsa
+#
+# All four land within ~0.05 deg of swisseph over 1900-2049, and the whole
+# computation is ~40 us with no ephemeris files or process hop.
+#
+# Each value is only trusted when it is further than its error margin from the
+# nearest sign / nakshatra-pada / tithi boundary; otherwise core_positions()
+# returns None and the caller uses the full engine. `python vedic_core.py
+# validate` measures the errors and the fallback rate.
+
+J2000 = 2451545.0
+CORE_FIRST_YEAR, CORE_LAST_YEAR = 1900, 2049
+CALCULATION_MODES = ("full", "core")
+DEFAULT_MODE = "full"
+# Boundary margins in degrees, about three times the largest error `validate`
+# measures against swisseph (Moon 0.014, Moon - Sun 0.02, node 0.033, Saturn 0.049).
+MOON_MARGIN = 0.04
+TITHI_MARGIN = 0.06
+NODE_MARGIN = 0.1
+SATURN_MARGIN = 0.15
+PADA_ARC = NAKSHATRA_ARC / 4.0
+
+_LAHIRI = (23.8570924, 1.39688796, 3.07091092e-04)
+
+# (D, M, M', F, coefficient in 1e-6 deg): Meeus table 47.A, longitude terms above 0.002 deg.
+_MOON_TERMS = (
+    (0, 0, 1, 0, 6288774), (2, 0, -1, 0, 1274027), (2, 0, 0, 0, 658314),
+    (0, 0, 2, 0, 213618), (0, 1, 0, 0, -185116), (0, 0, 0, 2, -114332),
+    (2, 0, -2, 0, 58793), (2, -1, -1, 0, 57066), (2, 0, 1, 0, 53322),
+    (2, -1, 0, 0, 45758), (0, 1, -1, 0, -40923), (1, 0, 0, 0, -34720),
+    (0, 1, 1, 0, -30383), (2, 0, 0, -2, 15327), (0, 0, 1, 2, -12528),
+    (0, 0, 1, -2, 10980), (4, 0, -1, 0, 10675), (0, 0, 3, 0, 10034),
+    (4, 0, -2, 0, 8548), (2, 1, -1, 0, -7888), (2, 1, 0, 0, -6766),
+    (1, 0, -1, 0, -5163), (1, 1, 0, 0, 4987), (2, -1, 1, 0, 4036),
+    (2, 0, 2, 0, 3994), (4, 0, 0, 0, 3861), (2, 0, -3, 0, 3665),
+    (0, 1, -2, 0, -2689), (2, 0, -1, 2, -2602), (2, -1, -2, 0, 2390),
+    (1, 0, 1, 0, -2348), (2, -2, 0, 0, 2236), (0, 1, 2, 0, -2120),
+    (0, 2, 0, 0, -2069),
+)
+
+# True (osculating) node: the mean node plus these terms, coefficients in deg,
+# least-squares fitted to swisseph's TRUE_NODE over 1900-2050 (residual < 0.03 deg).
+# (D, M, M', F, sin coefficient); the last term is a cosine.
+_NODE_TERMS = (
+    (2, 0, 0, -2, -1.4976), (0, 1, 0, 0, -0.1499), (2, 0, 0, 0, -0.1226),
+    (0, 0, 0, 2, 0.1177), (0, 0, 2, -2, -0.0804), (2, -1, 0, -2, -0.0613),
+    (2, 0, -1, 0, 0.0491), (0, 0, 1, -2, 0.0410), (0, 0, 1, 0, 0.0326),
+    (2, 1, 0, -2, 0.0318), (4, 0, 0, -4, 0.0198), (2, 0, -1, -2, 0.0180),
+    (2, 0, 1, -2, -0.0151), (2, 0, -2, 0, 0.0148), (2, -1, 0, 0, -0.0077),
+    (2, 0, 1, 0, -0.0045), (0, 0, 1, 2, 0.0040),
+)
+_NODE_COSINE = (1, 1, 0, -1, -0.0268)
+
+
+def _sin(degrees):
+    return math.sin(math.radians(degrees))
+
+
+def delta_t_seconds(year):
+    """TT - UT, Espenak & Meeus polynomials (1900-2150)."""
+    if year < 1920:
+        t = year - 1900
+        return -2.79 + 1.494119 * t - 0.0598939 * t ** 2 + 0.0061966 * t ** 3 - 0.000197 * t ** 4
+    if year < 1941:
+        t = year - 1920
+        return 21.20 + 0.84493 * t - 0.076100 * t ** 2 + 0.0020936 * t ** 3
+    if year < 1961:
+        t = year - 1950
+        return 29.07 + 0.407 * t - t ** 2 / 233 + t ** 3 / 2547
+    if year < 1986:
+        t = year - 1975
+        return 45.45 + 1.067 * t - t ** 2 / 260 - t ** 3 / 718
+    if year < 2005:
+        t = year - 2000
+        return (63.86 + 0.3345 * t - 0.060374 * t ** 2 + 0.0017275 * t ** 3
+                + 0.000651814 * t ** 4 + 0.00002373599 * t ** 5)
+    if year < 2050:
+        t = year - 2000
+        return 62.92 + 0.32217 * t + 0.005589 * t ** 2
+    return -20 + 32 * ((year - 1820) / 100) ** 2 - 0.5628 * (2150 - year)
+
+
+def lahiri_ayanamsa(jd_ut):
+    t = (jd_ut - J2000) / 36525.0
+    return _LAHIRI[0] + t * (_LAHIRI[1] + t * _LAHIRI[2])
+
+
+def _sun(t):
+    # Tropical longitude, mean equinox of date, corrected for aberration.
+    l0 = 280.46646 + 36000.76983 * t + 0.0003032 * t * t
+    m = 357.52911 + 35999.05029 * t - 0.0001537 * t * t
+    c = ((1.914602 - 0.004817 * t - 0.000014 * t * t) * _sin(m)
+         + (0.019993 - 0.000101 * t) * _sin(2 * m) + 0.000289 * _sin(3 * m))
+    return (l0 + c - 0.00569) % 360.0
+
+
+def _moon_and_node(t):
+    # Tropical Moon longitude and true node, mean equinox of date.
+    lp = 218.3164477 + 481267.88123421 * t - 0.0015786 * t * t
+    d = 297.8501921 + 445267.1114034 * t - 0.0018819 * t * t
+    m = 357.5291092 + 35999.0502909 * t - 0.0001536 * t * t
+    mp = 134.9633964 + 477198.8675055 * t + 0.0087414 * t * t
+    f = 93.2720950 + 483202.0175233 * t - 0.0036539 * t * t
+    e = 1.0 - 0.002516 * t - 0.0000074 * t * t
+    total = 0.0
+    for cd, cm, cmp, cf, coefficient in _MOON_TERMS:
+        term = coefficient * _sin(cd * d + cm * m + cmp * mp + cf * f)
+        total += term * e ** abs(cm)
+    total += 3958 * _sin(119.75 + 131.849 * t) + 1962 * _sin(lp - f) + 318 * _sin(53.09 + 479264.290 * t)
+    moon = (lp + total / 1e6) % 360.0
+
+    node = 125.0445479 - 1934.1362891 * t + 0.0020754 * t * t
+    for cd, cm, cmp, cf, coefficient in _NODE_TERMS:
+        node += coefficient * _sin(cd * d + cm * m + cmp * mp + cf * f)
+    cd, cm, cmp, cf, coefficient = _NODE_COSINE
+    node += coefficient * math.cos(math.radians(cd * d + cm * m + cmp * mp + cf * f))
+    return moon, node % 360.0
+
+
+def _cos(degrees):
+    return math.cos(math.radians(degrees))
+
+
+def _orbit(mean_anomaly, e):
+    # True anomaly (deg) and radius (in units of a) from Kepler's equation.
+    anomaly = math.radians(mean_anomaly % 360.0)
+    eccentric = anomaly + e * math.sin(anomaly)
+    for _ in range(5):
+        eccentric -= (eccentric - e * math.sin(eccentric) - anomaly) / (1.0 - e * math.cos(eccentric))
+    x = math.cos(eccentric) - e
+    y = math.sqrt(1.0 - e * e) * math.sin(eccentric)
+    return math.degrees(math.atan2(y, x)), math.hypot(x, y)
+
+
+def _saturn(t):
+    # Geocentric tropical longitude, mean equinox of date. Elements are per day
+    # from 1999-12-31 0h TT and already include precession.
+    d = t * 36525.0 + 1.5
+    node = 113.6634 + 2.38980e-5 * d
+    inclination = 2.4886 - 1.081e-7 * d
+    perihelion = 339.3939 + 2.97661e-5 * d
+    saturn_m = 316.9670 + 0.0334442282 * d
+    jupiter_m = 19.8950 + 0.0830853001 * d
+    anomaly, r = _orbit(saturn_m, 0.055546 - 9.499e-9 * d)
+    r *= 9.55475
+    u = anomaly + perihelion
+    x = r * (_cos(node) * _cos(u) - _sin(node) * _sin(u) * _cos(inclination))
+    y = r * (_sin(node) * _cos(u) + _cos(node) * _sin(u) * _cos(inclination))
+    z = r * _sin(u) * _sin(inclination)
+    lon = math.degrees(math.atan2(y, x))
+    lat = math.degrees(math.atan2(z, math.hypot(x, y)))
+    # The great inequality and its neighbours.
+    lon += (0.812 * _sin(2 * jupiter_m - 5 * saturn_m - 67.6) - 0.229 * _cos(2 * jupiter_m - 4 * saturn_m - 2.0)
+            + 0.119 * _sin(jupiter_m - 2 * saturn_m - 3.0) + 0.046 * _sin(2 * jupiter_m - 6 * saturn_m - 69.0)
+            + 0.014 * _sin(jupiter_m - 3 * saturn_m + 32.0))
+    lat += -0.020 * _cos(2 * jupiter_m - 4 * saturn_m - 2.0) + 0.018 * _sin(2 * jupiter_m - 6 * saturn_m - 49.0)
+
+    sun_perihelion = 282.9404 + 4.70935e-5 * d
+    sun_anomaly, sun_r = _orbit(356.0470 + 0.9856002585 * d, 0.016709 - 1.151e-9 * d)
+    sun_lon = sun_anomaly + sun_perihelion
+    x = r * _cos(lon) * _cos(lat) + sun_r * _cos(sun_lon)
+    y = r * _sin(lon) * _cos(lat) + sun_r * _sin(sun_lon)
+    return math.degrees(math.atan2(y, x)) % 360.0
+
+
+def sidereal_longitudes(jd_ut):
+    """Lahiri sidereal Sun, Moon, Rahu and Saturn longitudes at `jd_ut`."""
+    year = 2000.0 + (jd_ut - J2000) / 365.25
+    t = (jd_ut + delta_t_seconds(year) / 86400.0 - J2000) / 36525.0
+    ayanamsa = lahiri_ayanamsa(jd_ut)
+    moon, node = _moon_and_node(t)
+    return {
+        "sun": (_sun(t) - ayanamsa) % 360.0,
+        "moon": (moon - ayanamsa) % 360.0,
+        "rahu": (node - ayanamsa) % 360.0,
+        "saturn": (_saturn(t) - ayanamsa) % 360.0,
+    }
+
+
+def _clear_of_boundary(value, arc, margin):
+    offset = value % arc
+    return margin <= offset <= arc - margin
+
+
+def _fields(lon):
+    elongation = (lon["moon"] - lon["sun"]) % 360.0
+    return {
+        "tithi": tithi_name(int(elongation // TITHI_ARC))[0],
+        "nakshatra": NAKSHATRA_NAMES[int(lon["moon"] // NAKSHATRA_ARC)],
+        "nakshatra_pada": int(lon["moon"] % NAKSHATRA_ARC // PADA_ARC) + 1,
+        "moon_sign": SIGNS[int(lon["moon"] // 30.0)],
+        "saturn_sign": SIGNS[int(lon["saturn"] // 30.0)],
+        "rahu_sign": SIGNS[int(lon["rahu"] // 30.0)],
+        "ketu_sign": SIGNS[int((lon["rahu"] + 180.0) % 360.0 // 30.0)],
+    }
+
+
+def core_positions(jd_ut):
+    """The engine.compute() fields (Lahiri) at `jd_ut`, or None when a value is too
+    close to a boundary for the analytic series to be trusted."""
+    year = 2000.0 + (jd_ut - J2000) / 365.25
+    if not CORE_FIRST_YEAR <= year < CORE_LAST_YEAR + 1:
+        return None
+    lon = sidereal_longitudes(jd_ut)
+    if not (_clear_of_boundary(lon["moon"], PADA_ARC, MOON_MARGIN)
+            and _clear_of_boundary((lon["moon"] - lon["sun"]) % 360.0, TITHI_ARC, TITHI_MARGIN)
+            and _clear_of_boundary(lon["rahu"], 30.0, NODE_MARGIN)
+            and _clear_of_boundary(lon["saturn"], 30.0, SATURN_MARGIN)):
+        return None
+    return _fields(lon)
+
+
+def local_to_jd(birth_datetime_local, timezone_offset):
+    # Same inputs as engine.compute: local wall-clock time + UTC offset in hours.
+    utc = birth_datetime_local.replace(tzinfo=None) - timedelta(hours=timezone_offset)
+    return (utc - datetime(2000, 1, 1, 12)).total_seconds() / 86400.0 + J2000
+
+
+def normalize_mode(value):
+    """Return the canonical calculation mode, or raise ValueError for an unknown one."""
+    name = (value or DEFAULT_MODE).strip().lower()
+    if name not in CALCULATION_MODES:
+        raise ValueError(f"Unsupported mode '{value}'. Use one of: {', '.join(CALCULATION_MODES)}.")
+    return name
+
+
+def compute(birth_datetime_local, timezone_offset, latitude, longitude, ayanamsa=DEFAULT_AYANAMSA, mode=DEFAULT_MODE):
+    """engine.compute() with the core shortcut: returns (positions, mode actually used).
+
+    "core" only applies to Lahiri; other ayanamsas, dates outside 1900-2049 and
+    births near a boundary go to the full engine."""
+    if mode == "core" and ayanamsa == "LAHIRI":
+        positions = core_positions(local_to_jd(birth_datetime_local, timezone_offset))
+        if positions is not None:
+            return positions, "core"
+    return engine.compute(birth_datetime_local, timezone_offset, latitude, longitude, ayanamsa), "full"
+
+
+def _swisseph_reference():
+    import swisseph as swe
+    swe.set_sid_mode(swe.SIDM_LAHIRI)
+    flags = swe.FLG_SWIEPH | swe.FLG_SIDEREAL
+    bodies = (("sun", swe.SUN), ("moon", swe.MOON), ("rahu", swe.TRUE_NODE), ("saturn", swe.SATURN))
+    return lambda jd_ut: {name: swe.calc_ut(jd_ut, body, flags)[0][0] for name, body in bodies}
+
+
+def _validate(samples, seed, reference_name):
+    rng = random.Random(seed)
+    epoch = datetime(CORE_FIRST_YEAR, 1, 1)
+    span_minutes = int((datetime(CORE_LAST_YEAR + 1, 1, 1) - epoch).total_seconds() // 60) - 1440
+    births = []
+    for _ in range(samples):
+        offset = rng.choice((-5.0, 0.0, 1.0, 5.5, 7.0, 9.0))
+        local = epoch + timedelta(minutes=rng.randrange(span_minutes) + 720, hours=offset)
+        births.append((local, offset, rng.uniform(-50.0, 60.0), rng.uniform(-180.0, 180.0)))
+    jds = [local_to_jd(local, offset) for local, offset, _, _ in births]
+
+    start = time.perf_counter()
+    core = [core_positions(jd) for jd in jds]
+    core_us = (time.perf_counter() - start) / samples * 1e6
+
+    if reference_name == "swisseph":
+        reference = _swisseph_reference()
+        worst = dict.fromkeys(("sun", "moon", "rahu", "saturn"), 0.0)
+        full = []
+        for jd in jds:
+            got, want = sidereal_longitudes(jd), reference(jd)
+            for name in worst:
+                worst[name] = max(worst[name], abs((got[name] - want[name] + 180.0) % 360.0 - 180.0))
+            full.append(_fields(want))
+        print("max error vs swisseph (deg): " + ", ".join(f"{k} {v:.4f}" for k, v in worst.items()))
+    else:
+        full = [engine.compute(local, offset, lat, lon, "LAHIRI") for local, offset, lat, lon in births]
+
+    fallbacks = sum(result is None for result in core)
+    mismatches = [(birth, result, want) for birth, result, want in zip(births, core, full)
+                  if result is not None and result != want]
+    print(f"samples: {samples}, near a boundary (full engine fallback): {fallbacks} ({fallbacks / samples:.1%})")
+    print(f"mismatches vs {reference_name} outside the margins: {len(mismatches)}")
+    for (local, offset, _, _), result, want in mismatches[:10]:
+        differing = {k: (result[k], want[k]) for k in result if result[k] != want[k]}
+        print(f"  {local:%Y-%m-%d %H:%M} UTC{offset:+}: core / {reference_name} {differing}")
+    print(f"core path: {core_us:.1f} us/birth")
+    return not mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate the core-signs Vedic mode.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    validate = sub.add_parser("validate", help="compare random births with the full engine (or swisseph)")
+    validate.add_argument("--samples", type=int, default=20000)
+    validate.add_argument("--seed", type=int, default=0)
+    validate.add_argument("--reference", choices=("engine", "swisseph"), default="engine")
+    args = parser.parse_args(argv)
+    return 0 if _validate(args.samples, args.seed, args.reference) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+import atexit
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import swisseph as swe
+
+import engines
+from serving import CHART_TIMEOUT, ComputeTimeout
+
+PyJHora = engines.lazy("PyJHora")
+
+# PyJHora keeps the ayanamsa (and its ephemeris settings) in module-global state,
+# so set_ayanamsa() from one request can change another request's chart halfway
+# through. The engine never switches ayanamsa inside a process: each supported
+# ayanamsa gets its own worker processes, configured once at start-up.
+#
+# VEDIC_ENGINE_MODE=inline computes in the calling process instead, serialised by
+# a lock (single-process dev server, debugging).
+#
+# A chart that takes longer than VEDIC_TIMEOUT seconds raises ComputeTimeout
+# (504). When a worker dies (OOM, segfault in a C extension) that ayanamsa's
+# pool is replaced, so only the charts running on it at the time fail.
+
+AYANAMSAS = ("LAHIRI", "RAMAN", "KP")
+AYANAMSA_LABELS = {"LAHIRI": "Lahiri", "RAMAN": "Raman", "KP": "KP"}
+DEFAULT_AYANAMSA = "LAHIRI"
+# The same ayanamsas in swisseph, for sidereal positions computed directly (panchanga.py).
+SWE_SIDEREAL_MODES = {"LAHIRI": swe.SIDM_LAHIRI, "RAMAN": swe.SIDM_RAMAN, "KP": swe.SIDM_KRISHNAMURTI}
+
+VEDIC_ENGINE_MODE = os.environ.get("VEDIC_ENGINE_MODE", "process")
+VEDIC_WORKERS_PER_AYANAMSA = int(os.environ.get("VEDIC_WORKERS_PER_AYANAMSA", "2"))
+VEDIC_TIMEOUT = float(os.environ.get("VEDIC_TIMEOUT", str(CHART_TIMEOUT)))
+
+
+def normalize_ayanamsa(value):
+    """Return the canonical ayanamsa name, or raise ValueError for an unsupported one."""
+    name = (value or DEFAULT_AYANAMSA).strip().upper()
+    if name not in AYANAMSAS:
+        raise ValueError(f"Unsupported ayanamsa '{value}'. Use one of: {', '.join(AYANAMSAS)}.")
+    return name
+
+
+def _init_worker(ayanamsa):
+    PyJHora.set_ayanamsa(getattr(PyJHora, ayanamsa))
+    swe.set_sid_mode(SWE_SIDEREAL_MODES[ayanamsa])
+
+
+def _compute(year, month, day, hour, minute, timezone_offset, latitude, longitude):
+    chart = PyJHora.Chart(year, month, day, hour, minute, 0,
+                          timezone_offset, latitude, longitude)
+    planets = chart.get_planets()
+    moon = planets[PyJHora.MOON]
+    return {
+        "tithi": chart.get_tithi_name(),
+        "nakshatra": moon.get_nakshatra_name(),
+        "nakshatra_pada": moon.get_nakshatra_pada(),
+        "moon_sign": moon.get_sign_name(),
+        "saturn_sign": planets[PyJHora.SATURN].get_sign_name(),
+        "rahu_sign": planets[PyJHora.RAHU].get_sign_name(),
+        "ketu_sign": planets[PyJHora.KETU].get_sign_name(),
+    }
+
+
+class VedicEngine:
+    def __init__(self, mode=VEDIC_ENGINE_MODE, workers_per_ayanamsa=VEDIC_WORKERS_PER_AYANAMSA,
+                 timeout=VEDIC_TIMEOUT):
+        self.mode = mode
+        self.workers_per_ayanamsa = workers_per_ayanamsa
+        self.timeout = timeout
+        self._pools = {}
+        self._pools_lock = threading.Lock()
+        self._inline_lock = threading.Lock()
+
+    def _pool(self, ayanamsa):
+        pool = self._pools.get(ayanamsa)
+        if pool is None:
+            with self._pools_lock:
+                pool = self._pools.get(ayanamsa)
+                if pool is None:
+                    pool = self._pools[ayanamsa] = ProcessPoolExecutor(
+                        max_workers=self.workers_per_ayanamsa,
+                        initializer=_init_worker,
+                        initargs=(ayanamsa,),
+                    )
+        return pool
+
+    def _drop_pool(self, ayanamsa, pool):
+        # The next _pool(ayanamsa) starts fresh workers; other requests may have
+        # replaced the broken pool already.
+        with self._pools_lock:
+            if self._pools.get(ayanamsa) is pool:
+                del self._pools[ayanamsa]
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, ayanamsa, fn, *args):
+        """Call fn(*args) where PyJHora and swisseph are set to `ayanamsa`; fn must be picklable."""
+        ayanamsa = normalize_ayanamsa(ayanamsa)
+        if self.mode == "inline":
+            with self._inline_lock:
+                _init_worker(ayanamsa)
+                return fn(*args)
+        pool = self._pool(ayanamsa)
+        try:
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker died after the last chart; this one has not run yet.
+            self._drop_pool(ayanamsa, pool)
+            pool = self._pool(ayanamsa)
+            future = pool.submit(fn, *args)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise ComputeTimeout("The vedic chart calculation did not finish in time.")
+        except BrokenProcessPool:
+            # A worker died while this chart was running: fail it, but give the
+            # charts after it a working pool.
+            self._drop_pool(ayanamsa, pool)
+            raise
+
+    def compute(self, birth_datetime_local, timezone_offset, latitude, longitude, ayanamsa=DEFAULT_AYANAMSA):
+        """Planet signs, tithi and Moon nakshatra for a local birth time under `ayanamsa`."""
+        return self.run(ayanamsa, _compute,
+                        birth_datetime_local.year, birth_datetime_local.month, birth_datetime_local.day,
+                        birth_datetime_local.hour, birth_datetime_local.minute,
+                        timezone_offset, latitude, longitude)
+
+    def shutdown(self):
+        with self._pools_lock:
+            for pool in self._pools.values():
+                pool.shutdown(wait=False, cancel_futures=True)
+            self._pools.clear()
+
+
+engine = VedicEngine()
+atexit.register(engine.shutdown)